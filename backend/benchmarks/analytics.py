@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Analytics benchmark: the catalogue snapshot's vectorized (NumPy) queries
+against the pure-Python list comprehensions they replaced in server.py
+(get_stats, the low-stock filter, chat's category_stats), plus ABC
+classification and stock percentiles, on a synthetic catalogue. Also times
+the reorder forecast (forecast.py) over the whole catalogue.
+
+Run from backend/: python benchmarks/analytics.py [--products 100000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from itertools import accumulate
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'kuber_inventory_bench')
+
+from forecast import DemandHistory, reorder_plan
+from seed import generate_activity, generate_categories, generate_products
+from snapshot import CatalogueSnapshot
+
+
+def python_valuation(products: list) -> dict:
+    return {
+        "total_products": len(products),
+        "total_stock_value": sum(p["price"] * p["quantity"] for p in products),
+        "low_stock_items": len([p for p in products if p["quantity"] <= p.get("low_stock_threshold", 10)]),
+        "out_of_stock_items": len([p for p in products if p["quantity"] == 0]),
+    }
+
+
+def python_category_breakdown(products: list, categories: list) -> dict:
+    category_stats = {}
+    for cat in categories:
+        cat_products = [p for p in products if p["category"] == cat["name"]]
+        category_stats[cat["name"]] = {
+            "count": len(cat_products),
+            "total_value": sum(p["price"] * p["quantity"] for p in cat_products),
+        }
+    return category_stats
+
+
+def python_low_stock(products: list) -> list:
+    return [p["id"] for p in products if p["quantity"] <= p.get("low_stock_threshold", 10)]
+
+
+def python_abc(products: list, a: float = 0.8, b: float = 0.95) -> dict:
+    values = sorted((p["price"] * p["quantity"] for p in products), reverse=True)
+    total = sum(values)
+    counts = {"A": 0, "B": 0, "C": 0}
+    for before, value in zip(accumulate([0.0] + values), values):
+        share = before / total if total else 1.0
+        counts["A" if share < a else "B" if share < b else "C"] += 1
+    return counts
+
+
+def python_percentiles(products: list) -> list:
+    return statistics.quantiles((p["quantity"] for p in products), n=100, method="inclusive")
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--categories', type=int, default=16)
+    parser.add_argument('--activity-per-day', type=int, default=5000, help='stock movements per day for the forecast')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    now = datetime.now(timezone.utc)
+    categories = generate_categories(args.categories, rng)
+    products = [p for batch in generate_products(args.products, categories, rng, now) for p in batch]
+    for c in categories:
+        c.pop("_base_price", None)
+
+    snapshot = CatalogueSnapshot(lambda: None)
+    load_ms = best_of(lambda: snapshot.load(products), args.repeat)
+
+    # Sanity check: both implementations agree
+    expected = python_valuation(products)
+    actual = snapshot.valuation()
+    assert expected["low_stock_items"] == actual["low_stock_items"]
+    assert abs(expected["total_stock_value"] - actual["total_stock_value"]) < 1e-6 * max(1.0, expected["total_stock_value"])
+    assert python_abc(products) == {k: v["products"] for k, v in snapshot.abc_classification()["classes"].items()}
+
+    cases = [
+        ("valuation (get_stats)", lambda: python_valuation(products), snapshot.valuation),
+        ("category breakdown (chat)", lambda: python_category_breakdown(products, categories), snapshot.category_breakdown),
+        ("low-stock ids", lambda: python_low_stock(products), snapshot.low_stock_ids),
+        ("ABC classification", lambda: python_abc(products), snapshot.abc_classification),
+        ("stock percentiles", lambda: python_percentiles(products), snapshot.stock_percentiles),
+    ]
+    print(f"{args.products} products, {args.categories} categories; snapshot load {load_ms:.1f} ms (from documents)")
+    print(f"{'query':<28} {'python ms':>10} {'numpy ms':>10} {'speedup':>8}")
+    for name, python_fn, numpy_fn in cases:
+        python_ms = best_of(python_fn, args.repeat)
+        numpy_ms = best_of(numpy_fn, args.repeat)
+        print(f"{name:<28} {python_ms:>10.2f} {numpy_ms:>10.2f} {python_ms / numpy_ms:>7.1f}x")
+
+    history = DemandHistory(lambda: None, window_days=30)
+    pairs = [(p["id"], p["name"]) for p in products]
+    logs = [log for batch in generate_activity(pairs, 1, args.activity_per_day, rng, now) for log in batch]
+    rollup_ms = best_of(lambda: history.ingest(logs, "", now), 1)
+    columns = snapshot.columns()
+    plan_ms = best_of(lambda: reorder_plan(columns["ids"], columns["quantity"], history, now), args.repeat)
+    print(f"reorder forecast: rollup of {len(logs)} activity logs {rollup_ms:.1f} ms, "
+          f"plan for {len(columns['ids'])} products {plan_ms:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Offline load test: boots the FastAPI app in-process (no network, no uvicorn),
+seeds a catalogue of configurable size and drives concurrent async clients
+across every /api route, one route at a time.
+
+Reports req/s, p50/p95/p99 latency and MongoDB commands per request (read
+from the /metrics instrumentation; only available with --backend mongod,
+since mongomock does not emit command events).
+
+--backend memory runs the API on the in-process storage engine
+(memory_storage.py) instead of MongoDB: no database needed, and comparing it
+with --backend mongod shows how much of each route's latency is the storage
+path.
+
+Run from backend/:
+    python benchmarks/load_test.py --backend memory --products 5000
+    python benchmarks/load_test.py --backend mongomock --products 5000
+    python benchmarks/load_test.py --backend mongod --products 50000 --save-baseline baseline.json
+    python benchmarks/load_test.py --backend mongod --products 50000 --baseline baseline.json
+
+--backend mongod uses MONGO_URL (default mongodb://localhost:27017) and a
+throwaway database that is dropped afterwards. With --baseline the run exits
+with status 1 if any route's p95 or throughput regressed beyond --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'kuber_inventory_loadtest')
+# The chat route must not call a real AI provider during a load test
+os.environ.pop('GEMINI_API_KEY', None)
+os.environ.pop('OPENROUTER_API_KEY', None)
+# One admin drives every request; per-admin rate limits would turn most of them into 429s
+for _limit in ('CHAT_RATE_LIMIT', 'REPORT_RATE_LIMIT', 'STATS_RATE_LIMIT'):
+    os.environ.setdefault(_limit, '0')
+
+import bcrypt
+import httpx
+
+import metrics
+import server
+from memory_storage import MemoryStorage
+from seed import MATERIALS, generate_dataset
+
+# One log line per request would dominate the run
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+ADMIN_EMAIL = 'loadtest@kuber.com'
+ADMIN_PASSWORD = 'loadtest'
+# Smallest valid PNG, for the upload route
+PNG_BYTES = bytes.fromhex(
+    '89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c489'
+    '0000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082'
+)
+
+
+async def seed(db, args) -> dict:
+    """
+    Load-test admin (cheap bcrypt rounds) plus a synthetic catalogue from seed.generate_dataset.
+    `db` is a Motor database or a Storage; both have admins / categories / products /
+    activity_logs with insert_one / insert_many.
+    """
+    await db.admins.insert_one({
+        "id": str(uuid.uuid4()),
+        "email": ADMIN_EMAIL,
+        "password_hash": bcrypt.hashpw(ADMIN_PASSWORD.encode('utf-8'), bcrypt.gensalt(rounds=4)).decode('utf-8'),
+        "name": "Load Test",
+        "role": "admin",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    })
+    return await generate_dataset(
+        db, args.products, args.categories, months=args.months, activity_per_day=args.activity_per_day,
+        seed=args.seed, log=lambda line: print(f"  {line}"),
+    )
+
+
+def build_routes(ctx: dict, sinks: dict, rng: random.Random) -> list:
+    """
+    (method, route template, request kwargs factory). POST routes record what they
+    create in `sinks` so the DELETE routes later remove it again.
+    """
+    def product_id():
+        return rng.choice(ctx["product_ids"])
+
+    def new_product():
+        return {"json": {"name": "Load product", "sku": f"LT-{uuid.uuid4().hex[:12]}", "price": 99.0,
+                         "quantity": 20, "category": rng.choice(ctx["category_names"])}}
+
+    return [
+        ("POST", "/api/auth/login", lambda: {"json": {"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}}),
+        ("GET", "/api/auth/me", lambda: {}),
+        ("GET", "/api/categories", lambda: {}),
+        ("POST", "/api/categories", lambda: {"json": {"name": f"LT {uuid.uuid4().hex[:8]}"}}),
+        ("GET", "/api/products", lambda: {}),
+        ("GET", "/api/products?fields=name,sku,quantity", lambda: {}),
+        ("GET", "/api/products?search=", lambda: {"params": {"search": rng.choice(MATERIALS)}}),
+        ("GET", "/api/products?low_stock=true", lambda: {}),
+        ("GET", "/api/products/{product_id}", lambda: {"path": {"product_id": product_id()}}),
+        ("POST", "/api/products/batch-get", lambda: {"json": {"ids": rng.sample(ctx["product_ids"], min(100, len(ctx["product_ids"])))}}),
+        ("POST", "/api/products", new_product),
+        ("PUT", "/api/products/{product_id}",
+         lambda: {"path": {"product_id": product_id()}, "json": {"price": round(rng.uniform(10, 5000), 2)}}),
+        ("POST", "/api/products/bulk-update",
+         lambda: {"json": {"ids": rng.sample(ctx["product_ids"], min(100, len(ctx["product_ids"]))), "inc": {"price": 1}}}),
+        ("POST", "/api/upload", lambda: {"files": {"file": ("lt.png", PNG_BYTES, "image/png")}}),
+        ("GET", "/api/stats", lambda: {}),
+        ("GET", "/api/reports/low-stock", lambda: {}),
+        ("GET", "/api/reports/activity-logs", lambda: {}),
+        ("GET", "/api/reports/inventory", lambda: {}),
+        ("GET", "/api/reports/analytics", lambda: {}),
+        ("GET", "/api/reports/reorder", lambda: {}),
+        ("GET", "/api/reports/valuation-history", lambda: {"params": {"granularity": "hour"}}),
+        ("GET", "/api/cache/stats", lambda: {}),
+        ("GET", "/api/admins", lambda: {}),
+        ("POST", "/api/chat", lambda: {"json": {"message": "How many products are low on stock?"}}),
+        ("DELETE", "/api/products/{product_id}",
+         lambda: {"path": {"product_id": sinks["products"].pop() if sinks["products"] else str(uuid.uuid4())}}),
+        ("DELETE", "/api/categories/{category_id}",
+         lambda: {"path": {"category_id": sinks["categories"].pop() if sinks["categories"] else str(uuid.uuid4())}}),
+    ]
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def drive(client, method, template, make_kwargs, requests, concurrency, sinks) -> dict:
+    latencies = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            kwargs = make_kwargs()
+            path = template.split("?")[0].format(**kwargs.pop("path", {}))
+            query = template.partition("?")[2]
+            if query and "params" not in kwargs:
+                path = f"{path}?{query}"
+            start = time.perf_counter()
+            response = await client.request(method, path, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+            elif method == "POST":
+                body = response.json()
+                if template == "/api/products":
+                    sinks["products"].append(body["id"])
+                elif template == "/api/categories":
+                    sinks["categories"].append(body["id"])
+                elif template == "/api/upload":
+                    sinks["uploads"].append(body["filename"])
+
+    route_path = template.split("?")[0]
+    db_sum_before, db_count_before = metrics.request_roundtrips.totals((method, route_path))
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    db_sum, db_count = metrics.request_roundtrips.totals((method, route_path))
+
+    latencies.sort()
+    db_requests = db_count - db_count_before
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "db_ops_per_request": (db_sum - db_sum_before) / db_requests if db_requests else None,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for name, current in results["routes"].items():
+        previous = baseline.get("routes", {}).get(name)
+        if not previous:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']:.1f} -> {current['p95_ms']:.1f} ms")
+        if current["rps"] < previous["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {previous['rps']:.0f} -> {current['rps']:.0f} req/s")
+    return regressions
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    db_name = f"kuber_inventory_loadtest_{uuid.uuid4().hex[:8]}"
+    # The app's lifespan (which normally binds the storage) doesn't run under ASGITransport
+    if args.backend == "memory":
+        server.bind_storage(MemoryStorage())
+    elif args.backend == "mongomock":
+        from mongomock_motor import AsyncMongoMockClient
+        server.bind_database(AsyncMongoMockClient(), db_name)
+    else:
+        server.bind_database(server.create_mongo_client(), db_name)
+    sinks = {"products": [], "categories": [], "uploads": []}
+
+    try:
+        print(f"Seeding {args.products} products, {args.categories} categories, {args.months} months of activity ...")
+        if server.db is not None:
+            ctx = await seed(server.db, args)
+            await server.ensure_indexes()
+        else:
+            ctx = await seed(server.storage, args)
+
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=120) as client:
+            login = await client.post("/api/auth/login", json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+            client.headers["Authorization"] = f"Bearer {login.json()['token']}"
+
+            routes = build_routes(ctx, sinks, rng)
+            selected = [r for r in routes if not args.routes or any(f in f"{r[0]} {r[1]}" for f in args.routes)]
+            results = {}
+            header = f"{'route':<48} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'db ops':>7} {'errors':>6}"
+            print(header)
+            print("-" * len(header))
+            for method, template, make_kwargs in selected:
+                name = f"{method} {template}"
+                r = await drive(client, method, template, make_kwargs, args.requests, args.concurrency, sinks)
+                if args.backend != "mongod":
+                    r["db_ops_per_request"] = None
+                results[name] = r
+                db_ops = f"{r['db_ops_per_request']:.1f}" if r["db_ops_per_request"] is not None else "n/a"
+                print(f"{name:<48} {r['rps']:>9.1f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {db_ops:>7} {r['errors']:>6}")
+    finally:
+        for filename in sinks["uploads"]:
+            (server.UPLOADS_DIR / filename).unlink(missing_ok=True)
+        if server.client is not None:
+            await server.client.drop_database(db_name)
+
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "backend": args.backend,
+            "products": args.products,
+            "categories": args.categories,
+            "months": args.months,
+            "activity_per_day": args.activity_per_day,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "routes": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', choices=['memory', 'mongomock', 'mongod'], default='mongomock')
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--categories', type=int, default=8)
+    parser.add_argument('--months', type=int, default=1, help='months of activity-log history to seed')
+    parser.add_argument('--activity-per-day', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=200, help='requests per route')
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--routes', nargs='*', help='only run routes containing one of these substrings')
+    parser.add_argument('--output', help='write results JSON to this file')
+    parser.add_argument('--save-baseline', help='write results JSON as the new baseline')
+    parser.add_argument('--baseline', help='compare against this baseline JSON; exit 1 on regression')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed regression fraction (default 0.2)')
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    for target in (args.output, args.save_baseline):
+        if target:
+            Path(target).write_text(json.dumps(results, indent=2))
+            print(f"Wrote {target}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        if baseline.get("config", {}).get("products") != args.products:
+            print("WARNING: baseline was recorded with a different catalogue size", file=sys.stderr)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("REGRESSIONS:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            sys.exit(1)
+        print(f"OK: no regressions beyond {args.tolerance:.0%} of baseline")
+
+
+if __name__ == '__main__':
+    main()
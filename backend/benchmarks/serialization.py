@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Serialization benchmark: time and bytes-on-the-wire for a large product list.
+Compares FastAPI's default path (response_model validation + stdlib json) with
+the orjson fast path used by db_response() in server.py.
+Run from backend/: python benchmarks/serialization.py [--products 10000]
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'kuber_inventory_bench')
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from compression import brotli
+from server import ProductResponse
+
+CATEGORIES = ['Jewellery', 'Handicrafts', 'Textiles', 'Home Decor']
+
+
+def make_products(n: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc).isoformat()
+    return [
+        {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "name": f"Product {i}",
+            "sku": f"SKU-{i:07d}",
+            "description": "Handmade item with traditional finish " * rng.randint(0, 3),
+            "price": round(rng.lognormvariate(7, 1), 2),
+            "quantity": rng.randint(0, 500),
+            "category": rng.choice(CATEGORIES),
+            "images": [f"/uploads/{uuid.UUID(int=rng.getrandbits(128))}.png"] if rng.random() < 0.5 else [],
+            "low_stock_threshold": 10,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(n)
+    ]
+
+
+def timed(fn, repeat: int) -> tuple:
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    products = make_products(args.products)
+    adapter = TypeAdapter(List[ProductResponse])
+
+    def default_path():
+        validated = adapter.validate_python(products)
+        return json.dumps(jsonable_encoder(validated), ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+
+    def fast_path():
+        return orjson.dumps(products)
+
+    default_time, default_body = timed(default_path, args.repeat)
+    fast_time, fast_body = timed(fast_path, args.repeat)
+
+    print(f"{args.products} products (best of {args.repeat})")
+    print(f"  response_model + json : {default_time * 1000:8.1f} ms  {len(default_body):>10,} bytes")
+    print(f"  orjson fast path      : {fast_time * 1000:8.1f} ms  {len(fast_body):>10,} bytes  ({default_time / fast_time:.1f}x faster)")
+
+    gzip_time, gzipped = timed(lambda: gzip.compress(fast_body, compresslevel=6), args.repeat)
+    print(f"  + gzip (level 6)      : {gzip_time * 1000:8.1f} ms  {len(gzipped):>10,} bytes  ({len(fast_body) / len(gzipped):.1f}x smaller)")
+    if brotli is not None:
+        br_time, brotlied = timed(lambda: brotli.compress(fast_body, quality=4), args.repeat)
+        print(f"  + brotli (quality 4)  : {br_time * 1000:8.1f} ms  {len(brotlied):>10,} bytes  ({len(fast_body) / len(brotlied):.1f}x smaller)")
+    else:
+        print("  + brotli              : skipped (pip install brotli)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark: how long a fresh worker process takes to import
+server.py, run its lifespan startup (ping, indexes, migrations, cache
+invalidation bus) and answer its first request. Each run is a new Python
+process, so nothing is warm; the median of --runs is reported.
+
+Exits with status 1 if the median import or startup time exceeds its budget,
+or if a module that server.py imports lazily (chat, uploads, auth hashing,
+profiling, NumPy analytics) is loaded at import time.
+
+Run from backend/:
+    python benchmarks/startup.py --backend mongomock
+    python benchmarks/startup.py --backend mongod --startup-budget-ms 1500
+    python benchmarks/startup.py --backend memory
+
+--backend mongod uses MONGO_URL (default mongodb://localhost:27017) and a
+throwaway database that is dropped afterwards.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Imported where they are used in server.py; must not be loaded by `import server`
+LAZY_MODULES = ['httpx', 'bcrypt', 'pyinstrument', 'cProfile', 'numpy']
+
+
+def child(backend: str):
+    """One cold start, in this (fresh) process. Prints timings as JSON."""
+    import asyncio
+    import uuid
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+    os.environ['DB_NAME'] = f"kuber_inventory_startup_{uuid.uuid4().hex[:8]}"
+    if backend == 'memory':
+        os.environ['STORAGE_BACKEND'] = 'memory'
+
+    started = time.perf_counter()
+    import server
+    imported = time.perf_counter()
+    eager = [m for m in LAZY_MODULES if m in sys.modules]
+
+    if backend == 'mongomock':
+        from mongomock_motor import AsyncMongoMockClient
+        server.create_mongo_client = AsyncMongoMockClient
+
+    async def start():
+        import httpx  # the benchmark's client, imported before timing starts
+        t0 = time.perf_counter()
+        async with server.lifespan(server.app):
+            t1 = time.perf_counter()
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+                response = await client.get("/health")
+                response.raise_for_status()
+            t2 = time.perf_counter()
+            if server.client is not None:
+                await server.client.drop_database(os.environ['DB_NAME'])
+        return t1 - t0, t2 - t1
+
+    startup, first_request = asyncio.run(start())
+    print(json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "startup_ms": startup * 1000,
+        "first_request_ms": first_request * 1000,
+        "eager_modules": eager,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', choices=['memory', 'mongomock', 'mongod'], default='mongomock')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--import-budget-ms', type=float, default=1000)
+    parser.add_argument('--startup-budget-ms', type=float, default=2000)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.backend)
+        return
+
+    runs = []
+    for _ in range(args.runs):
+        out = subprocess.run(
+            [sys.executable, __file__, '--child', '--backend', args.backend],
+            cwd=BACKEND_DIR, capture_output=True, text=True,
+        )
+        if out.returncode != 0:
+            print(out.stderr, file=sys.stderr)
+            sys.exit(out.returncode)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    medians = {key: statistics.median(r[key] for r in runs) for key in ("import_ms", "startup_ms", "first_request_ms")}
+    print(f"{'phase':<16} {'median ms':>10} {'min ms':>9} {'max ms':>9}")
+    for key, median in medians.items():
+        values = [r[key] for r in runs]
+        print(f"{key[:-3]:<16} {median:>10.1f} {min(values):>9.1f} {max(values):>9.1f}")
+
+    failures = []
+    if medians["import_ms"] > args.import_budget_ms:
+        failures.append(f"import took {medians['import_ms']:.0f} ms (budget {args.import_budget_ms:.0f} ms)")
+    if medians["startup_ms"] > args.startup_budget_ms:
+        failures.append(f"startup took {medians['startup_ms']:.0f} ms (budget {args.startup_budget_ms:.0f} ms)")
+    eager = sorted({m for r in runs for m in r["eager_modules"]})
+    if eager:
+        failures.append(f"imported at startup but meant to be lazy: {', '.join(eager)}")
+    if failures:
+        print("OVER BUDGET:", file=sys.stderr)
+        for line in failures:
+            print(f"  {line}", file=sys.stderr)
+        sys.exit(1)
+    print("OK: within startup budget")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+In-process caches.
+
+CoalescingCache: request coalescing (single-flight) with an optional short TTL
+cache for aggregate results. Concurrent callers asking for the same key share
+one in-flight computation instead of each running their own product scan.
+With ttl > 0 the result is also kept for `ttl` seconds. invalidate() is called
+on writes: it drops cached values and detaches in-flight computations so later
+callers never receive data computed before the write.
+
+ReadThroughCache: bounded LRU for point lookups (product by id), invalidated
+per key on writes.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple
+
+# All caches, so writes can invalidate them together and /api/cache/stats can report them
+CACHES: List[Any] = []
+
+
+class CoalescingCache:
+    def __init__(self, name: str, ttl: float = 0.0):
+        self.name = name
+        self.ttl = ttl
+        self.version = 0
+        self._values: Dict[Hashable, Tuple[float, Any]] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+        CACHES.append(self)
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        if self.ttl > 0:
+            entry = self._values.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(compute())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, v=self.version: self._finish(key, t, v))
+        # shield: a cancelled (disconnected) caller must not cancel the shared computation
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Future, version: int):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Only cache results that no write has invalidated while they were computed
+        if self.ttl > 0 and version == self.version and not task.cancelled() and task.exception() is None:
+            self._values[key] = (time.monotonic() + self.ttl, task.result())
+
+    def invalidate(self):
+        self.version += 1
+        self.invalidations += 1
+        self._values.clear()
+        self._inflight.clear()
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+            "cached_keys": len(self._values),
+            "inflight": len(self._inflight),
+        }
+
+
+class ReadThroughCache:
+    """
+    LRU of documents by key. Callers take a version() token before reading from the
+    database and pass it to put(); if any key was discarded in between, the possibly
+    stale document is not cached.
+    """
+    def __init__(self, name: str, maxsize: int = 10000, ttl: float = 60.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._version = 0
+        self._values: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        CACHES.append(self)
+
+    def version(self) -> int:
+        return self._version
+
+    def get(self, key: Hashable) -> Any:
+        entry = self._values.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            self.misses += 1
+            return None
+        self._values.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any, version: int):
+        if self.maxsize <= 0 or version != self._version:
+            return
+        self._values[key] = (time.monotonic() + self.ttl, value)
+        self._values.move_to_end(key)
+        while len(self._values) > self.maxsize:
+            self._values.popitem(last=False)
+
+    def discard(self, key: Hashable):
+        self._version += 1
+        self.invalidations += 1
+        self._values.pop(key, None)
+
+    def invalidate(self):
+        self._version += 1
+        self.invalidations += 1
+        self._values.clear()
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "cached_keys": len(self._values),
+            "maxsize": self.maxsize,
+        }
+
+
+def invalidate_all():
+    """Invalidate every aggregate (coalescing) cache; point caches are invalidated per key."""
+    for cache in CACHES:
+        if isinstance(cache, CoalescingCache):
+            cache.invalidate()
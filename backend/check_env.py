@@ -14,11 +14,36 @@ try:
 except ImportError:
     pass
 
-REQUIRED = ['MONGO_URL', 'DB_NAME', 'JWT_SECRET_KEY']
+REQUIRED = ['JWT_SECRET_KEY']
+# Only needed with the MongoDB storage engine (STORAGE_BACKEND=mongo, the default)
+MONGO_REQUIRED = ['MONGO_URL', 'DB_NAME']
 AI_KEYS = ['GEMINI_API_KEY', 'OPENROUTER_API_KEY']
 
+def check_mongo_settings():
+    """Validate the optional MONGO_* / REPORT_* client settings (see db_settings.py)."""
+    from db_settings import SettingsError, load_mongo_settings
+    try:
+        settings = load_mongo_settings()
+    except SettingsError as e:
+        print("ERROR: Invalid MongoDB settings:", file=sys.stderr)
+        for error in e.errors:
+            print(f"  {error}", file=sys.stderr)
+        sys.exit(1)
+    for warning in settings.warnings:
+        print(f"WARNING: {warning}", file=sys.stderr)
+
+    workers = int(os.environ.get('WEB_CONCURRENCY', '1') or 1)
+    pool = settings.client_options.get('maxPoolSize', 100)
+    print(f"MongoDB: up to {workers * pool} connections ({workers} worker(s) x maxPoolSize {pool})")
+
 def main():
-    missing = [k for k in REQUIRED if not os.environ.get(k)]
+    backend = os.environ.get('STORAGE_BACKEND', 'mongo')
+    if backend not in ('mongo', 'memory'):
+        print(f"ERROR: STORAGE_BACKEND must be 'mongo' or 'memory', not {backend!r}", file=sys.stderr)
+        sys.exit(1)
+    uses_mongo = backend == 'mongo'
+
+    missing = [k for k in REQUIRED + (MONGO_REQUIRED if uses_mongo else []) if not os.environ.get(k)]
     if missing:
         print("ERROR: Missing required environment variables:", ", ".join(missing), file=sys.stderr)
         print("Set them in .env or your deployment platform (Render/Railway).", file=sys.stderr)
@@ -33,6 +58,12 @@ def main():
     if os.environ.get('JWT_SECRET_KEY') == 'your-secret-key-change-in-production':
         print("WARNING: Using default JWT_SECRET_KEY. Set a strong secret in production!", file=sys.stderr)
 
+    if uses_mongo:
+        check_mongo_settings()
+    else:
+        print("WARNING: STORAGE_BACKEND=memory keeps all data in process memory; it is lost on restart "
+              "and not shared between workers.", file=sys.stderr)
+
     print("OK: Required env vars present.")
 
 if __name__ == '__main__':
@@ -0,0 +1,150 @@
+"""
+MongoDB client settings from the environment: connection pool, timeouts, wire
+compression, write concern and read preference, plus the read preference and
+per-operation time budget used by report / analytics queries.
+
+Every value is validated up front; load_mongo_settings() raises SettingsError
+listing all problems, and check_env.py reports them before a deploy. Unset
+variables keep the driver defaults.
+"""
+import importlib.util
+import os
+from typing import Dict, List, Mapping, Optional
+
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
+from pymongo.write_concern import WriteConcern
+
+READ_PREFERENCES = ("primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest")
+# Wire compressors and the modules that can provide them (zlib ships with Python)
+COMPRESSORS = {"zstd": ("backports.zstd", "compression.zstd", "zstandard"), "snappy": ("snappy",), "zlib": ()}
+
+# (environment variable, client option, minimum)
+INT_OPTIONS = [
+    ("MONGO_MAX_POOL_SIZE", "maxPoolSize", 1),
+    ("MONGO_MIN_POOL_SIZE", "minPoolSize", 0),
+    ("MONGO_MAX_CONNECTING", "maxConnecting", 1),
+    ("MONGO_MAX_IDLE_TIME_MS", "maxIdleTimeMS", 1),
+    ("MONGO_WAIT_QUEUE_TIMEOUT_MS", "waitQueueTimeoutMS", 1),
+    ("MONGO_CONNECT_TIMEOUT_MS", "connectTimeoutMS", 1),
+    ("MONGO_SOCKET_TIMEOUT_MS", "socketTimeoutMS", 1),
+    ("MONGO_SERVER_SELECTION_TIMEOUT_MS", "serverSelectionTimeoutMS", 1),
+    ("MONGO_TIMEOUT_MS", "timeoutMS", 1),
+]
+DEFAULTS = {"MONGO_SERVER_SELECTION_TIMEOUT_MS": "30000"}
+
+
+class SettingsError(ValueError):
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+class MongoSettings:
+    def __init__(self, client_options: dict, report_read_preference, report_max_time_ms: int, warnings: List[str]):
+        # Keyword arguments for AsyncIOMotorClient
+        self.client_options = client_options
+        # Read preference for report / analytics reads (a pymongo ServerMode)
+        self.report_read_preference = report_read_preference
+        # maxTimeMS for report / analytics queries made during a request
+        self.report_max_time_ms = report_max_time_ms
+        self.warnings = warnings
+
+
+def _installed(modules) -> bool:
+    for module in modules:
+        try:
+            if importlib.util.find_spec(module) is not None:
+                return True
+        except ImportError:
+            pass
+    return not modules
+
+
+def _int(env: Mapping[str, str], name: str, minimum: int, errors: List[str], default: Optional[str] = None) -> Optional[int]:
+    raw = env.get(name, default)
+    if raw is None or raw == "":
+        return None
+    try:
+        value = int(raw)
+    except ValueError:
+        errors.append(f"{name} must be an integer (got {raw!r})")
+        return None
+    if value < minimum:
+        errors.append(f"{name} must be at least {minimum} (got {value})")
+        return None
+    return value
+
+
+def _is_number(raw: str) -> bool:
+    try:
+        float(raw)
+    except ValueError:
+        return False
+    return True
+
+
+def _read_preference(env: Mapping[str, str], name: str, default: str, errors: List[str], max_staleness: int = -1):
+    mode = env.get(name) or default
+    if mode not in READ_PREFERENCES:
+        errors.append(f"{name} must be one of {', '.join(READ_PREFERENCES)} (got {mode!r})")
+        return None
+    if mode == "primary":
+        max_staleness = -1
+    return make_read_preference(read_pref_mode_from_name(mode), None, max_staleness)
+
+
+def load_mongo_settings(env: Optional[Mapping[str, str]] = None) -> MongoSettings:
+    env = os.environ if env is None else env
+    errors: List[str] = []
+    warnings: List[str] = []
+    options: Dict[str, object] = {}
+
+    for name, option, minimum in INT_OPTIONS:
+        value = _int(env, name, minimum, errors, DEFAULTS.get(name))
+        if value is not None:
+            options[option] = value
+    if options.get("minPoolSize", 0) > options.get("maxPoolSize", 100):
+        errors.append("MONGO_MIN_POOL_SIZE must not exceed MONGO_MAX_POOL_SIZE")
+
+    compressors = [c.strip() for c in env.get("MONGO_COMPRESSORS", "").split(",") if c.strip()]
+    for compressor in compressors:
+        if compressor not in COMPRESSORS:
+            errors.append(f"MONGO_COMPRESSORS: unknown compressor {compressor!r} (use {', '.join(COMPRESSORS)})")
+        elif not _installed(COMPRESSORS[compressor]):
+            warnings.append(f"MONGO_COMPRESSORS: {compressor} needs the {COMPRESSORS[compressor][0]} package; it will be skipped")
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+
+    w = env.get("MONGO_WRITE_CONCERN", "")
+    wtimeout = _int(env, "MONGO_WRITE_TIMEOUT_MS", 1, errors)
+    if w and not w.isdigit() and (_is_number(w) or w != w.strip()):
+        # Otherwise e.g. -1 would be taken for a tag name and only fail on the first write
+        errors.append(f"MONGO_WRITE_CONCERN must be a non-negative integer, majority or a tag name (got {w!r})")
+    elif w or wtimeout is not None:
+        w_value = int(w) if w.isdigit() else (w or None)
+        try:
+            WriteConcern(w=w_value, wtimeout=wtimeout)
+        except (TypeError, ValueError) as e:
+            errors.append(f"MONGO_WRITE_CONCERN: {e}")
+        if w_value == 0:
+            warnings.append("MONGO_WRITE_CONCERN=0 makes writes unacknowledged; write errors will go unnoticed")
+        if w_value is not None:
+            options["w"] = w_value
+        if wtimeout is not None:
+            options["wTimeoutMS"] = wtimeout
+
+    read_preference = _read_preference(env, "MONGO_READ_PREFERENCE", "primary", errors)
+    if read_preference is not None:
+        options["read_preference"] = read_preference
+        if read_preference.mongos_mode != "primary":
+            warnings.append("MONGO_READ_PREFERENCE is not primary: reads right after a write may not see it")
+
+    max_staleness = _int(env, "REPORT_MAX_STALENESS_S", 90, errors)
+    report_read_preference = _read_preference(
+        env, "REPORT_READ_PREFERENCE", "secondaryPreferred", errors, -1 if max_staleness is None else max_staleness
+    )
+    report_max_time_ms = _int(env, "REPORT_MAX_TIME_MS", 1, errors, "30000")
+
+    if errors:
+        raise SettingsError(errors)
+    return MongoSettings(options, report_read_preference, report_max_time_ms, warnings)
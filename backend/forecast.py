@@ -0,0 +1,181 @@
+"""
+Stock velocity and reorder forecasting from the activity log.
+
+DemandHistory keeps daily per-product rollups of stock movements (units
+consumed by `stock_reduced`, units received by `stock_added`) for the last
+`window_days` days, as NumPy arrays per day. The first refresh reads the
+whole window from `activity_logs`; later refreshes re-read only the days that
+may still change (from the previous refresh's day onwards), so keeping the
+history current costs one small range query on the timestamp index. Each day
+is recomputed from scratch, so refreshing twice is harmless.
+
+reorder_plan() combines the history with the catalogue snapshot's stock
+levels in one vectorized pass over the whole catalogue: daily velocity,
+days until stockout, reorder point (lead-time demand plus safety stock) and
+the suggested order quantity to cover `coverage_days` beyond the lead time.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STOCK_ACTIONS = ["stock_added", "stock_reduced"]
+# Logs are timestamped before they are inserted; re-read a little before the last refresh
+SETTLE_SECONDS = 300
+
+
+class DemandHistory:
+    def __init__(self, get_storage: Callable[[], Any], window_days: int = 30, batch_size: int = 10000):
+        self.get_storage = get_storage
+        self.window_days = window_days
+        self.batch_size = batch_size
+        self.product_codes: Dict[str, int] = {}
+        self.product_ids: List[str] = []
+        # day ("YYYY-MM-DD") -> (product codes, units consumed, units received)
+        self.days: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        # Earliest day that may still receive logs; None until the first refresh
+        self.open_day: Optional[str] = None
+        self.refreshed_at: Optional[datetime] = None
+        self.version = 0
+        self.logs_read = 0
+        self._dirty = True
+        self._lock: Optional[asyncio.Lock] = None
+
+    def mark_dirty(self):
+        self._dirty = True
+
+    def _code(self, product_id: str) -> int:
+        code = self.product_codes.get(product_id)
+        if code is None:
+            code = self.product_codes[product_id] = len(self.product_ids)
+            self.product_ids.append(product_id)
+        return code
+
+    async def ensure_fresh(self, max_age: float = 60.0):
+        now = datetime.now(timezone.utc)
+        if not self._dirty and self.refreshed_at and (now - self.refreshed_at).total_seconds() < max_age:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self._dirty and self.refreshed_at and (now - self.refreshed_at).total_seconds() < max_age:
+                return
+            self._dirty = False
+            try:
+                await self.refresh(now)
+            except Exception:
+                self._dirty = True
+                raise
+
+    async def refresh(self, now: datetime):
+        started = time.perf_counter()
+        window_start = (now - timedelta(days=self.window_days)).date().isoformat()
+        from_day = max(self.open_day or window_start, window_start)
+        logs = await self.get_storage().activity_logs.movements(from_day, STOCK_ACTIONS, batch_size=self.batch_size)
+        self.ingest(logs, from_day, now)
+        logger.debug(f"Demand history refreshed from {from_day}: {len(logs)} logs in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    def ingest(self, logs: Iterable[dict], from_day: str, now: datetime):
+        """Replace the rollups for days >= from_day with these logs (all of them from those days)."""
+        window_start = (now - timedelta(days=self.window_days)).date().isoformat()
+        # Collect column-wise, then roll up all days in one vectorized pass
+        days: List[str] = []
+        codes: List[int] = []
+        changes: List[float] = []
+        for log in logs:
+            days.append(log["timestamp"][:10])
+            codes.append(self._code(log["product_id"]))
+            changes.append(log.get("quantity_change") or 0)
+        self.logs_read += len(days)
+
+        for day in [d for d in self.days if d >= from_day or d < window_start]:
+            del self.days[day]
+        if days:
+            day_names, day_index = np.unique(np.array(days), return_inverse=True)
+            code_array = np.array(codes, dtype=np.int64)
+            change_array = np.array(changes, dtype=np.float64)
+            keys, inverse = np.unique(day_index.astype(np.int64) << 32 | code_array, return_inverse=True)
+            consumed = np.bincount(inverse, weights=np.maximum(-change_array, 0), minlength=len(keys))
+            received = np.bincount(inverse, weights=np.maximum(change_array, 0), minlength=len(keys))
+            key_days = keys >> 32
+            key_codes = (keys & 0xFFFFFFFF).astype(np.int32)
+            for i, day in enumerate(day_names):
+                if day < window_start:
+                    continue
+                rows = key_days == i
+                self.days[str(day)] = (key_codes[rows], consumed[rows], received[rows])
+
+        self.open_day = (now - timedelta(seconds=SETTLE_SECONDS)).date().isoformat()
+        self.refreshed_at = now
+        self.version += 1
+
+    def window_totals(self, now: datetime) -> Tuple[np.ndarray, np.ndarray, np.ndarray, float]:
+        """
+        Per product code: units consumed, sum of squared daily consumption, units received,
+        and the window length in days (including the elapsed part of today).
+        """
+        size = len(self.product_ids)
+        consumed = np.zeros(size)
+        consumed_sq = np.zeros(size)
+        received = np.zeros(size)
+        for codes, day_consumed, day_received in self.days.values():
+            consumed += np.bincount(codes, weights=day_consumed, minlength=size)
+            consumed_sq += np.bincount(codes, weights=day_consumed ** 2, minlength=size)
+            received += np.bincount(codes, weights=day_received, minlength=size)
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        elapsed_today = (now - midnight).total_seconds() / 86400
+        return consumed, consumed_sq, received, self.window_days + elapsed_today
+
+    def stats(self) -> dict:
+        return {
+            "window_days": self.window_days,
+            "days": len(self.days),
+            "products_with_movements": len(self.product_ids),
+            "logs_read": self.logs_read,
+            "refreshed_at": self.refreshed_at.isoformat() if self.refreshed_at else None,
+        }
+
+
+def reorder_plan(product_ids: Iterable[str], quantity: np.ndarray, history: DemandHistory, now: datetime,
+                 lead_time_days: float = 7.0, coverage_days: float = 30.0, service_z: float = 1.65) -> Dict[str, np.ndarray]:
+    """
+    Arrays aligned with `product_ids` / `quantity` (e.g. the live rows of the catalogue snapshot).
+
+    consumed / received units moved out / in over the window
+    velocity            mean units consumed per day over the window
+    days_until_stockout quantity / velocity (inf without demand)
+    reorder_point       velocity * lead time + safety stock, where safety stock is
+                        service_z * daily standard deviation * sqrt(lead time)
+    suggested_order     units to bring stock up to reorder_point + coverage_days of demand,
+                        when stock is at or below the reorder point; 0 otherwise
+    """
+    consumed, consumed_sq, received, days = history.window_totals(now)
+    # Products without movements get code -1, which indexes the zero appended to each total
+    codes = np.fromiter((history.product_codes.get(pid, -1) for pid in product_ids), dtype=np.int64, count=len(quantity))
+    total = np.append(consumed, 0.0)[codes]
+    total_sq = np.append(consumed_sq, 0.0)[codes]
+
+    velocity = total / days
+    variance = np.maximum(total_sq / days - velocity ** 2, 0.0)
+    safety_stock = service_z * np.sqrt(variance) * np.sqrt(lead_time_days)
+    reorder_point = velocity * lead_time_days + safety_stock
+    with np.errstate(divide="ignore"):
+        days_until_stockout = np.where(velocity > 0, quantity / np.where(velocity > 0, velocity, 1), np.inf)
+    needs_reorder = (velocity > 0) & (quantity <= reorder_point)
+    target = reorder_point + velocity * coverage_days
+    suggested_order = np.where(needs_reorder, np.ceil(np.maximum(target - quantity, 0)), 0)
+    return {
+        "consumed": total,
+        "received": np.append(received, 0.0)[codes],
+        "velocity": velocity,
+        "days_until_stockout": days_until_stockout,
+        "reorder_point": reorder_point,
+        "safety_stock": safety_stock,
+        "needs_reorder": needs_reorder,
+        "suggested_order": suggested_order,
+    }
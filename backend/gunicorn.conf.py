@@ -0,0 +1,21 @@
+"""
+Gunicorn settings for multi-worker deployments (used by start.sh when WEB_CONCURRENCY > 1).
+
+Each worker is a separate process with its own MongoDB client and caches (created in the
+app's lifespan); caches stay consistent across workers through the invalidation bus.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
+# One worker per core by default
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Report jobs and /api/chat can take a while; keep slow requests from killing workers
+timeout = int(os.environ.get('WORKER_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then to bound memory growth from caches and uploads
+max_requests = int(os.environ.get('WORKER_MAX_REQUESTS', '10000'))
+max_requests_jitter = max_requests // 10
+accesslog = "-"
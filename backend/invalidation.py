@@ -0,0 +1,149 @@
+"""
+Cross-process cache invalidation for multi-worker deployments.
+
+Every write bumps the inventory version in the `data_versions` collection
+(see inventory_changed in server.py) and appends the ids of the products it
+wrote to the document's `changes` list (the last CHANGE_HISTORY entries; None
+when the write touched more than CHANGE_MAX_IDS products or a whole
+category). Each worker process follows that document - through a change
+stream when the deployment supports one (replica sets, Atlas), otherwise by
+polling every `interval` seconds - and when the version moves because of
+another process, passes the written ids to its subscribers so they can drop
+just those products. Only when ids are unknown (None, or versions that fell
+out of the history) do subscribers get None and drop everything.
+Writes made by this process are reported through local_write(), so they
+don't trigger a second, redundant invalidation.
+"""
+import asyncio
+import logging
+from typing import Any, Callable, List, Optional, Sequence, Set
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+VERSIONS_COLLECTION = "data_versions"
+VERSION_ID = "inventory"
+# Per-write product id lists kept on the version document, and the most ids one entry holds
+CHANGE_HISTORY = 50
+CHANGE_MAX_IDS = 100
+
+
+class InvalidationBus:
+    def __init__(self, mode: str = "auto", interval: float = 1.0):
+        # mode: "auto" (change stream, falling back to polling), "poll", or "off"
+        self.mode = mode
+        self.interval = interval
+        # Highest version whose writes this process has accounted for
+        self.version = 0
+        self.remote_invalidations = 0
+        self.full_invalidations = 0
+        self._callbacks: List[Callable[[Optional[List[str]]], Any]] = []
+        # Versions this process produced ahead of self.version; the follower skips them
+        self._own: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, callback: Callable[[Optional[List[str]]], Any]):
+        """`callback(product_ids)` runs after remote writes; product_ids is None when unknown."""
+        self._callbacks.append(callback)
+
+    def _invalidate(self, product_ids: Optional[List[str]] = None):
+        self.remote_invalidations += 1
+        if product_ids is None:
+            self.full_invalidations += 1
+        for callback in self._callbacks:
+            callback(product_ids)
+
+    def _observe(self, version: int, changes: Sequence[Optional[List[str]]] = ()):
+        """
+        Catch up to `version`. changes[-1] holds the ids written by `version`, changes[-2]
+        those of version - 1 and so on; versions older than the history are unknown.
+        """
+        if version <= self.version:
+            return
+        if version - self.version > len(changes) + len(self._own):
+            # Some remote versions fell out of the history
+            self._invalidate()
+        else:
+            remote = [v for v in range(self.version + 1, version + 1) if v not in self._own]
+            if remote:
+                product_ids: Optional[set] = set()
+                for missed in remote:
+                    position = len(changes) - 1 - (version - missed)
+                    if position < 0 or changes[position] is None:
+                        product_ids = None
+                        break
+                    product_ids.update(changes[position])
+                self._invalidate(None if product_ids is None else sorted(product_ids))
+        self._own = {v for v in self._own if v > version}
+        self.version = version
+
+    def local_write(self, version: int):
+        """Record a version this process produced. A gap means another process wrote in between."""
+        if version == self.version + 1:
+            self.version = version
+        elif version > self.version:
+            if self._task is None:
+                # Nobody follows the document to say what the other process wrote
+                self._invalidate()
+                self.version = version
+            else:
+                self._own.add(version)
+
+    async def start(self, db):
+        doc = await db[VERSIONS_COLLECTION].find_one({"_id": VERSION_ID})
+        self.version = doc["version"] if doc else 0
+        if self.mode != "off":
+            self._task = asyncio.ensure_future(self._follow(db))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _follow(self, db):
+        if self.mode == "auto":
+            try:
+                await self._watch(db)
+            except OperationFailure as e:
+                # Standalone mongod has no change streams
+                logger.info(f"Change streams unavailable ({e.code}); polling for cache invalidation")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Change stream for cache invalidation stopped: {e}; polling instead")
+        await self._poll(db)
+
+    async def _watch(self, db):
+        pipeline = [{"$match": {"documentKey._id": VERSION_ID}}]
+        async with db[VERSIONS_COLLECTION].watch(pipeline, full_document="updateLookup") as stream:
+            logger.info("Following data version changes through a change stream")
+            async for change in stream:
+                document = change.get("fullDocument") or {}
+                self._observe(document.get("version", self.version + 1), document.get("changes", ()))
+
+    async def _poll(self, db):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                # The id history is only read when the version moved
+                doc = await db[VERSIONS_COLLECTION].find_one({"_id": VERSION_ID}, {"version": 1})
+                if doc and doc["version"] > self.version:
+                    doc = await db[VERSIONS_COLLECTION].find_one({"_id": VERSION_ID})
+            except PyMongoError as e:
+                logger.warning(f"Cache invalidation poll failed: {e}")
+                continue
+            if doc:
+                self._observe(doc["version"], doc.get("changes", ()))
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "version": self.version,
+            "remote_invalidations": self.remote_invalidations,
+            "full_invalidations": self.full_invalidations,
+        }
@@ -0,0 +1,149 @@
+"""
+Background report jobs.
+
+POST a report request, get a job id back immediately, poll (or long-poll) the
+job, then download the result file. Job state lives in the storage's
+`report_jobs` repository (a collection shared by all worker processes with
+MongoDB), so any worker can answer a poll; results are JSON files in
+`results_dir`, named by a hash of (report, params, dataset identity, data
+version, plus a "variant" for reports that also depend on something other
+than the data, such as the current date). A request whose result already
+exists for the current dataset and data version completes immediately
+without recomputing, and concurrent identical requests share one
+job. At most `concurrency` reports are computed at once per process.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import orjson
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+ReportBuilder = Callable[[dict], Awaitable[Any]]
+
+
+def result_key(report: str, params: dict, data_version: int, variant: Any = None, dataset: Optional[str] = None) -> str:
+    key = {"report": report, "params": params, "version": data_version, "dataset": dataset}
+    if variant is not None:
+        key["variant"] = variant
+    raw = orjson.dumps(key, option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(raw).hexdigest()[:32]
+
+
+class ReportJobs:
+    def __init__(self, get_storage: Callable[[], Any], results_dir: Path, concurrency: int = 2,
+                 timeout: float = 600.0, keep_seconds: float = 86400.0):
+        self.get_storage = get_storage
+        self.results_dir = results_dir
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.keep_seconds = keep_seconds
+        self.builders: Dict[str, ReportBuilder] = {}
+        self.variants: Dict[str, Callable[[], Any]] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # Strong references so running jobs aren't garbage collected
+        self._tasks = set()
+
+    def register(self, report: str, builder: ReportBuilder, variant: Optional[Callable[[], Any]] = None):
+        """`variant` returns extra result-cache key material, e.g. the date for time-dependent reports."""
+        self.builders[report] = builder
+        if variant is not None:
+            self.variants[report] = variant
+
+    def result_path(self, key: str) -> Path:
+        return self.results_dir / f"{key}.json"
+
+    async def submit(self, report: str, params: dict, data_version: int, admin_email: str,
+                     dataset: Optional[str] = None) -> dict:
+        variant = self.variants.get(report)
+        key = result_key(report, params, data_version, variant() if variant else None, dataset)
+        jobs = self.get_storage().report_jobs
+        now = datetime.now(timezone.utc)
+        job = {
+            "id": str(uuid.uuid4()),
+            "report": report,
+            "params": params,
+            "key": key,
+            "data_version": data_version,
+            "dataset": dataset,
+            "admin_email": admin_email,
+            "created_at": now.isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+            "cached": False,
+        }
+
+        if self.result_path(key).exists():
+            job.update(status="completed", cached=True, finished_at=now.isoformat())
+            await jobs.insert_one(dict(job))
+            return job
+
+        # Share a pending/running job for the same key (unless it looks abandoned)
+        existing = await jobs.find_active(
+            key, datetime.fromtimestamp(now.timestamp() - self.timeout, timezone.utc).isoformat()
+        )
+        if existing:
+            return existing
+
+        job["status"] = "pending"
+        await jobs.insert_one(dict(job))
+        task = asyncio.ensure_future(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self.prune_results()
+        return job
+
+    async def _run(self, job: dict):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        jobs = self.get_storage().report_jobs
+        async with self._semaphore:
+            await jobs.update(job["id"], {"status": "running", "started_at": datetime.now(timezone.utc).isoformat()})
+            try:
+                result = await asyncio.wait_for(self.builders[job["report"]](job["params"]), self.timeout)
+                await run_in_threadpool(self._write_result, job["key"], result)
+                update = {"status": "completed"}
+            except asyncio.TimeoutError:
+                update = {"status": "failed", "error": f"Report timed out after {self.timeout:.0f}s"}
+            except Exception as e:
+                logger.error(f"Report job {job['id']} ({job['report']}) failed: {e}")
+                update = {"status": "failed", "error": str(e)}
+            update["finished_at"] = datetime.now(timezone.utc).isoformat()
+            await jobs.update(job["id"], update)
+
+    def _write_result(self, key: str, result: Any):
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.results_dir / f"{key}.{uuid.uuid4().hex}.tmp"
+        tmp.write_bytes(orjson.dumps(result, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY))
+        tmp.replace(self.result_path(key))
+
+    def prune_results(self):
+        if not self.results_dir.exists():
+            return
+        cutoff = time.time() - self.keep_seconds
+        for path in self.results_dir.glob("*.json"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                pass
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self.get_storage().report_jobs.get(job_id)
+
+    async def wait(self, job_id: str, timeout: float, interval: float = 0.5) -> Optional[dict]:
+        """Long-poll: return the job once it has finished, or as it is after `timeout` seconds."""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await self.get(job_id)
+            if job is None or job["status"] in ("completed", "failed") or time.monotonic() >= deadline:
+                return job
+            await asyncio.sleep(interval)
@@ -0,0 +1,97 @@
+"""
+Admission control for expensive endpoints.
+
+ConcurrencyLimiter caps how many requests of one kind run at once; extra
+requests queue for up to `queue_timeout` seconds and are then rejected
+(503), so a burst of report or chat requests can't exhaust memory or the
+MongoDB pool while cheap CRUD requests wait behind them.
+
+RateLimiter is a per-key (per-admin) token bucket: `per_minute` requests
+per minute, in bursts of up to `burst`. Over the limit is rejected (429).
+
+Both raise AdmissionRejected carrying a Retry-After value in seconds. Limits
+are per worker process.
+"""
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+
+from metrics import admission_rejections
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    def __init__(self, name: str, limit: int, queue_timeout: float = 5.0):
+        self.name = name
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.limit <= 0:
+            yield
+            return
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            admission_rejections.inc((self.name, "overloaded"))
+            raise AdmissionRejected(
+                503, f"Too many {self.name} requests in progress; try again shortly",
+                max(1, math.ceil(self.queue_timeout)),
+            )
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+
+class RateLimiter:
+    def __init__(self, name: str, per_minute: float, burst: Optional[int] = None, max_keys: int = 10000):
+        self.name = name
+        self.rate = per_minute / 60.0
+        self.burst = burst if burst is not None else max(1, int(per_minute))
+        self.max_keys = max_keys
+        # key -> (tokens, last refill time)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def acquire(self, key: str):
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        tokens, last = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            admission_rejections.inc((self.name, "rate_limited"))
+            raise AdmissionRejected(
+                429, f"Rate limit for {self.name} exceeded", max(1, math.ceil((1 - tokens) / self.rate))
+            )
+        self._buckets[key] = (tokens - 1, now)
+        if len(self._buckets) > self.max_keys:
+            self._prune(now)
+
+    def _prune(self, now: float):
+        # Buckets that have refilled completely carry no state worth keeping
+        full_after = self.burst / self.rate
+        for key, (_, last) in list(self._buckets.items()):
+            if now - last >= full_after:
+                del self._buckets[key]
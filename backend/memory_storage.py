@@ -0,0 +1,430 @@
+"""
+In-process storage engine (STORAGE_BACKEND=memory).
+
+Implements the repositories of storage.py over plain dicts, with the indexes
+the API's access paths need, mirroring the MongoDB indexes in server.py:
+
+- products: hash index on id (the document dict) and on SKU, and per category
+  id / category name a sorted index on name - the (category_id, name) and
+  (category, name) compound indexes
+- activity logs: sorted index on timestamp, so "newest first" and "since"
+  queries walk the index instead of sorting every log
+- admins by email, categories by id and name, report jobs by id, valuation
+  snapshots by granularity sorted on bucket
+
+Everything runs on the event loop thread without awaiting, so each operation
+is atomic. Data lives only as long as the process; there is no persistence and
+no sharing between worker processes, so use it with a single worker (tests,
+load tests, demos, edge deployments seeded at startup).
+"""
+import re
+import uuid
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Hashable, Iterator, List, Optional
+
+from storage import (
+    DEFAULT_LOW_STOCK_THRESHOLD,
+    ActivityRepository,
+    AdminRepository,
+    CategoryRepository,
+    ProductFilter,
+    ProductRepository,
+    ReportJobRepository,
+    Storage,
+    ValuationSnapshotRepository,
+)
+
+
+def project(doc: dict, projection: Optional[dict]) -> dict:
+    """Copy of `doc` limited by a MongoDB-style inclusion or exclusion projection."""
+    fields = {k: v for k, v in (projection or {}).items() if k != "_id"}
+    if not fields:
+        return dict(doc)
+    if any(fields.values()):
+        return {k: v for k, v in doc.items() if k in fields}
+    return {k: v for k, v in doc.items() if k not in fields}
+
+
+class SortedIndex:
+    """Keys kept sorted (bisect) with the id of the document each belongs to."""
+    def __init__(self):
+        self.keys: List[Any] = []
+        self.ids: List[Hashable] = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(self, key, doc_id):
+        i = bisect_right(self.keys, key)
+        self.keys.insert(i, key)
+        self.ids.insert(i, doc_id)
+
+    def add_many(self, pairs: List[tuple]):
+        # Inserting one by one shifts the lists each time; a large batch is cheaper to merge by sorting
+        if len(pairs) * 8 < len(self.keys):
+            for key, doc_id in pairs:
+                self.add(key, doc_id)
+            return
+        merged = sorted(list(zip(self.keys, self.ids)) + list(pairs), key=lambda pair: pair[0])
+        self.keys = [key for key, _ in merged]
+        self.ids = [doc_id for _, doc_id in merged]
+
+    def remove(self, key, doc_id):
+        i = bisect_left(self.keys, key)
+        while i < len(self.keys) and self.keys[i] == key:
+            if self.ids[i] == doc_id:
+                del self.keys[i]
+                del self.ids[i]
+                return
+            i += 1
+
+    def range(self, low=None, high=None, reverse: bool = False) -> Iterator[Hashable]:
+        """Ids with low <= key < high (either bound optional), in key order."""
+        start = 0 if low is None else bisect_left(self.keys, low)
+        stop = len(self.keys) if high is None else bisect_left(self.keys, high)
+        if reverse:
+            return (self.ids[i] for i in range(stop - 1, start - 1, -1))
+        return (self.ids[i] for i in range(start, stop))
+
+
+def _add_to(index: Dict[Any, Dict[str, None]], key, doc_id: str):
+    index.setdefault(key, {})[doc_id] = None
+
+
+def _remove_from(index: Dict[Any, Dict[str, None]], key, doc_id: str):
+    ids = index.get(key)
+    if ids is not None:
+        ids.pop(doc_id, None)
+        if not ids:
+            del index[key]
+
+
+class MemoryAdminRepository(AdminRepository):
+    def __init__(self):
+        self.by_email: Dict[str, dict] = {}
+
+    async def get_by_email(self, email, projection=None):
+        doc = self.by_email.get(email)
+        return None if doc is None else project(doc, projection)
+
+    async def list(self, projection=None, limit=1000):
+        return [project(doc, projection) for doc in list(self.by_email.values())[:limit]]
+
+    async def insert_one(self, doc):
+        # Like the collection (no unique index on email), a later duplicate isn't rejected; the first one wins
+        self.by_email.setdefault(doc["email"], dict(doc))
+
+
+class MemoryCategoryRepository(CategoryRepository):
+    def __init__(self):
+        self.docs: Dict[str, dict] = {}
+        self.by_name: Dict[str, Dict[str, None]] = {}
+
+    async def get(self, category_id, projection=None):
+        doc = self.docs.get(category_id)
+        return None if doc is None else project(doc, projection)
+
+    async def get_by_name(self, name, projection=None):
+        ids = self.by_name.get(name)
+        return project(self.docs[next(iter(ids))], projection) if ids else None
+
+    async def list(self, limit=1000, max_time_ms=None):
+        return [dict(doc) for doc in list(self.docs.values())[:limit]]
+
+    async def count(self, max_time_ms=None):
+        return len(self.docs)
+
+    async def insert_one(self, doc):
+        doc = dict(doc)
+        self.docs[doc["id"]] = doc
+        _add_to(self.by_name, doc["name"], doc["id"])
+
+    async def insert_many(self, docs, ordered=True):
+        for doc in docs:
+            await self.insert_one(doc)
+
+    async def update(self, category_id, fields):
+        doc = self.docs.get(category_id)
+        if doc is None:
+            return
+        _remove_from(self.by_name, doc["name"], category_id)
+        doc.update(fields)
+        _add_to(self.by_name, doc["name"], category_id)
+
+    async def delete(self, category_id):
+        doc = self.docs.pop(category_id, None)
+        if doc is not None:
+            _remove_from(self.by_name, doc["name"], category_id)
+
+
+# Product fields the indexes are built on; updates touching them re-index the product
+PRODUCT_INDEXED_FIELDS = ("sku", "category_id", "category", "name")
+
+
+class MemoryProductRepository(ProductRepository):
+    def __init__(self):
+        # Hash index on id: the documents themselves, in insertion order
+        self.docs: Dict[str, dict] = {}
+        self.by_sku: Dict[str, Dict[str, None]] = {}
+        # category id -> sorted index on name
+        self.by_category: Dict[str, SortedIndex] = {}
+        # category name (free text, set with or without an id) -> sorted index on name
+        self.by_category_name: Dict[str, SortedIndex] = {}
+
+    def _index(self, doc: dict):
+        _add_to(self.by_sku, doc.get("sku"), doc["id"])
+        for indexes, key in ((self.by_category, doc.get("category_id")), (self.by_category_name, doc.get("category"))):
+            if key is not None:
+                indexes.setdefault(key, SortedIndex()).add(doc.get("name") or "", doc["id"])
+
+    def _unindex(self, doc: dict):
+        _remove_from(self.by_sku, doc.get("sku"), doc["id"])
+        for indexes, key in ((self.by_category, doc.get("category_id")), (self.by_category_name, doc.get("category"))):
+            index = indexes.get(key)
+            if index is not None:
+                index.remove(doc.get("name") or "", doc["id"])
+                if not len(index):
+                    del indexes[key]
+
+    def _modify(self, doc: dict, set_fields: dict, inc_fields: Optional[dict] = None) -> bool:
+        before = dict(doc)
+        reindex = any(f in set_fields for f in PRODUCT_INDEXED_FIELDS)
+        if reindex:
+            self._unindex(doc)
+        doc.update(set_fields)
+        for field, amount in (inc_fields or {}).items():
+            doc[field] = (doc.get(field) or 0) + amount
+        if reindex:
+            self._index(doc)
+        return doc != before
+
+    def _matches(self, doc: dict, filter: ProductFilter, pattern) -> bool:
+        if filter.category_id and doc.get("category_id") != filter.category_id:
+            return False
+        if filter.category and doc.get("category") != filter.category:
+            return False
+        if pattern is not None and not (pattern.search(doc.get("name") or "") or pattern.search(doc.get("sku") or "")):
+            return False
+        if filter.low_stock:
+            threshold = doc.get("low_stock_threshold")
+            if (doc.get("quantity") or 0) > (DEFAULT_LOW_STOCK_THRESHOLD if threshold is None else threshold):
+                return False
+        return True
+
+    async def get(self, product_id, projection=None):
+        doc = self.docs.get(product_id)
+        return None if doc is None else project(doc, projection)
+
+    async def find_by_ids(self, ids, projection=None, max_time_ms=None):
+        return [project(self.docs[pid], projection) for pid in dict.fromkeys(ids) if pid in self.docs]
+
+    async def find_by_skus(self, skus, projection=None):
+        return [
+            project(self.docs[pid], projection)
+            for sku in dict.fromkeys(skus) for pid in self.by_sku.get(sku, ())
+        ]
+
+    async def find(self, filter, projection=None, limit=None, max_time_ms=None):
+        if filter.category_id or filter.category:
+            if filter.category_id:
+                index = self.by_category.get(filter.category_id)
+            else:
+                index = self.by_category_name.get(filter.category)
+            candidates = (self.docs[pid] for pid in index.range()) if index else iter(())
+        else:
+            candidates = iter(self.docs.values())
+        pattern = re.compile(filter.search, re.IGNORECASE) if filter.search else None
+        found = []
+        for doc in candidates:
+            if limit is not None and len(found) >= limit:
+                break
+            if self._matches(doc, filter, pattern):
+                found.append(project(doc, projection))
+        return found
+
+    async def count_in_category(self, category_id):
+        index = self.by_category.get(category_id)
+        return len(index) if index else 0
+
+    async def count_by_category_id(self):
+        return {category_id: len(index) for category_id, index in self.by_category.items()}
+
+    async def valuation_by_category(self, max_time_ms=None):
+        rows: Dict[str, dict] = {}
+        for doc in self.docs.values():
+            row = rows.get(doc.get("category") or "")
+            if row is None:
+                row = rows[doc.get("category") or ""] = {
+                    "category": doc.get("category") or "", "products": 0, "quantity": 0, "stock_value": 0.0,
+                    "low_stock_items": 0, "out_of_stock_items": 0,
+                }
+            quantity = doc.get("quantity") or 0
+            threshold = doc.get("low_stock_threshold")
+            row["products"] += 1
+            row["quantity"] += quantity
+            row["stock_value"] += (doc.get("price") or 0) * quantity
+            row["low_stock_items"] += quantity <= (DEFAULT_LOW_STOCK_THRESHOLD if threshold is None else threshold)
+            row["out_of_stock_items"] += quantity == 0
+        return list(rows.values())
+
+    async def insert_one(self, doc):
+        if doc["id"] in self.docs:
+            raise ValueError(f"Duplicate product id {doc['id']}")
+        doc = dict(doc)
+        self.docs[doc["id"]] = doc
+        self._index(doc)
+
+    async def insert_many(self, docs, ordered=True):
+        for doc in docs:
+            await self.insert_one(doc)
+
+    async def update(self, product_id, fields):
+        doc = self.docs.get(product_id)
+        if doc is not None:
+            self._modify(doc, fields)
+
+    async def update_many(self, ids, set_fields, inc_fields=None):
+        modified = 0
+        for pid in dict.fromkeys(ids):
+            doc = self.docs.get(pid)
+            if doc is not None and self._modify(doc, set_fields, inc_fields):
+                modified += 1
+        return modified
+
+    async def update_category(self, category_id, fields):
+        index = self.by_category.get(category_id)
+        ids = list(index.range()) if index else []
+        return await self.update_many(ids, fields)
+
+    async def link_category(self, name, fields):
+        index = self.by_category_name.get(name)
+        ids = [pid for pid in index.range() if self.docs[pid].get("category_id") is None] if index else []
+        return await self.update_many(ids, fields)
+
+    async def delete(self, product_id):
+        await self.delete_many([product_id])
+
+    async def delete_many(self, ids):
+        deleted = 0
+        for pid in dict.fromkeys(ids):
+            doc = self.docs.pop(pid, None)
+            if doc is not None:
+                self._unindex(doc)
+                deleted += 1
+        return deleted
+
+
+class MemoryActivityRepository(ActivityRepository):
+    def __init__(self):
+        # Logs are never updated or deleted: positions in this list are their ids
+        self.logs: List[dict] = []
+        self.by_timestamp = SortedIndex()
+
+    async def recent(self, limit, action=None, product_id=None, since=None, until=None, max_time_ms=None):
+        found = []
+        for position in self.by_timestamp.range(since, until, reverse=True):
+            if len(found) >= limit:
+                break
+            log = self.logs[position]
+            if (action and log.get("action") != action) or (product_id and log.get("product_id") != product_id):
+                continue
+            found.append(dict(log))
+        return found
+
+    async def movements(self, since, actions, batch_size=10000):
+        wanted = set(actions)
+        return [
+            {"product_id": log["product_id"], "quantity_change": log.get("quantity_change"), "timestamp": log["timestamp"]}
+            for log in (self.logs[position] for position in self.by_timestamp.range(since))
+            if log.get("action") in wanted
+        ]
+
+    async def insert_one(self, doc):
+        await self.insert_many([doc])
+
+    async def insert_many(self, docs, ordered=True):
+        start = len(self.logs)
+        self.logs.extend(dict(doc) for doc in docs)
+        self.by_timestamp.add_many([(doc["timestamp"], start + i) for i, doc in enumerate(docs)])
+
+
+class MemoryReportJobRepository(ReportJobRepository):
+    def __init__(self):
+        self.docs: Dict[str, dict] = {}
+
+    async def get(self, job_id):
+        doc = self.docs.get(job_id)
+        return None if doc is None else dict(doc)
+
+    async def find_active(self, key, created_after):
+        for doc in self.docs.values():
+            if doc["key"] == key and doc["status"] in ("pending", "running") and doc["created_at"] >= created_after:
+                return dict(doc)
+        return None
+
+    async def insert_one(self, doc):
+        self.docs[doc["id"]] = dict(doc)
+
+    async def update(self, job_id, fields):
+        if job_id in self.docs:
+            self.docs[job_id].update(fields)
+
+
+class MemoryValuationSnapshotRepository(ValuationSnapshotRepository):
+    def __init__(self):
+        self.docs: Dict[str, dict] = {}
+        # granularity -> sorted index on bucket
+        self.by_bucket: Dict[str, SortedIndex] = {}
+
+    async def existing_ids(self, ids):
+        return {snapshot_id for snapshot_id in ids if snapshot_id in self.docs}
+
+    async def insert_if_absent(self, snapshot_id, doc):
+        if snapshot_id in self.docs:
+            return False
+        self.docs[snapshot_id] = dict(doc)
+        self.by_bucket.setdefault(doc["granularity"], SortedIndex()).add(doc["bucket"], snapshot_id)
+        return True
+
+    async def find_range(self, granularity, since, until, category=None, limit=10000):
+        index = self.by_bucket.get(granularity)
+        found = []
+        for snapshot_id in (index.range(since, until) if index else ()):
+            if len(found) >= limit:
+                break
+            doc = self.docs[snapshot_id]
+            point = {"bucket": doc["bucket"], "taken_at": doc["taken_at"]}
+            if category is None:
+                point["totals"] = doc["totals"]
+            else:
+                point["categories"] = [c for c in doc["categories"] if c["category"] == category][:1]
+            found.append(point)
+        return found
+
+
+class MemoryStorage(Storage):
+    def __init__(self):
+        self.admins = MemoryAdminRepository()
+        self.categories = MemoryCategoryRepository()
+        self.products = MemoryProductRepository()
+        self.activity_logs = MemoryActivityRepository()
+        self.report_jobs = MemoryReportJobRepository()
+        self.valuation_snapshots = MemoryValuationSnapshotRepository()
+        self.version = 0
+        # The data lives only as long as this object, so its identity does too
+        self.epoch = uuid.uuid4().hex
+
+    async def data_version(self):
+        return self.version
+
+    async def dataset_id(self):
+        return f"memory:{self.epoch}"
+
+    async def reset_data_version(self):
+        self.epoch = uuid.uuid4().hex
+        self.version += 1
+
+    async def bump_data_version(self, product_ids=None):
+        # Single process: nobody else needs to know which products changed
+        self.version += 1
+        return self.version
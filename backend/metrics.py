@@ -0,0 +1,248 @@
+"""
+Performance instrumentation: per-route latency histograms, MongoDB command
+timing and DB round-trips per request, exported in Prometheus text format.
+
+- MetricsMiddleware times every HTTP request and labels it with the route
+  template (e.g. /api/products/{product_id}), not the raw path.
+- MongoCommandListener is registered on the Motor client; it times every
+  command, counts round-trips against the request that issued them, and logs
+  commands slower than SLOW_QUERY_MS together with their filter.
+- Every response carries a Server-Timing header breaking the request down into
+  auth, db, serialization and ai time (see timed()).
+"""
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from pymongo import monitoring
+from starlette.datastructures import MutableHeaders
+
+from cache import CACHES
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+ROUNDTRIP_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+# Command fields that carry the query shape, logged for slow commands
+FILTER_KEYS = ("filter", "query", "pipeline", "q", "updates", "deletes")
+
+
+class RequestStats:
+    """Per-request counters, shared with the Motor executor threads through a context var."""
+    __slots__ = ("db_ops", "db_seconds", "timings")
+
+    def __init__(self):
+        self.db_ops = 0
+        self.db_seconds = 0.0
+        self.timings: Dict[str, float] = {}
+
+    def server_timing(self, app_seconds: float) -> str:
+        parts = [f"{phase};dur={seconds * 1000:.2f}" for phase, seconds in self.timings.items()]
+        parts.append(f'db;dur={self.db_seconds * 1000:.2f};desc="{self.db_ops} queries"')
+        parts.append(f"app;dur={app_seconds * 1000:.2f}")
+        return ", ".join(parts)
+
+
+current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("current_request", default=None)
+
+
+@contextmanager
+def timed(phase: str):
+    """Add the block's wall time to `phase` in the current request's Server-Timing header."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = current_request.get()
+        if stats is not None:
+            stats.timings[phase] = stats.timings.get(phase, 0.0) + time.perf_counter() - start
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...], label_names: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label_names = label_names
+        # labels -> [bucket counts..., sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def totals(self, labels: Tuple[str, ...]) -> Tuple[float, int]:
+        """(sum, count) observed so far for one label set."""
+        with self._lock:
+            series = self._series.get(labels)
+            return (series[-2], series[-1]) if series else (0.0, 0)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for labels, series in items:
+            base = format_labels(self.label_names, labels)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{base}}} {series[-2]}")
+            lines.append(f"{self.name}_count{{{base}}} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...], amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{{{format_labels(self.label_names, labels)}}} {value}")
+        return lines
+
+
+def format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    def escape(v: str) -> str:
+        return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{n}="{escape(v)}"' for n, v in zip(names, values))
+
+
+request_latency = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", LATENCY_BUCKETS, ("method", "route")
+)
+request_roundtrips = Histogram(
+    "http_request_db_roundtrips", "MongoDB commands issued per HTTP request.", ROUNDTRIP_BUCKETS, ("method", "route")
+)
+requests_total = Counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+mongo_command_latency = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency.", LATENCY_BUCKETS, ("command", "collection")
+)
+mongo_slow_commands = Counter("mongo_slow_commands_total", "MongoDB commands slower than SLOW_QUERY_MS.", ("command", "collection"))
+mongo_failed_commands = Counter("mongo_failed_commands_total", "MongoDB commands that returned an error.", ("command", "collection"))
+admission_rejections = Counter(
+    "admission_rejections_total", "Requests rejected by concurrency (503) or rate limits (429).", ("limiter", "reason")
+)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    def __init__(self, slow_query_ms: float = 100.0):
+        self.slow_query_ms = slow_query_ms
+        # (connection, request id) -> (collection, query shape); pymongo reports duration on completion
+        self._pending: Dict[tuple, Tuple[str, Optional[object]]] = {}
+
+    def started(self, event):
+        # getMore names the collection separately; its command value is the cursor id
+        collection = event.command.get("collection" if event.command_name == "getMore" else event.command_name)
+        query = next((event.command[k] for k in FILTER_KEYS if k in event.command), None)
+        self._pending[(event.connection_id, event.request_id)] = (collection if isinstance(collection, str) else "", query)
+
+    def _finish(self, event, failed: bool):
+        collection, query = self._pending.pop((event.connection_id, event.request_id), ("", None))
+        seconds = event.duration_micros / 1e6
+        labels = (event.command_name, collection)
+        mongo_command_latency.observe(labels, seconds)
+        if failed:
+            mongo_failed_commands.inc(labels)
+
+        stats = current_request.get()
+        if stats is not None:
+            stats.db_ops += 1
+            stats.db_seconds += seconds
+
+        if seconds * 1000 >= self.slow_query_ms:
+            mongo_slow_commands.inc(labels)
+            logger.warning(
+                "Slow Mongo command %s on %s took %.1f ms; filter=%.500s",
+                event.command_name, collection or "-", seconds * 1000, query,
+            )
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", stats.server_timing(time.perf_counter() - start))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request.reset(token)
+            # The router stores the matched route in the scope; label unmatched paths
+            # as one series so random URLs can't blow up cardinality
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            labels = (scope["method"], route_path)
+            request_latency.observe(labels, elapsed)
+            request_roundtrips.observe(labels, stats.db_ops)
+            requests_total.inc((scope["method"], route_path, str(status_code)))
+
+
+def render_cache_metrics() -> list:
+    lines = [
+        "# HELP cache_requests_total In-process cache lookups by result.",
+        "# TYPE cache_requests_total counter",
+    ]
+    all_stats = [cache.stats() for cache in CACHES]
+    for stats in all_stats:
+        for result, key in (("hit", "hits"), ("miss", "misses"), ("coalesced", "coalesced")):
+            if key in stats:
+                lines.append(f'cache_requests_total{{cache="{stats["name"]}",result="{result}"}} {stats[key]}')
+    lines += ["# HELP cache_invalidations_total In-process cache invalidations.", "# TYPE cache_invalidations_total counter"]
+    for stats in all_stats:
+        lines.append(f'cache_invalidations_total{{cache="{stats["name"]}"}} {stats["invalidations"]}')
+    return lines
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in (request_latency, request_roundtrips, requests_total,
+                   mongo_command_latency, mongo_slow_commands, mongo_failed_commands, admission_rejections):
+        lines += metric.render()
+    lines += render_cache_metrics()
+    return "\n".join(lines) + "\n"
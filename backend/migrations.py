@@ -0,0 +1,76 @@
+"""
+One-time data migrations. Each migration records itself in the `migrations`
+collection and is skipped once applied. The server runs pending migrations on
+startup; they can also be run by hand: python migrations.py
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from pymongo import UpdateMany
+
+# Load .env
+try:
+    from dotenv import load_dotenv
+    load_dotenv(Path(__file__).parent / '.env')
+except ImportError:
+    pass
+
+
+async def migrate_category_ids(db) -> dict:
+    """
+    Products referenced their category by free-text name only. Set `category_id` on
+    every product whose name matches a category, in one bulk_write. Products whose
+    category name matches nothing keep their name and get no id.
+    """
+    categories = await db.categories.find({}, {"_id": 0, "id": 1, "name": 1}).to_list(None)
+    ops = [
+        UpdateMany({"category": c["name"], "category_id": {"$exists": False}}, {"$set": {"category_id": c["id"]}})
+        for c in categories
+    ]
+    updated = 0
+    if ops:
+        result = await db.products.bulk_write(ops, ordered=False)
+        updated = result.modified_count
+    unmatched = await db.products.count_documents({"category_id": {"$exists": False}})
+    return {"updated": updated, "unmatched": unmatched}
+
+
+# Applied in order; names are stored in the `migrations` collection
+MIGRATIONS = [
+    ("category_ids", migrate_category_ids),
+]
+
+
+async def run_migrations(db, log=print) -> list:
+    applied = []
+    for name, migration in MIGRATIONS:
+        if await db.migrations.find_one({"_id": name}):
+            continue
+        result = await migration(db)
+        await db.migrations.insert_one({"_id": name, "applied_at": datetime.now(timezone.utc).isoformat(), "result": result})
+        log(f"Applied migration {name}: {result}")
+        applied.append(name)
+    return applied
+
+
+async def main():
+    import certifi
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    mongo_url = os.environ.get('MONGO_URL')
+    db_name = os.environ.get('DB_NAME')
+    if not mongo_url or not db_name:
+        print("ERROR: Set MONGO_URL and DB_NAME in .env", file=sys.stderr)
+        sys.exit(1)
+    client = AsyncIOMotorClient(mongo_url, tlscafile=certifi.where(), serverSelectionTimeoutMS=30000)
+    applied = await run_migrations(client[db_name])
+    if not applied:
+        print("No pending migrations.")
+    client.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
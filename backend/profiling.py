@@ -0,0 +1,120 @@
+"""
+Opt-in per-request profiling.
+
+A request is profiled when it carries `X-Profile: 1` and the `authorize`
+callback accepts its Authorization header (admin only), or when it is picked
+by random sampling (PROFILE_SAMPLE_RATE). The profile is written to
+`profiles_dir` and its id returned in the `X-Profile-Id` response header;
+admins fetch it from GET /api/profiles/{profile_id}.
+
+pyinstrument (async-aware, HTML output) is used when installed. The cProfile
+fallback profiles the whole event-loop thread, so concurrent requests show up
+in its output too.
+
+Both profilers are imported on the first profiled request, not at startup.
+"""
+import functools
+import io
+import logging
+import random
+import re
+import uuid
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+@functools.lru_cache(maxsize=None)
+def pyinstrument_profiler():
+    try:
+        from pyinstrument import Profiler
+    except ImportError:  # pyinstrument is optional - fall back to cProfile
+        return None
+    return Profiler
+
+
+def find_profile(profiles_dir: Path, profile_id: str) -> Optional[Path]:
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    for suffix in (".html", ".txt"):
+        path = profiles_dir / f"{profile_id}{suffix}"
+        if path.exists():
+            return path
+    return None
+
+
+class ProfilingMiddleware:
+    def __init__(
+        self,
+        app,
+        authorize: Callable[[Optional[str]], Awaitable[bool]],
+        profiles_dir: Path,
+        sample_rate: float = 0.0,
+        keep: int = 50,
+    ):
+        self.app = app
+        self.authorize = authorize
+        self.profiles_dir = profiles_dir
+        self.sample_rate = sample_rate
+        self.keep = keep
+
+    async def should_profile(self, scope) -> bool:
+        headers = Headers(scope=scope)
+        if headers.get("x-profile") == "1" and await self.authorize(headers.get("authorization")):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not await self.should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Profile-Id", profile_id)
+            await send(message)
+
+        Profiler = pyinstrument_profiler()
+        if Profiler is not None:
+            profiler = Profiler(async_mode="enabled")
+            profiler.start()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                profiler.stop()
+                await run_in_threadpool(self.save, profile_id, ".html", profiler.output_html)
+        else:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                profiler.disable()
+                await run_in_threadpool(self.save, profile_id, ".txt", lambda: render_pstats(profiler))
+
+    def save(self, profile_id: str, suffix: str, render: Callable[[], str]):
+        try:
+            self.profiles_dir.mkdir(parents=True, exist_ok=True)
+            (self.profiles_dir / f"{profile_id}{suffix}").write_text(render(), encoding="utf-8")
+            # Keep only the newest `keep` profiles
+            stored = sorted(self.profiles_dir.glob("*.*"), key=lambda p: p.stat().st_mtime, reverse=True)
+            for old in stored[self.keep:]:
+                old.unlink(missing_ok=True)
+        except OSError as e:
+            logger.error(f"Could not store profile {profile_id}: {e}")
+
+
+def render_pstats(profiler) -> str:
+    import pstats
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(60)
+    return out.getvalue()
@@ -1,16 +1,25 @@
 """
 Seed script: creates demo admin if missing. Does NOT overwrite existing data.
 Run once after deploy: python seed.py
+
+Synthetic data for benchmarking (deterministic for a given --seed and --as-of):
+    python seed.py generate --products 1000000 --categories 40 --months 6 --drop
 """
+import argparse
 import asyncio
+import itertools
 import os
+import random
 import sys
+import time
 from pathlib import Path
 
 from motor.motor_asyncio import AsyncIOMotorClient
 import bcrypt
 import uuid
-from datetime import datetime, timezone
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+
+from storage import MongoStorage
 
 # Load .env
 try:
@@ -25,6 +34,37 @@ DB_NAME = os.environ.get('DB_NAME', 'kuber_inventory')
 ADMIN_EMAIL = 'admin@kuber.com'
 ADMIN_PASSWORD = 'admin123'
 
+# Vocabulary for generated catalogues
+CATEGORY_NAMES = [
+    'Jewellery', 'Handicrafts', 'Textiles', 'Home Decor', 'Pottery', 'Paintings', 'Woodwork', 'Brassware',
+    'Silverware', 'Carpets', 'Leather Goods', 'Stone Carving', 'Bamboo Craft', 'Glassware', 'Toys', 'Puppets',
+]
+ADJECTIVES = ['Antique', 'Royal', 'Classic', 'Hand-painted', 'Embroidered', 'Carved', 'Polished', 'Engraved',
+              'Vintage', 'Festive', 'Temple', 'Meenakari', 'Kundan', 'Filigree', 'Block-printed', 'Woven']
+MATERIALS = ['Gold', 'Silver', 'Brass', 'Copper', 'Teak', 'Rosewood', 'Marble', 'Terracotta', 'Silk', 'Cotton',
+             'Pashmina', 'Jute', 'Sandalwood', 'Bone', 'Glass', 'Leather']
+ITEMS = ['Necklace', 'Bangle', 'Earrings', 'Ring', 'Vase', 'Lamp', 'Box', 'Statue', 'Scarf', 'Saree', 'Shawl',
+         'Wall Hanging', 'Bowl', 'Tray', 'Mirror Frame', 'Coaster Set', 'Cushion Cover', 'Runner', 'Diya', 'Bell']
+LOW_STOCK_THRESHOLDS = [5, 10, 10, 10, 15, 20, 25]
+
+
+async def ensure_admin(db) -> bool:
+    """Create the demo admin if missing. Returns True if it was created."""
+    existing = await db.admins.find_one({"email": ADMIN_EMAIL})
+    if existing:
+        return False
+    admin_password = bcrypt.hashpw(ADMIN_PASSWORD.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    admin = {
+        "id": str(uuid.uuid4()),
+        "email": ADMIN_EMAIL,
+        "password_hash": admin_password,
+        "name": "Admin User",
+        "role": "admin",
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+    await db.admins.insert_one(admin)
+    return True
+
 
 async def seed_database():
     if not MONGO_URL or not DB_NAME:
@@ -40,22 +80,10 @@ async def seed_database():
     db = client[DB_NAME]
 
     # Create admin only if it doesn't exist (do not overwrite existing data)
-    existing = await db.admins.find_one({"email": ADMIN_EMAIL})
-    if existing:
+    if not await ensure_admin(db):
         print(f"Admin {ADMIN_EMAIL} already exists. Skipping seed.")
         client.close()
         return
-
-    admin_password = bcrypt.hashpw(ADMIN_PASSWORD.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-    admin = {
-        "id": str(uuid.uuid4()),
-        "email": ADMIN_EMAIL,
-        "password_hash": admin_password,
-        "name": "Admin User",
-        "role": "admin",
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.admins.insert_one(admin)
     print(f"Created demo admin: {ADMIN_EMAIL} / {ADMIN_PASSWORD}")
 
     # Create default categories only if none exist
@@ -68,6 +96,8 @@ async def seed_database():
             {"id": str(uuid.uuid4()), "name": "Home Decor", "description": "Decorative items for home", "product_count": 0},
         ]
         await db.categories.insert_many(categories)
+        # Written behind the API's back: cached report results must not be reused
+        await MongoStorage(db).reset_data_version()
         print(f"Created {len(categories)} default categories")
     else:
         print(f"Categories already exist ({cat_count}). Skipping.")
@@ -76,5 +106,208 @@ async def seed_database():
     print("Seed complete.")
 
 
+# Synthetic data generator
+
+def rng_uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def generate_categories(count: int, rng: random.Random) -> list:
+    categories = []
+    for i in range(count):
+        name = CATEGORY_NAMES[i] if i < len(CATEGORY_NAMES) else f"{CATEGORY_NAMES[i % len(CATEGORY_NAMES)]} {i // len(CATEGORY_NAMES) + 1}"
+        categories.append({
+            "id": rng_uuid(rng),
+            "name": name,
+            "description": f"Generated category: {name}",
+            "product_count": 0,
+            # Typical price level for the category; not stored on products
+            "_base_price": rng.lognormvariate(7, 0.8),
+        })
+    return categories
+
+
+def generate_products(count: int, categories: list, rng: random.Random, as_of: datetime,
+                      image_ratio: float = 0.3, batch_size: int = 5000):
+    """
+    Yield batches of product documents. Prices are log-normal around the category's
+    base price, quantities are skewed (about 5% out of stock, a long tail of large
+    stock), SKUs are unique per run.
+    """
+    batch = []
+    # Popular categories hold more products (Zipf-like weights)
+    cum_weights = list(itertools.accumulate(1 / (i + 1) for i in range(len(categories))))
+    for i in range(count):
+        category = rng.choices(categories, cum_weights=cum_weights)[0]
+        created = as_of - timedelta(days=rng.randint(0, 720), seconds=rng.randint(0, 86399))
+        roll = rng.random()
+        if roll < 0.05:
+            quantity = 0
+        elif roll < 0.15:
+            quantity = rng.randint(1, 10)
+        else:
+            quantity = int(rng.expovariate(1 / 60)) + 1
+        batch.append({
+            "id": rng_uuid(rng),
+            "name": f"{rng.choice(ADJECTIVES)} {rng.choice(MATERIALS)} {rng.choice(ITEMS)}",
+            "sku": f"{category['name'][:3].upper()}-{i:08d}",
+            "description": None if rng.random() < 0.2 else f"Handcrafted {category['name'].lower()} piece",
+            "price": round(category["_base_price"] * rng.lognormvariate(0, 0.5), 2),
+            "quantity": quantity,
+            "category": category["name"],
+            "category_id": category["id"],
+            "images": [f"/uploads/{rng_uuid(rng)}.png" for _ in range(rng.randint(1, 3))] if rng.random() < image_ratio else [],
+            "low_stock_threshold": rng.choice(LOW_STOCK_THRESHOLDS),
+            "created_at": created.isoformat(),
+            "updated_at": created.isoformat(),
+        })
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def generate_activity(products: list, months: int, per_day: int, rng: random.Random, as_of: datetime,
+                      admin_email: str = ADMIN_EMAIL, batch_size: int = 5000):
+    """
+    Yield batches of activity logs covering `months` of history, `per_day` events a
+    day (about 80% sales, 20% restocks). `products` holds (id, name) pairs.
+    """
+    batch = []
+    start = as_of - timedelta(days=30 * months)
+    for day in range(30 * months):
+        day_start = start + timedelta(days=day)
+        offsets = sorted(rng.randint(0, 86399) for _ in range(per_day))
+        for offset in offsets:
+            product_id, product_name = rng.choice(products)
+            if rng.random() < 0.8:
+                action, change = "stock_reduced", -rng.randint(1, 5)
+            else:
+                action, change = "stock_added", rng.randint(10, 100)
+            batch.append({
+                "id": rng_uuid(rng),
+                "product_id": product_id,
+                "product_name": product_name,
+                "action": action,
+                "quantity_change": change,
+                "admin_email": admin_email,
+                "timestamp": (day_start + timedelta(seconds=offset)).isoformat(),
+            })
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+async def insert_batches(collection, batches, concurrency: int = 4) -> int:
+    """insert_many each batch, keeping up to `concurrency` inserts in flight while generating the next."""
+    pending = set()
+    inserted = 0
+    for batch in batches:
+        inserted += len(batch)
+        pending.add(asyncio.ensure_future(collection.insert_many(batch, ordered=False)))
+        if len(pending) >= concurrency:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+    if pending:
+        await asyncio.gather(*pending)
+    return inserted
+
+
+async def generate_dataset(db, products: int, categories: int = 16, months: int = 6, activity_per_day: int = 500,
+                           image_ratio: float = 0.3, seed: int = 42, as_of: datetime = None,
+                           batch_size: int = 5000, log=print) -> dict:
+    """
+    Bulk-insert a synthetic catalogue. Returns the generated ids so callers (e.g. the
+    load test) can address documents without reading them back.
+    """
+    rng = random.Random(seed)
+    if as_of is None:
+        as_of = datetime.combine(date.today(), dt_time.min, tzinfo=timezone.utc)
+
+    cats = generate_categories(categories, rng)
+    await db.categories.insert_many([{k: v for k, v in c.items() if not k.startswith("_")} for c in cats])
+    log(f"Inserted {len(cats)} categories")
+
+    refs = []
+
+    def tracked(batches):
+        for batch in batches:
+            refs.extend((p["id"], p["name"]) for p in batch)
+            yield batch
+
+    start = time.perf_counter()
+    count = await insert_batches(db.products, tracked(generate_products(products, cats, rng, as_of, image_ratio, batch_size)))
+    log(f"Inserted {count} products in {time.perf_counter() - start:.1f}s")
+
+    logs = 0
+    if refs and months > 0 and activity_per_day > 0:
+        start = time.perf_counter()
+        logs = await insert_batches(db.activity_logs, generate_activity(refs, months, activity_per_day, rng, as_of, batch_size=batch_size))
+        log(f"Inserted {logs} activity logs in {time.perf_counter() - start:.1f}s")
+
+    return {
+        "product_ids": [pid for pid, _ in refs],
+        "category_ids": [c["id"] for c in cats],
+        "category_names": [c["name"] for c in cats],
+        "activity_logs": logs,
+    }
+
+
+async def generate_command(args):
+    client = AsyncIOMotorClient(
+        MONGO_URL,
+        tlsAllowInvalidCertificates=True,
+        serverSelectionTimeoutMS=30000,
+    )
+    db = client[args.db or DB_NAME]
+    if args.drop:
+        for name in ("products", "categories", "activity_logs"):
+            await db[name].drop()
+        print("Dropped products, categories and activity_logs")
+    elif await db.products.estimated_document_count():
+        print("WARNING: products already exist; generated SKUs may duplicate a previous run (use --drop)", file=sys.stderr)
+
+    if await ensure_admin(db):
+        print(f"Created demo admin: {ADMIN_EMAIL} / {ADMIN_PASSWORD}")
+
+    as_of = datetime.fromisoformat(args.as_of).replace(tzinfo=timezone.utc) if args.as_of else None
+    start = time.perf_counter()
+    await generate_dataset(
+        db, args.products, args.categories, args.months, args.activity_per_day,
+        args.image_ratio, args.seed, as_of, args.batch_size,
+    )
+    # Written behind the API's back (and maybe after a --drop): a new dataset identity keeps
+    # cached report results and running workers' caches from outliving the old data
+    await MongoStorage(db).reset_data_version()
+    client.close()
+    print(f"Generate complete in {time.perf_counter() - start:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed the database (default) or generate synthetic data.")
+    sub = parser.add_subparsers(dest="command")
+    gen = sub.add_parser("generate", help="bulk-insert a deterministic synthetic catalogue for benchmarking")
+    gen.add_argument("--products", type=int, default=10000)
+    gen.add_argument("--categories", type=int, default=16)
+    gen.add_argument("--months", type=int, default=6, help="months of activity-log history")
+    gen.add_argument("--activity-per-day", type=int, default=500)
+    gen.add_argument("--image-ratio", type=float, default=0.3, help="fraction of products with image references")
+    gen.add_argument("--seed", type=int, default=42)
+    gen.add_argument("--as-of", help="anchor date for timestamps (YYYY-MM-DD, default today)")
+    gen.add_argument("--batch-size", type=int, default=5000)
+    gen.add_argument("--db", help=f"database name (default DB_NAME={DB_NAME})")
+    gen.add_argument("--drop", action="store_true", help="drop products, categories and activity_logs first")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        asyncio.run(generate_command(args))
+    else:
+        asyncio.run(seed_database())
+
+
 if __name__ == "__main__":
-    asyncio.run(seed_database())
+    main()
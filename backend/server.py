@@ -1,13 +1,18 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import ExecutionTimeout
+from contextvars import ContextVar
+from contextlib import asynccontextmanager
+import asyncio
 import os
 import sys
+import time
 import logging
 from pathlib import Path
-import certifi  # ADD THIS LINE
 
 # Logger must be defined before any handlers use it
 logging.basicConfig(
@@ -16,37 +21,97 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any, Tuple, Union
 import uuid
 from datetime import datetime, timezone, timedelta
-import bcrypt
 import jwt
 from bson import ObjectId
-import shutil
-import base64
-import httpx
+import orjson
+
+from cache import CACHES, CoalescingCache, ReadThroughCache, invalidate_all
+from compression import CompressionMiddleware
+from db_settings import SettingsError, load_mongo_settings
+from invalidation import InvalidationBus
+from jobs import ReportJobs
+from limits import AdmissionRejected, ConcurrencyLimiter, RateLimiter
+from metrics import MetricsMiddleware, MongoCommandListener, render_metrics, timed
+from memory_storage import MemoryStorage
+from migrations import run_migrations
+from profiling import ProfilingMiddleware, find_profile
+from storage import MongoStorage, ProductFilter, Storage
+from valuation import ValuationSnapshots
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Where the API keeps its data: "mongo" (MongoDB via Motor) or "memory" (in-process
+# indexed engine in memory_storage.py; nothing persists, single worker only)
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'mongo')
+if STORAGE_BACKEND not in ('mongo', 'memory'):
+    logger.error(f"STORAGE_BACKEND must be 'mongo' or 'memory', not {STORAGE_BACKEND!r}")
+    sys.exit(1)
+
 # MongoDB connection - fail at startup if missing
 mongo_url = os.environ.get('MONGO_URL')
 db_name = os.environ.get('DB_NAME')
 
-if not mongo_url:
+if STORAGE_BACKEND == 'mongo' and not mongo_url:
     logger.error("MONGO_URL environment variable is required. Set it in .env or your deployment config.")
     sys.exit(1)
-if not db_name:
+if STORAGE_BACKEND == 'mongo' and not db_name:
     logger.error("DB_NAME environment variable is required. Set it in .env or your deployment config.")
     sys.exit(1)
 
-# Use certifi for proper SSL/TLS certificate handling (works on all platforms)
-client = AsyncIOMotorClient(
-    mongo_url,
-    tlscafile=certifi.where(),
-    serverSelectionTimeoutMS=30000,
-)
-db = client[db_name]
+# Mongo commands slower than this are logged with their filter and counted in /metrics
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '100'))
+
+# Pool size, timeouts, compression, write concern and read preferences (MONGO_* / REPORT_*
+# variables, validated in db_settings.py; run check_env.py to check them before a deploy)
+try:
+    MONGO_SETTINGS = load_mongo_settings()
+except SettingsError as e:
+    for error in e.errors:
+        logger.error(error)
+    sys.exit(1)
+for warning in MONGO_SETTINGS.warnings:
+    logger.warning(warning)
+
+def create_mongo_client() -> AsyncIOMotorClient:
+    import certifi
+    # Use certifi for proper SSL/TLS certificate handling (works on all platforms)
+    return AsyncIOMotorClient(
+        mongo_url,
+        tlscafile=certifi.where(),
+        event_listeners=[MongoCommandListener(slow_query_ms=SLOW_QUERY_MS)],
+        **MONGO_SETTINGS.client_options,
+    )
+
+# Created per worker process in lifespan(), never at import: a client must not be
+# shared across the fork of a multi-worker (gunicorn) deployment
+client: Optional[AsyncIOMotorClient] = None
+db = None
+# Same database for report / analytics reads, routed to secondaries (REPORT_READ_PREFERENCE)
+# so heavy scans don't compete with the writes and point reads on the primary
+report_db = None
+# Repositories the handlers use (storage.py): over db / report_db, or both in memory
+storage: Optional[Storage] = None
+report_storage: Optional[Storage] = None
+
+def bind_database(mongo_client: AsyncIOMotorClient, name: Optional[str] = None):
+    global client, db, report_db
+    client = mongo_client
+    db = client[name or db_name]
+    report_db = client.get_database(name or db_name, read_preference=MONGO_SETTINGS.report_read_preference)
+    bind_storage(MongoStorage(db), MongoStorage(report_db))
+
+def bind_storage(primary: Storage, reports: Optional[Storage] = None):
+    global storage, report_storage
+    storage = primary
+    report_storage = reports or primary
+
+# maxTimeMS for report / analytics queries: REPORT_MAX_TIME_MS during a request, the job
+# timeout inside background report jobs (see background_report)
+report_time_budget: ContextVar[int] = ContextVar("report_time_budget", default=MONGO_SETTINGS.report_max_time_ms)
 
 # JWT Configuration
 SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
@@ -54,18 +119,200 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 
 
+# Response compression: bodies smaller than this many bytes are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+
+
+# Dashboard endpoints (/api/stats, /api/reports/low-stock): concurrent identical requests
+# always share one DB computation; results are additionally cached for this many seconds
+# (0 = coalescing only). Product and category writes invalidate the cache.
+DASHBOARD_CACHE_TTL = float(os.environ.get('DASHBOARD_CACHE_TTL', '0'))
+
+stats_cache = CoalescingCache("stats", ttl=DASHBOARD_CACHE_TTL)
+low_stock_cache = CoalescingCache("low_stock", ttl=DASHBOARD_CACHE_TTL)
+
+# Read-through cache for product point lookups (GET /products/{id}, batch-get by id).
+# Updates and deletes discard the entry; writes from other worker processes clear it via
+# invalidation_bus, and the TTL bounds staleness if that is turned off.
+PRODUCT_CACHE_SIZE = int(os.environ.get('PRODUCT_CACHE_SIZE', '10000'))
+PRODUCT_CACHE_TTL = float(os.environ.get('PRODUCT_CACHE_TTL', '60'))
+product_cache = ReadThroughCache("products", maxsize=PRODUCT_CACHE_SIZE, ttl=PRODUCT_CACHE_TTL)
+
+# With several worker processes, each one drops its caches when another process writes:
+# the written products from the point cache and catalogue snapshot, everything if unknown.
+# CACHE_SYNC: "auto" follows a change stream on data_versions (replica sets / Atlas) and falls
+# back to polling every CACHE_SYNC_INTERVAL seconds; "poll" always polls; "off" relies on TTLs.
+CACHE_SYNC = os.environ.get('CACHE_SYNC', 'auto')
+CACHE_SYNC_INTERVAL = float(os.environ.get('CACHE_SYNC_INTERVAL', '1'))
+invalidation_bus = InvalidationBus(mode=CACHE_SYNC, interval=CACHE_SYNC_INTERVAL)
+
+# Columnar (NumPy) copy of the catalogue's numeric fields for stats, low-stock selection and
+# analytics; refreshed from writes, fully reloaded at least every CATALOGUE_SNAPSHOT_MAX_AGE seconds
+CATALOGUE_SNAPSHOT_MAX_AGE = float(os.environ.get('CATALOGUE_SNAPSHOT_MAX_AGE', '300'))
+
+# Daily per-product stock movements from activity_logs for reorder forecasting: the last
+# FORECAST_WINDOW_DAYS days, re-reading only the current day after writes (or every minute)
+FORECAST_WINDOW_DAYS = int(os.environ.get('FORECAST_WINDOW_DAYS', '30'))
+
+# Both are created on first use (get_catalogue / get_demand_history): NumPy takes a few
+# hundred ms to import, which would otherwise be paid by every worker at startup
+catalogue = None
+demand_history = None
+
+def get_catalogue():
+    global catalogue
+    if catalogue is None:
+        from snapshot import CatalogueSnapshot
+        catalogue = CatalogueSnapshot(
+            lambda: storage, lambda: report_storage, report_time_budget.get, max_age=CATALOGUE_SNAPSHOT_MAX_AGE,
+        )
+    return catalogue
+
+async def fresh_catalogue():
+    snapshot = get_catalogue()
+    await snapshot.ensure_fresh()
+    return snapshot
+
+def get_demand_history():
+    global demand_history
+    if demand_history is None:
+        from forecast import DemandHistory
+        demand_history = DemandHistory(lambda: report_storage, window_days=FORECAST_WINDOW_DAYS)
+    return demand_history
+reorder_cache = CoalescingCache("reorder", ttl=DASHBOARD_CACHE_TTL)
+
+# Hourly and daily stock valuation (global and per category) recorded in valuation_snapshots
+# for trend reports; hourly snapshots are dropped after VALUATION_HOURLY_RETENTION_DAYS.
+# VALUATION_SNAPSHOTS=off stops this process from recording (history stays readable).
+VALUATION_SNAPSHOTS = os.environ.get('VALUATION_SNAPSHOTS', 'on')
+VALUATION_HOURLY_RETENTION_DAYS = float(os.environ.get('VALUATION_HOURLY_RETENTION_DAYS', '90'))
+valuation_snapshots = ValuationSnapshots(
+    lambda: storage, lambda: report_storage, hourly_retention_days=VALUATION_HOURLY_RETENTION_DAYS,
+)
+
+def drop_local_caches(product_ids: Optional[List[str]] = None):
+    """Forget what a write to these products (all of them when None) made stale in this process."""
+    # A snapshot / history not created yet has nothing to drop
+    if product_ids is None:
+        product_cache.invalidate()
+        if catalogue is not None:
+            catalogue.mark_stale()
+    else:
+        for pid in product_ids:
+            product_cache.discard(pid)
+        if catalogue is not None:
+            catalogue.mark_dirty(product_ids)
+    if demand_history is not None:
+        demand_history.mark_dirty()
+    invalidate_all()
+
+invalidation_bus.subscribe(drop_local_caches)
+
+# Maximum ids / SKUs per POST /api/products/batch-get
+BATCH_GET_MAX = int(os.environ.get('BATCH_GET_MAX', '500'))
+# Maximum products one bulk update / delete may touch
+BULK_MAX_PRODUCTS = int(os.environ.get('BULK_MAX_PRODUCTS', '10000'))
+
+
+# Background report jobs: at most REPORT_WORKERS reports computed at once per process;
+# result files in REPORTS_DIR are reused while the inventory is unchanged
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', '2'))
+REPORTS_DIR = Path(os.environ.get('REPORTS_DIR', ROOT_DIR / 'reports'))
+REPORT_JOB_TIMEOUT = float(os.environ.get('REPORT_JOB_TIMEOUT', '600'))
+REPORT_RESULT_TTL = float(os.environ.get('REPORT_RESULT_TTL', '86400'))
+
+
+# Admission control for the expensive endpoints (chat, inventory / activity reports, stats):
+# at most *_CONCURRENCY of each run at once per process, the rest queue for up to
+# ADMISSION_QUEUE_TIMEOUT seconds and then get 503; each admin may call them *_RATE_LIMIT
+# times per minute, else 429. Both carry Retry-After. 0 disables a limit.
+CHAT_CONCURRENCY = int(os.environ.get('CHAT_CONCURRENCY', '4'))
+REPORT_CONCURRENCY = int(os.environ.get('REPORT_CONCURRENCY', '4'))
+STATS_CONCURRENCY = int(os.environ.get('STATS_CONCURRENCY', '8'))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', '5'))
+CHAT_RATE_LIMIT = float(os.environ.get('CHAT_RATE_LIMIT', '10'))
+REPORT_RATE_LIMIT = float(os.environ.get('REPORT_RATE_LIMIT', '30'))
+STATS_RATE_LIMIT = float(os.environ.get('STATS_RATE_LIMIT', '120'))
+
+chat_limits = (
+    ConcurrencyLimiter("chat", CHAT_CONCURRENCY, ADMISSION_QUEUE_TIMEOUT),
+    RateLimiter("chat", CHAT_RATE_LIMIT),
+)
+report_limits = (
+    ConcurrencyLimiter("reports", REPORT_CONCURRENCY, ADMISSION_QUEUE_TIMEOUT),
+    RateLimiter("reports", REPORT_RATE_LIMIT),
+)
+stats_limits = (
+    ConcurrencyLimiter("stats", STATS_CONCURRENCY, ADMISSION_QUEUE_TIMEOUT),
+    RateLimiter("stats", STATS_RATE_LIMIT),
+)
+
+
+# Profiling: admins send "X-Profile: 1" to profile a request; PROFILE_SAMPLE_RATE (0-1)
+# additionally profiles a random fraction of all requests. Profiles are kept in PROFILES_DIR.
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILES_DIR = Path(os.environ.get('PROFILES_DIR', ROOT_DIR / 'profiles'))
+
+
 # Create uploads directory
 UPLOADS_DIR = ROOT_DIR / 'uploads'
 UPLOADS_DIR.mkdir(exist_ok=True)
 
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson (several times faster than stdlib json)."""
+    def render(self, content: Any) -> bytes:
+        with timed("serialization"):
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+def db_response(content: Any) -> ORJSONResponse:
+    """
+    Fast path for documents read straight from MongoDB (projected with {"_id": 0}).
+    Returning a Response skips FastAPI's response_model re-validation, which costs
+    more than the query itself for large product lists. The response_model on the
+    route is still used for the OpenAPI schema.
+    """
+    return ORJSONResponse(content)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs once per worker process
+    started = time.perf_counter()
+    if STORAGE_BACKEND == 'memory':
+        bind_storage(MemoryStorage())
+    else:
+        bind_database(create_mongo_client())
+    await prepare_database()
+    logger.info(f"Startup completed in {(time.perf_counter() - started) * 1000:.0f} ms")
+    yield
+    await valuation_snapshots.stop()
+    await invalidation_bus.stop()
+    if client is not None:
+        client.close()
+
 # Create the main app
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+
+@app.exception_handler(ExecutionTimeout)
+async def query_timeout_handler(request: Request, exc: ExecutionTimeout):
+    logger.warning(f"{request.method} {request.url.path} exceeded its query time budget: {exc}")
+    return ORJSONResponse(
+        status_code=504,
+        content={"detail": "The query took too long; narrow it down or use a background report job"},
+    )
 
 # Health check endpoint (no auth required)
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
+# Prometheus scrape endpoint. Set METRICS_TOKEN to require "Authorization: Bearer <token>".
+@app.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    metrics_token = os.environ.get("METRICS_TOKEN")
+    if metrics_token and request.headers.get("Authorization") != f"Bearer {metrics_token}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 api_router = APIRouter(prefix="/api")
 security = HTTPBearer()
 
@@ -91,6 +338,13 @@ class CategoryCreate(BaseModel):
     name: str
     description: Optional[str] = None
 
+class CategoryUpdate(BaseModel):
+    name: Optional[str] = None
+    description: Optional[str] = None
+
+class CategoryMerge(BaseModel):
+    target_id: str
+
 class CategoryResponse(BaseModel):
     id: str
     name: str
@@ -103,7 +357,9 @@ class ProductCreate(BaseModel):
     description: Optional[str] = None
     price: float
     quantity: int
-    category: str
+    # Either is enough: the category is resolved by id (preferred) or by name
+    category: Optional[str] = None
+    category_id: Optional[str] = None
     images: List[str] = []
     low_stock_threshold: int = 10
 
@@ -114,6 +370,7 @@ class ProductUpdate(BaseModel):
     price: Optional[float] = None
     quantity: Optional[int] = None
     category: Optional[str] = None
+    category_id: Optional[str] = None
     images: Optional[List[str]] = None
     low_stock_threshold: Optional[int] = None
 
@@ -125,11 +382,69 @@ class ProductResponse(BaseModel):
     price: float
     quantity: int
     category: str
+    category_id: Optional[str] = None
     images: List[str] = []
     low_stock_threshold: int
     created_at: str
     updated_at: str
 
+class ProductPartialResponse(BaseModel):
+    """Product subset returned when a `fields=` projection is requested (table and dropdown views)."""
+    id: str
+    name: Optional[str] = None
+    sku: Optional[str] = None
+    description: Optional[str] = None
+    price: Optional[float] = None
+    quantity: Optional[int] = None
+    category: Optional[str] = None
+    category_id: Optional[str] = None
+    images: Optional[List[str]] = None
+    low_stock_threshold: Optional[int] = None
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+
+class ProductBatchGetRequest(BaseModel):
+    ids: List[str] = []
+    skus: List[str] = []
+    fields: Optional[str] = None
+
+class ProductBatchGetResponse(BaseModel):
+    products: List[Union[ProductResponse, ProductPartialResponse]]
+    missing: List[str]
+
+class ProductBulkFilter(BaseModel):
+    category: Optional[str] = None
+    category_id: Optional[str] = None
+    search: Optional[str] = None
+    low_stock: Optional[bool] = None
+
+class ProductBulkSet(BaseModel):
+    price: Optional[float] = None
+    quantity: Optional[int] = None
+    category: Optional[str] = None
+    category_id: Optional[str] = None
+    description: Optional[str] = None
+    low_stock_threshold: Optional[int] = None
+
+class ProductBulkInc(BaseModel):
+    price: Optional[float] = None
+    quantity: Optional[int] = None
+
+class ProductBulkUpdate(BaseModel):
+    """Select products by `ids` or `filter`, then apply `set` and/or `inc`."""
+    ids: List[str] = []
+    filter: Optional[ProductBulkFilter] = None
+    set: Optional[ProductBulkSet] = None
+    inc: Optional[ProductBulkInc] = None
+
+class ProductBulkDelete(BaseModel):
+    ids: List[str] = []
+    filter: Optional[ProductBulkFilter] = None
+
+class ReportJobRequest(BaseModel):
+    report: Literal["inventory", "low-stock", "activity", "reorder"]
+    params: Dict[str, Any] = {}
+
 class ActivityLog(BaseModel):
     id: str
     product_id: str
@@ -150,10 +465,14 @@ class ChatRequest(BaseModel):
     message: str
 
 # Helper Functions
+# bcrypt, httpx (chat) and the upload helpers are imported where used, keeping them off
+# the cold-start path; see benchmarks/startup.py
 def hash_password(password: str) -> str:
+    import bcrypt
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
 def verify_password(password: str, hashed: str) -> bool:
+    import bcrypt
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
 def create_access_token(data: dict):
@@ -163,23 +482,116 @@ def create_access_token(data: dict):
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 async def get_current_admin(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    with timed("auth"):
+        try:
+            token = credentials.credentials
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            email = payload.get("sub")
+            if email is None:
+                raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+            admin = await storage.admins.get_by_email(email)
+            if admin is None:
+                raise HTTPException(status_code=401, detail="Admin not found")
+            return admin
+        except jwt.ExpiredSignatureError:
+            raise HTTPException(status_code=401, detail="Token expired")
+        except jwt.InvalidTokenError:
+            raise HTTPException(status_code=401, detail="Invalid token")
+
+def admitted_admin(limits: tuple):
+    """
+    Dependency for expensive endpoints: get_current_admin, then the admin's rate limit,
+    then a concurrency slot held until the handler finishes.
+    """
+    limiter, rate_limiter = limits
+
+    async def dependency(admin: dict = Depends(get_current_admin)):
+        try:
+            rate_limiter.acquire(admin["email"])
+            async with limiter.slot():
+                yield admin
+        except AdmissionRejected as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+    return dependency
+
+PRODUCT_FIELDS = set(ProductResponse.model_fields)
+
+def product_projection(fields: Optional[str], required: tuple = ()):
+    """
+    Translate a comma-separated `fields` query parameter into a MongoDB projection.
+    `required` lists fields the handler itself needs (e.g. price for totals); those
+    are fetched but returned in the second value so they can be stripped again.
+    """
+    if not fields:
+        return {"_id": 0}, []
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - PRODUCT_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    requested.add("id")
+    strip = [f for f in required if f not in requested]
+    projection = {"_id": 0, **{f: 1 for f in requested}, **{f: 1 for f in strip}}
+    return projection, strip
+
+def project(doc: dict, projection: dict) -> dict:
+    """Apply a product_projection() to a full (cached) document."""
+    if len(projection) == 1:
+        return doc
+    return {k: v for k, v in doc.items() if k in projection}
+
+async def load_products_by_id(ids: List[str]) -> Dict[str, dict]:
+    """Full product documents by id: cache first, then a single $in query for the misses."""
+    found = {}
+    missing = []
+    for pid in dict.fromkeys(ids):
+        doc = product_cache.get(pid)
+        if doc is None:
+            missing.append(pid)
+        else:
+            found[pid] = doc
+    if missing:
+        version = product_cache.version()
+        docs = await storage.products.find_by_ids(missing)
+        for doc in docs:
+            product_cache.put(doc["id"], doc, version)
+            found[doc["id"]] = doc
+    return found
+
+async def inventory_changed(product_ids: Optional[List[str]] = None):
+    """
+    Call after every product / category write. Drops the aggregate caches and the given
+    products from the point cache and catalogue snapshot (all of them when product_ids is
+    None), and bumps the persisted data version that keys cached report results, publishing
+    the product ids so other worker processes can drop just those.
+    """
+    drop_local_caches(product_ids)
+    invalidation_bus.local_write(await storage.bump_data_version(product_ids))
+
+async def get_data_version() -> Tuple[str, int]:
+    """(dataset identity, version): a version number alone repeats across databases and restarts."""
+    dataset, version = await asyncio.gather(storage.dataset_id(), storage.data_version())
+    return dataset, version
+
+def strip_fields(docs: List[dict], strip: List[str]) -> List[dict]:
+    if strip:
+        for doc in docs:
+            for f in strip:
+                doc.pop(f, None)
+    return docs
+
+async def authorize_profiling(authorization: Optional[str]) -> bool:
+    """Only admins may request a profile with the X-Profile header."""
+    if not authorization or not authorization.startswith("Bearer "):
+        return False
     try:
-        token = credentials.credentials
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-        if email is None:
-            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-        admin = await db.admins.find_one({"email": email}, {"_id": 0})
-        if admin is None:
-            raise HTTPException(status_code=401, detail="Admin not found")
-        return admin
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
+        payload = jwt.decode(authorization[len("Bearer "):], SECRET_KEY, algorithms=[ALGORITHM])
     except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+        return False
+    admin = await storage.admins.get_by_email(payload.get("sub"), {"_id": 0, "role": 1})
+    return bool(admin) and admin.get("role") == "admin"
 
-async def log_activity(product_id: str, product_name: str, action: str, quantity_change: int, admin_email: str):
-    activity = {
+def build_activity(product_id: str, product_name: str, action: str, quantity_change: int, admin_email: str) -> dict:
+    return {
         "id": str(uuid.uuid4()),
         "product_id": product_id,
         "product_name": product_name,
@@ -188,12 +600,46 @@ async def log_activity(product_id: str, product_name: str, action: str, quantity
         "admin_email": admin_email,
         "timestamp": datetime.now(timezone.utc).isoformat()
     }
-    await db.activity_logs.insert_one(activity)
+
+async def log_activity(product_id: str, product_name: str, action: str, quantity_change: int, admin_email: str):
+    await storage.activity_logs.insert_one(build_activity(product_id, product_name, action, quantity_change, admin_email))
+
+async def resolve_category(name: Optional[str], category_id: Optional[str]) -> dict:
+    """
+    Category fields for a product write: the category id plus its name, which stays
+    denormalized on the product for display. Unknown names are kept as free text
+    without an id, as before categories were referenced by id.
+    """
+    if category_id:
+        category = await storage.categories.get(category_id, {"_id": 0, "id": 1, "name": 1})
+        if not category:
+            raise HTTPException(status_code=400, detail="Unknown category_id")
+        return {"category": category["name"], "category_id": category["id"]}
+    if not name:
+        raise HTTPException(status_code=400, detail="category or category_id is required")
+    category = await storage.categories.get_by_name(name, {"_id": 0, "id": 1})
+    return {"category": name, "category_id": category["id"] if category else None}
+
+async def select_bulk_products(ids: List[str], filter: Optional[ProductBulkFilter], projection: dict) -> List[dict]:
+    """Resolve a bulk request's `ids` or `filter` to the matched products (capped at BULK_MAX_PRODUCTS)."""
+    if bool(ids) == (filter is not None):
+        raise HTTPException(status_code=400, detail="Provide either ids or filter")
+    projection = {"_id": 0, **projection}
+    if ids:
+        docs = await storage.products.find_by_ids(list(dict.fromkeys(ids)), projection)
+    else:
+        product_filter = ProductFilter(filter.category, filter.search, filter.low_stock, filter.category_id)
+        if not product_filter:
+            raise HTTPException(status_code=400, detail="Filter must have at least one condition")
+        docs = await storage.products.find(product_filter, projection, limit=BULK_MAX_PRODUCTS + 1)
+    if len(docs) > BULK_MAX_PRODUCTS:
+        raise HTTPException(status_code=400, detail=f"Bulk operations are limited to {BULK_MAX_PRODUCTS} products")
+    return docs
 
 # Auth Endpoints
 @api_router.post("/auth/register")
 async def register_admin(admin: AdminCreate):
-    existing = await db.admins.find_one({"email": admin.email})
+    existing = await storage.admins.get_by_email(admin.email)
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     
@@ -205,13 +651,13 @@ async def register_admin(admin: AdminCreate):
         "role": admin.role,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
-    await db.admins.insert_one(admin_doc)
+    await storage.admins.insert_one(admin_doc)
     
     return {"message": "Admin registered successfully", "email": admin.email}
 
 @api_router.post("/auth/login")
 async def login(credentials: AdminLogin):
-    admin = await db.admins.find_one({"email": credentials.email})
+    admin = await storage.admins.get_by_email(credentials.email)
     if not admin or not verify_password(credentials.password, admin["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
@@ -233,29 +679,108 @@ async def get_current_user(admin: dict = Depends(get_current_admin)):
 # Category Endpoints
 @api_router.post("/categories", response_model=CategoryResponse)
 async def create_category(category: CategoryCreate, admin: dict = Depends(get_current_admin)):
+    """Products created earlier with this name as free text (no category id) are linked to the new category."""
+    if not category.name.strip():
+        raise HTTPException(status_code=400, detail="Category name cannot be blank")
+    if await storage.categories.get_by_name(category.name):
+        raise HTTPException(status_code=400, detail="A category with that name already exists")
     category_doc = {
         "id": str(uuid.uuid4()),
         "name": category.name,
         "description": category.description,
         "product_count": 0
     }
-    await db.categories.insert_one(category_doc)
+    await storage.categories.insert_one(category_doc)
+    linked = await storage.products.link_category(
+        category.name, {"category_id": category_doc["id"], "updated_at": datetime.now(timezone.utc).isoformat()}
+    )
+    category_doc["product_count"] = linked
+    await inventory_changed(None if linked else [])
     return CategoryResponse(**category_doc)
 
 @api_router.get("/categories", response_model=List[CategoryResponse])
 async def get_categories(admin: dict = Depends(get_current_admin)):
-    categories = await db.categories.find({}, {"_id": 0}).to_list(1000)
+    categories = await storage.categories.list()
+    # One aggregation for all counts instead of a count_documents per category
+    count_by_id = await storage.products.count_by_category_id()
     for category in categories:
-        count = await db.products.count_documents({"category": category["name"]})
-        category["product_count"] = count
-    return categories
+        category["product_count"] = count_by_id.get(category["id"], 0)
+    return db_response(categories)
 
-@api_router.delete("/categories/{category_id}")
-async def delete_category(category_id: str, admin: dict = Depends(get_current_admin)):
-    result = await db.categories.delete_one({"id": category_id})
-    if result.deleted_count == 0:
+async def get_category_or_404(category_id: str) -> dict:
+    category = await storage.categories.get(category_id)
+    if not category:
         raise HTTPException(status_code=404, detail="Category not found")
-    return {"message": "Category deleted successfully"}
+    return category
+
+async def reassign_products(source_id: str, target: dict) -> int:
+    return await storage.products.update_category(
+        source_id,
+        {"category_id": target["id"], "category": target["name"], "updated_at": datetime.now(timezone.utc).isoformat()},
+    )
+
+@api_router.put("/categories/{category_id}", response_model=CategoryResponse)
+async def update_category(category_id: str, update: CategoryUpdate, admin: dict = Depends(get_current_admin)):
+    """Rename / re-describe a category; a rename rewrites the name on its products in one update_many."""
+    category = await get_category_or_404(category_id)
+    update_data = update.model_dump(exclude_none=True)
+    if "name" in update_data and not update_data["name"].strip():
+        raise HTTPException(status_code=400, detail="Category name cannot be blank")
+    renamed = "name" in update_data and update_data["name"] != category["name"]
+    if renamed:
+        if await storage.categories.get_by_name(update_data["name"]):
+            raise HTTPException(status_code=400, detail="A category with that name already exists")
+        await storage.products.update_category(
+            category_id, {"category": update_data["name"], "updated_at": datetime.now(timezone.utc).isoformat()}
+        )
+    if update_data:
+        await storage.categories.update(category_id, update_data)
+        # Cached reports embed categories, so even a description change needs a new data version
+        await inventory_changed(None if renamed else [])
+    category.update(update_data)
+    category["product_count"] = await storage.products.count_in_category(category_id)
+    return CategoryResponse(**category)
+
+@api_router.post("/categories/{category_id}/merge")
+async def merge_category(category_id: str, merge: CategoryMerge, admin: dict = Depends(get_current_admin)):
+    """Move every product of this category into `target_id`, then delete this category."""
+    if merge.target_id == category_id:
+        raise HTTPException(status_code=400, detail="Cannot merge a category into itself")
+    await get_category_or_404(category_id)
+    target = await get_category_or_404(merge.target_id)
+    moved = await reassign_products(category_id, target)
+    await storage.categories.delete(category_id)
+    await inventory_changed()
+    return {"message": "Category merged successfully", "products_moved": moved, "target_id": target["id"]}
+
+@api_router.delete("/categories/{category_id}")
+async def delete_category(
+    category_id: str,
+    products: Literal["detach", "reassign", "delete"] = "detach",
+    target_id: Optional[str] = None,
+    admin: dict = Depends(get_current_admin)
+):
+    """
+    What happens to the category's products: `detach` (default) keeps them with their
+    category name but no id, `reassign` moves them to `target_id`, `delete` removes them.
+    """
+    await get_category_or_404(category_id)
+    affected = 0
+    if products == "reassign":
+        if not target_id or target_id == category_id:
+            raise HTTPException(status_code=400, detail="target_id of another category is required to reassign products")
+        affected = await reassign_products(category_id, await get_category_or_404(target_id))
+    elif products == "delete":
+        doomed = await storage.products.find(ProductFilter(category_id=category_id), {"_id": 0, "id": 1, "name": 1})
+        if doomed:
+            affected = await storage.products.delete_many([p["id"] for p in doomed])
+            await storage.activity_logs.insert_many([build_activity(p["id"], p["name"], "deleted", 0, admin["email"]) for p in doomed])
+    else:
+        affected = await storage.products.update_category(category_id, {"category_id": None})
+
+    await storage.categories.delete(category_id)
+    await inventory_changed()
+    return {"message": "Category deleted successfully", "products_affected": affected}
 
 # Product Endpoints
 @api_router.post("/products", response_model=ProductResponse)
@@ -263,48 +788,71 @@ async def create_product(product: ProductCreate, admin: dict = Depends(get_curre
     product_doc = {
         "id": str(uuid.uuid4()),
         **product.model_dump(),
+        **await resolve_category(product.category, product.category_id),
         "created_at": datetime.now(timezone.utc).isoformat(),
         "updated_at": datetime.now(timezone.utc).isoformat()
     }
-    await db.products.insert_one(product_doc)
+    await storage.products.insert_one(product_doc)
     await log_activity(product_doc["id"], product_doc["name"], "created", product.quantity, admin["email"])
+    await inventory_changed([product_doc["id"]])
     return ProductResponse(**product_doc)
 
-@api_router.get("/products", response_model=List[ProductResponse])
+@api_router.get("/products", response_model=List[Union[ProductResponse, ProductPartialResponse]])
 async def get_products(
     category: Optional[str] = None,
     search: Optional[str] = None,
     low_stock: Optional[bool] = None,
+    category_id: Optional[str] = None,
+    fields: Optional[str] = None,
     admin: dict = Depends(get_current_admin)
 ):
-    query = {}
-    if category:
-        query["category"] = category
-    if search:
-        query["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"sku": {"$regex": search, "$options": "i"}}
-        ]
-    if low_stock:
-        query["$expr"] = {"$lte": ["$quantity", "$low_stock_threshold"]}
-    
-    products = await db.products.find(query, {"_id": 0}).to_list(1000)
-    return products
+    projection, _ = product_projection(fields)
+    products = await storage.products.find(ProductFilter(category, search, low_stock, category_id), projection, limit=1000)
+    return db_response(products)
 
-@api_router.get("/products/{product_id}", response_model=ProductResponse)
-async def get_product(product_id: str, admin: dict = Depends(get_current_admin)):
-    product = await db.products.find_one({"id": product_id}, {"_id": 0})
+@api_router.get("/products/{product_id}", response_model=Union[ProductResponse, ProductPartialResponse])
+async def get_product(product_id: str, fields: Optional[str] = None, admin: dict = Depends(get_current_admin)):
+    projection, _ = product_projection(fields)
+    product = (await load_products_by_id([product_id])).get(product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    return db_response(project(product, projection))
+
+@api_router.post("/products/batch-get", response_model=ProductBatchGetResponse)
+async def batch_get_products(request: ProductBatchGetRequest, admin: dict = Depends(get_current_admin)):
+    """
+    Fetch many products by id or by SKU in one query. Results follow the request
+    order (duplicates repeated); keys with no product are listed in `missing`.
+    """
+    if bool(request.ids) == bool(request.skus):
+        raise HTTPException(status_code=400, detail="Provide either ids or skus")
+    keys = request.ids or request.skus
+    if len(keys) > BATCH_GET_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_GET_MAX} products per batch")
+
+    if request.ids:
+        projection, _ = product_projection(request.fields)
+        by_key = {pid: project(doc, projection) for pid, doc in (await load_products_by_id(request.ids)).items()}
+    else:
+        projection, strip = product_projection(request.fields, required=("sku",))
+        docs = await storage.products.find_by_skus(list(dict.fromkeys(keys)), projection)
+        by_key = {doc["sku"]: doc for doc in docs}
+        strip_fields(docs, strip)
+
+    return db_response({
+        "products": [by_key[k] for k in keys if k in by_key],
+        "missing": [k for k in keys if k not in by_key],
+    })
 
 @api_router.put("/products/{product_id}", response_model=ProductResponse)
 async def update_product(product_id: str, product: ProductUpdate, admin: dict = Depends(get_current_admin)):
-    existing = await db.products.find_one({"id": product_id})
+    existing = await storage.products.get(product_id)
     if not existing:
         raise HTTPException(status_code=404, detail="Product not found")
     
     update_data = {k: v for k, v in product.model_dump().items() if v is not None}
+    if product.category or product.category_id:
+        update_data.update(await resolve_category(product.category, product.category_id))
     update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
     
     if "quantity" in update_data:
@@ -312,23 +860,77 @@ async def update_product(product_id: str, product: ProductUpdate, admin: dict =
         action = "stock_added" if quantity_change > 0 else "stock_reduced"
         await log_activity(product_id, existing["name"], action, quantity_change, admin["email"])
     
-    await db.products.update_one({"id": product_id}, {"$set": update_data})
-    updated = await db.products.find_one({"id": product_id}, {"_id": 0})
-    return updated
+    await storage.products.update(product_id, update_data)
+    await inventory_changed([product_id])
+    updated = await storage.products.get(product_id)
+    return db_response(updated)
 
 @api_router.delete("/products/{product_id}")
 async def delete_product(product_id: str, admin: dict = Depends(get_current_admin)):
-    product = await db.products.find_one({"id": product_id})
+    product = await storage.products.get(product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    await db.products.delete_one({"id": product_id})
+    await storage.products.delete(product_id)
     await log_activity(product_id, product["name"], "deleted", 0, admin["email"])
+    await inventory_changed([product_id])
     return {"message": "Product deleted successfully"}
 
+@api_router.post("/products/bulk-update")
+async def bulk_update_products(request: ProductBulkUpdate, admin: dict = Depends(get_current_admin)):
+    """
+    Apply one $set / $inc to many products with a single update_many, logging stock
+    changes with a single insert_many (same actions as PUT /products/{id}).
+    """
+    set_data = request.set.model_dump(exclude_none=True) if request.set else {}
+    inc_data = request.inc.model_dump(exclude_none=True) if request.inc else {}
+    if "category" in set_data or "category_id" in set_data:
+        set_data.update(await resolve_category(set_data.get("category"), set_data.get("category_id")))
+    if not set_data and not inc_data:
+        raise HTTPException(status_code=400, detail="Nothing to update")
+    both = sorted(set(set_data) & set(inc_data))
+    if both:
+        raise HTTPException(status_code=400, detail=f"Cannot both set and increment: {', '.join(both)}")
+
+    matched = await select_bulk_products(request.ids, request.filter, {"id": 1, "name": 1, "quantity": 1})
+    if not matched:
+        return {"matched": 0, "modified": 0, "logged": 0}
+    ids = [p["id"] for p in matched]
+
+    modified = await storage.products.update_many(
+        ids, {**set_data, "updated_at": datetime.now(timezone.utc).isoformat()}, inc_data
+    )
+
+    activities = []
+    if "quantity" in set_data or "quantity" in inc_data:
+        for p in matched:
+            quantity_change = set_data["quantity"] - p["quantity"] if "quantity" in set_data else inc_data["quantity"]
+            action = "stock_added" if quantity_change > 0 else "stock_reduced"
+            activities.append(build_activity(p["id"], p["name"], action, quantity_change, admin["email"]))
+        await storage.activity_logs.insert_many(activities)
+
+    await inventory_changed(ids)
+    return {"matched": len(matched), "modified": modified, "logged": len(activities)}
+
+@api_router.post("/products/bulk-delete")
+async def bulk_delete_products(request: ProductBulkDelete, admin: dict = Depends(get_current_admin)):
+    """Delete many products with one delete_many and log them with one insert_many."""
+    matched = await select_bulk_products(request.ids, request.filter, {"id": 1, "name": 1})
+    if not matched:
+        return {"matched": 0, "deleted": 0}
+    ids = [p["id"] for p in matched]
+
+    deleted = await storage.products.delete_many(ids)
+    await storage.activity_logs.insert_many([build_activity(p["id"], p["name"], "deleted", 0, admin["email"]) for p in matched])
+
+    await inventory_changed(ids)
+    return {"matched": len(matched), "deleted": deleted}
+
 # Upload Endpoint
 @api_router.post("/upload")
 async def upload_image(file: UploadFile = File(...), admin: dict = Depends(get_current_admin)):
+    import base64
+    import shutil
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
     
@@ -348,51 +950,303 @@ async def upload_image(file: UploadFile = File(...), admin: dict = Depends(get_c
     return {"url": img_url, "filename": filename}
 
 # Stats and Reports
-@api_router.get("/stats", response_model=StatsResponse)
-async def get_stats(admin: dict = Depends(get_current_admin)):
-    products = await db.products.find({}, {"_id": 0}).to_list(10000)
+async def compute_stats() -> dict:
+    budget = report_time_budget.get()
+    valuation = (await fresh_catalogue()).valuation()
+    total_categories = await report_storage.categories.count(max_time_ms=budget)
     
-    total_products = len(products)
-    total_stock_value = sum(p["price"] * p["quantity"] for p in products)
-    low_stock_items = len([p for p in products if p["quantity"] <= p.get("low_stock_threshold", 10)])
-    total_categories = await db.categories.count_documents({})
+    activities = await report_storage.activity_logs.recent(10, max_time_ms=budget)
     
-    activities = await db.activity_logs.find({}, {"_id": 0}).sort("timestamp", -1).limit(10).to_list(10)
+    return {
+        "total_products": valuation["total_products"],
+        "total_stock_value": valuation["total_stock_value"],
+        "low_stock_items": valuation["low_stock_items"],
+        "total_categories": total_categories,
+        "recent_activities": activities
+    }
+
+@api_router.get("/stats", response_model=StatsResponse)
+async def get_stats(admin: dict = Depends(admitted_admin(stats_limits))):
+    stats = await stats_cache.get_or_compute("stats", compute_stats)
+    return db_response(stats)
+
+async def build_low_stock_report(params: dict) -> list:
+    projection, _ = product_projection(params.get("fields"))
+    ids = (await fresh_catalogue()).low_stock_ids(limit=10000)
+    if not ids:
+        return []
+    return await report_storage.products.find_by_ids(ids, projection, max_time_ms=report_time_budget.get())
+
+async def build_inventory_report(params: dict) -> dict:
+    projection, strip = product_projection(params.get("fields"), required=("price", "quantity"))
+    budget = report_time_budget.get()
+    products = await report_storage.products.find(ProductFilter(), projection, limit=10000, max_time_ms=budget)
+    categories = await report_storage.categories.list(max_time_ms=budget)
+    total_value = sum(p["price"] * p["quantity"] for p in products)
     
-    return StatsResponse(
-        total_products=total_products,
-        total_stock_value=total_stock_value,
-        low_stock_items=low_stock_items,
-        total_categories=total_categories,
-        recent_activities=activities
+    return {
+        "products": strip_fields(products, strip),
+        "categories": categories,
+        "total_value": total_value,
+        "generated_at": datetime.now(timezone.utc).isoformat()
+    }
+
+async def build_activity_report(params: dict) -> list:
+    """Activity history, newest first; optional action / product_id / since / until (ISO timestamps)."""
+    return await report_storage.activity_logs.recent(
+        int(params.get("limit", 100)),
+        action=params.get("action"),
+        product_id=params.get("product_id"),
+        since=params.get("since"),
+        until=params.get("until"),
+        max_time_ms=report_time_budget.get(),
     )
 
-@api_router.get("/reports/low-stock")
-async def get_low_stock_report(admin: dict = Depends(get_current_admin)):
-    products = await db.products.find({}, {"_id": 0}).to_list(10000)
-    low_stock = [p for p in products if p["quantity"] <= p.get("low_stock_threshold", 10)]
-    return low_stock
+# Maximum items in one reorder report
+REORDER_REPORT_MAX = 10000
+
+def reorder_params(params: dict) -> dict:
+    """Validate and normalise reorder report parameters (query string or report job)."""
+    try:
+        normalised = {
+            "lead_time_days": float(params.get("lead_time_days", 7)),
+            "coverage_days": float(params.get("coverage_days", 30)),
+            "service_z": float(params.get("service_z", 1.65)),
+            "limit": int(params.get("limit", 500)),
+            "all": str(params.get("all", False)).lower() in ("1", "true", "yes"),
+        }
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="lead_time_days, coverage_days and service_z must be numbers, limit an integer")
+    if normalised["lead_time_days"] < 0 or normalised["coverage_days"] < 0 or normalised["service_z"] < 0:
+        raise HTTPException(status_code=400, detail="lead_time_days, coverage_days and service_z must not be negative")
+    if not 0 < normalised["limit"] <= REORDER_REPORT_MAX:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {REORDER_REPORT_MAX}")
+    return normalised
+
+def forecast_date() -> str:
+    """Velocity and days until stockout move with the calendar, so reorder results are cached per UTC day."""
+    return datetime.now(timezone.utc).date().isoformat()
+
+async def build_reorder_report(params: dict) -> dict:
+    """
+    Replenishment list: products at or below their reorder point (or every product with
+    `all`), soonest stockout first, with daily velocity and a suggested order quantity.
+    """
+    import numpy as np
+    from forecast import reorder_plan
+
+    now = datetime.now(timezone.utc)
+    history = get_demand_history()
+    snapshot, _ = await asyncio.gather(fresh_catalogue(), history.ensure_fresh())
+    columns = snapshot.columns()
+    quantity = columns["quantity"]
+    plan = reorder_plan(
+        columns["ids"], quantity, history, now,
+        lead_time_days=params["lead_time_days"], coverage_days=params["coverage_days"], service_z=params["service_z"],
+    )
+    selected = np.flatnonzero(np.ones(len(quantity), dtype=bool) if params["all"] else plan["needs_reorder"])
+    selected = selected[np.argsort(plan["days_until_stockout"][selected], kind="stable")][:params["limit"]]
+    docs = await load_products_by_id([columns["ids"][row] for row in selected])
+
+    items = []
+    for row in selected:
+        doc = docs.get(columns["ids"][row])
+        if doc is None:
+            continue
+        days_left = plan["days_until_stockout"][row]
+        items.append({
+            "product_id": doc["id"],
+            "name": doc["name"],
+            "sku": doc["sku"],
+            "category": doc.get("category"),
+            "quantity": int(quantity[row]),
+            "consumed": float(plan["consumed"][row]),
+            "received": float(plan["received"][row]),
+            "daily_velocity": round(float(plan["velocity"][row]), 3),
+            "days_until_stockout": None if np.isinf(days_left) else round(float(days_left), 1),
+            "reorder_point": round(float(plan["reorder_point"][row]), 1),
+            "suggested_order_quantity": int(plan["suggested_order"][row]),
+        })
+    lead_time_demand = plan["velocity"] * params["lead_time_days"]
+    return {
+        "generated_at": now.isoformat(),
+        "window_days": history.window_days,
+        "parameters": params,
+        "summary": {
+            "products": len(quantity),
+            "with_demand": int(np.count_nonzero(plan["velocity"] > 0)),
+            "needs_reorder": int(np.count_nonzero(plan["needs_reorder"])),
+            "stockout_within_lead_time": int(np.count_nonzero((plan["velocity"] > 0) & (quantity < lead_time_demand))),
+            "suggested_order_units": int(plan["suggested_order"].sum()),
+        },
+        "items": items,
+    }
+
+@api_router.get("/reports/low-stock", response_model=List[Union[ProductResponse, ProductPartialResponse]])
+async def get_low_stock_report(fields: Optional[str] = None, admin: dict = Depends(get_current_admin)):
+    projection, _ = product_projection(fields)
+    low_stock = await low_stock_cache.get_or_compute(
+        tuple(sorted(projection)),
+        lambda: build_low_stock_report({"fields": fields}),
+    )
+    return db_response(low_stock)
+
+@api_router.get("/cache/stats")
+async def get_cache_stats(admin: dict = Depends(get_current_admin)):
+    """Hit / miss / coalesced counters for the in-process caches."""
+    return [cache.stats() for cache in CACHES]
 
 @api_router.get("/reports/activity-logs")
 async def get_activity_logs(
     limit: int = 100,
-    admin: dict = Depends(get_current_admin)
+    admin: dict = Depends(admitted_admin(report_limits))
 ):
-    activities = await db.activity_logs.find({}, {"_id": 0}).sort("timestamp", -1).limit(limit).to_list(limit)
-    return activities
+    return db_response(await build_activity_report({"limit": limit}))
 
 @api_router.get("/reports/inventory")
-async def get_inventory_report(admin: dict = Depends(get_current_admin)):
-    products = await db.products.find({}, {"_id": 0}).to_list(10000)
-    categories = await db.categories.find({}, {"_id": 0}).to_list(1000)
-    
+async def get_inventory_report(fields: Optional[str] = None, admin: dict = Depends(admitted_admin(report_limits))):
+    return db_response(await build_inventory_report({"fields": fields}))
+
+@api_router.get("/reports/analytics")
+async def get_catalogue_analytics(
+    abc_a: float = 0.8,
+    abc_b: float = 0.95,
+    admin: dict = Depends(admitted_admin(stats_limits))
+):
+    """Valuation, per-category breakdown, ABC (Pareto) classes by stock value and stock-level percentiles."""
+    if not 0 < abc_a < abc_b <= 1:
+        raise HTTPException(status_code=400, detail="Need 0 < abc_a < abc_b <= 1")
+    snapshot = await fresh_catalogue()
     return {
-        "products": products,
-        "categories": categories,
-        "total_value": sum(p["price"] * p["quantity"] for p in products),
-        "generated_at": datetime.now(timezone.utc).isoformat()
+        "valuation": snapshot.valuation(),
+        "categories": snapshot.category_breakdown(),
+        "abc": snapshot.abc_classification(abc_a, abc_b),
+        "stock_percentiles": snapshot.stock_percentiles(),
+        "snapshot": snapshot.stats(),
     }
 
+@api_router.get("/reports/reorder")
+async def get_reorder_report(
+    lead_time_days: float = 7,
+    coverage_days: float = 30,
+    service_z: float = 1.65,
+    limit: int = 500,
+    all: bool = False,
+    admin: dict = Depends(admitted_admin(report_limits))
+):
+    """Stock velocity, days until stockout and suggested reorder quantities from the activity history."""
+    params = reorder_params({
+        "lead_time_days": lead_time_days, "coverage_days": coverage_days,
+        "service_z": service_z, "limit": limit, "all": all,
+    })
+    report = await reorder_cache.get_or_compute(tuple(sorted(params.items())), lambda: build_reorder_report(params))
+    return db_response(report)
+
+VALUATION_HISTORY_DEFAULT_DAYS = {"hour": 7, "day": 365}
+
+def parse_timestamp(value: Optional[str], name: str) -> Optional[datetime]:
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be an ISO 8601 timestamp")
+    return parsed.astimezone(timezone.utc) if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+@api_router.get("/reports/valuation-history")
+async def get_valuation_history(
+    granularity: Literal["hour", "day"] = "day",
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    category: Optional[str] = None,
+    admin: dict = Depends(admitted_admin(stats_limits))
+):
+    """
+    Stock valuation over time from the recorded snapshots: one point per hour or day
+    (products, quantity, stock value, low / out of stock counts), for all products or
+    one category. Defaults to the last 7 days hourly or 365 days daily.
+    """
+    until_at = parse_timestamp(until, "until") or datetime.now(timezone.utc)
+    since_at = parse_timestamp(since, "since") or until_at - timedelta(days=VALUATION_HISTORY_DEFAULT_DAYS[granularity])
+    if since_at >= until_at:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    points = await valuation_snapshots.history(granularity, since_at, until_at, category)
+    return db_response({
+        "granularity": granularity,
+        "since": since_at.isoformat(),
+        "until": until_at.isoformat(),
+        "category": category,
+        "points": points,
+    })
+
+# Background report jobs: submit, poll (optionally long-poll with ?wait=), download
+report_jobs = ReportJobs(
+    lambda: storage, REPORTS_DIR, concurrency=REPORT_WORKERS, timeout=REPORT_JOB_TIMEOUT, keep_seconds=REPORT_RESULT_TTL
+)
+
+def background_report(builder):
+    """Report jobs aren't holding a request open, so their queries may run up to the job timeout."""
+    async def run(params: dict):
+        report_time_budget.set(int(REPORT_JOB_TIMEOUT * 1000))
+        return await builder(params)
+    return run
+
+report_jobs.register("inventory", background_report(build_inventory_report))
+report_jobs.register("low-stock", background_report(build_low_stock_report))
+report_jobs.register("activity", background_report(build_activity_report))
+report_jobs.register("reorder", background_report(build_reorder_report), variant=forecast_date)
+
+# Parameters each report accepts; anything else is dropped so it can't split the result cache
+REPORT_PARAMS = {
+    "inventory": ("fields",),
+    "low-stock": ("fields",),
+    "activity": ("limit", "action", "product_id", "since", "until"),
+    "reorder": ("lead_time_days", "coverage_days", "service_z", "limit", "all"),
+}
+ACTIVITY_REPORT_MAX = 100000
+
+def job_response(job: dict) -> dict:
+    if job["status"] == "completed":
+        job["download_url"] = f"/api/reports/jobs/{job['id']}/download"
+    return job
+
+@api_router.post("/reports/jobs")
+async def submit_report_job(request: ReportJobRequest, admin: dict = Depends(get_current_admin)):
+    params = {k: v for k, v in request.params.items() if k in REPORT_PARAMS[request.report] and v is not None}
+    if request.report == "reorder":
+        params = reorder_params(params)
+    if "fields" in params:
+        product_projection(params["fields"])
+    if request.report == "activity" and "limit" in params:
+        try:
+            params["limit"] = int(params["limit"])
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="limit must be an integer")
+        if not 0 < params["limit"] <= ACTIVITY_REPORT_MAX:
+            raise HTTPException(status_code=400, detail=f"limit must be between 1 and {ACTIVITY_REPORT_MAX}")
+    dataset, data_version = await get_data_version()
+    job = await report_jobs.submit(request.report, params, data_version, admin["email"], dataset)
+    return job_response(job)
+
+@api_router.get("/reports/jobs/{job_id}")
+async def get_report_job(job_id: str, wait: float = 0, admin: dict = Depends(get_current_admin)):
+    job = await report_jobs.wait(job_id, min(max(wait, 0), 60))
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_response(job)
+
+@api_router.get("/reports/jobs/{job_id}/download")
+async def download_report_job(job_id: str, admin: dict = Depends(get_current_admin)):
+    job = await report_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    path = report_jobs.result_path(job["key"])
+    if not path.exists():
+        raise HTTPException(status_code=410, detail="Result expired; submit the report again")
+    return FileResponse(path, media_type="application/json", filename=f"{job['report']}-{job['id'][:8]}.json")
+
 # Seed endpoint - run once after deploy. Requires X-Seed-Key header matching SEED_SECRET env var.
 @api_router.post("/seed")
 async def run_seed(request: Request):
@@ -404,10 +1258,10 @@ async def run_seed(request: Request):
         raise HTTPException(status_code=403, detail="Invalid seed key")
     ADMIN_EMAIL = "admin@kuber.com"
     ADMIN_PASSWORD = "admin123"
-    existing = await db.admins.find_one({"email": ADMIN_EMAIL})
+    existing = await storage.admins.get_by_email(ADMIN_EMAIL)
     if existing:
         return {"message": "Admin already exists", "email": ADMIN_EMAIL}
-    admin_password = bcrypt.hashpw(ADMIN_PASSWORD.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    admin_password = hash_password(ADMIN_PASSWORD)
     admin = {
         "id": str(uuid.uuid4()),
         "email": ADMIN_EMAIL,
@@ -416,8 +1270,8 @@ async def run_seed(request: Request):
         "role": "admin",
         "created_at": datetime.now(timezone.utc).isoformat(),
     }
-    await db.admins.insert_one(admin)
-    cat_count = await db.categories.count_documents({})
+    await storage.admins.insert_one(admin)
+    cat_count = await storage.categories.count()
     if cat_count == 0:
         categories = [
             {"id": str(uuid.uuid4()), "name": "Jewellery", "description": "Gold and silver jewellery items", "product_count": 0},
@@ -425,50 +1279,61 @@ async def run_seed(request: Request):
             {"id": str(uuid.uuid4()), "name": "Textiles", "description": "Traditional textiles and fabrics", "product_count": 0},
             {"id": str(uuid.uuid4()), "name": "Home Decor", "description": "Decorative items for home", "product_count": 0},
         ]
-        await db.categories.insert_many(categories)
+        await storage.categories.insert_many(categories)
+        await inventory_changed()
     return {"message": "Seed complete", "email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
 
+# Profiles recorded by ProfilingMiddleware (X-Profile-Id response header)
+@api_router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, admin: dict = Depends(get_current_admin)):
+    path = find_profile(PROFILES_DIR, profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path)
+
 # Admin Management
 @api_router.get("/admins", response_model=List[AdminResponse])
 async def get_admins(admin: dict = Depends(get_current_admin)):
-    admins = await db.admins.find({}, {"_id": 0, "password_hash": 0}).to_list(1000)
-    return admins
+    admins = await storage.admins.list({"_id": 0, "password_hash": 0})
+    return db_response(admins)
 
 # Chatbot Endpoint
 @api_router.post("/chat")
-async def chat_with_inventory(request: ChatRequest, admin: dict = Depends(get_current_admin)):
+async def chat_with_inventory(request: ChatRequest, admin: dict = Depends(admitted_admin(chat_limits))):
     """
     Chatbot endpoint that fetches real inventory data and uses AI to format responses.
     Uses Google Gemini API for natural language responses.
     """
     try:
-        # Fetch real inventory data from database
-        products = await db.products.find({}, {"_id": 0}).to_list(10000)
-        categories = await db.categories.find({}, {"_id": 0}).to_list(1000)
-        
-        # Calculate inventory statistics
-        total_products = len(products)
-        total_stock_value = sum(p["price"] * p["quantity"] for p in products)
-        low_stock_products = [p for p in products if p["quantity"] <= p.get("low_stock_threshold", 10)]
-        out_of_stock_products = [p for p in products if p["quantity"] == 0]
+        # Inventory statistics from the catalogue snapshot; only the products named in the
+        # prompt are fetched from the database
+        budget = report_time_budget.get()
+        snapshot = await fresh_catalogue()
+        valuation = snapshot.valuation()
+        breakdown = snapshot.category_breakdown()
+        categories = await report_storage.categories.list(max_time_ms=budget)
+        low_stock_ids = snapshot.low_stock_ids(limit=10)
+        out_of_stock_ids = snapshot.out_of_stock_ids(limit=10)
+        sample_ids = snapshot.product_ids(limit=20)
+        found = await load_products_by_id(low_stock_ids + out_of_stock_ids + sample_ids)
+        low_stock_products = [found[pid] for pid in low_stock_ids if pid in found]
+        out_of_stock_products = [found[pid] for pid in out_of_stock_ids if pid in found]
+        products = [found[pid] for pid in sample_ids if pid in found]
         
         # Category-wise breakdown
         category_stats = {}
         for cat in categories:
-            cat_products = [p for p in products if p["category"] == cat["name"]]
-            category_stats[cat["name"]] = {
-                "count": len(cat_products),
-                "total_value": sum(p["price"] * p["quantity"] for p in cat_products)
-            }
+            cat_stats = breakdown.get(cat["name"], {"count": 0, "total_value": 0.0})
+            category_stats[cat["name"]] = {"count": cat_stats["count"], "total_value": cat_stats["total_value"]}
         
         # Prepare inventory context for AI
         inventory_context = f"""
 REAL INVENTORY DATA (DO NOT MAKE UP ANY NUMBERS):
 
-Total Products: {total_products}
-Total Stock Value: ₹{total_stock_value:,.2f}
-Low Stock Items: {len(low_stock_products)}
-Out of Stock Items: {len(out_of_stock_products)}
+Total Products: {valuation["total_products"]}
+Total Stock Value: ₹{valuation["total_stock_value"]:,.2f}
+Low Stock Items: {valuation["low_stock_items"]}
+Out of Stock Items: {valuation["out_of_stock_items"]}
 
 Categories:
 {chr(10).join([f"- {name}: {stats['count']} products, Value: ₹{stats['total_value']:,.2f}" for name, stats in category_stats.items()])}
@@ -510,18 +1375,20 @@ CRITICAL RULES:
         full_prompt = f"{system_instruction}\n\nUser Question: {request.message}"
         
         # Call AI API: Gemini direct if GEMINI_API_KEY, else OpenRouter (OpenAI-compatible)
+        import httpx
         async with httpx.AsyncClient() as http_client:
             if gemini_api_key:
                 # Direct Gemini API - model: gemini-2.5-flash
-                response = await http_client.post(
-                    f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={gemini_api_key}",
-                    headers={"Content-Type": "application/json"},
-                    json={
-                        "contents": [{"parts": [{"text": full_prompt}]}],
-                        "generationConfig": {"temperature": 0.3, "maxOutputTokens": 500},
-                    },
-                    timeout=30.0
-                )
+                with timed("ai"):
+                    response = await http_client.post(
+                        f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={gemini_api_key}",
+                        headers={"Content-Type": "application/json"},
+                        json={
+                            "contents": [{"parts": [{"text": full_prompt}]}],
+                            "generationConfig": {"temperature": 0.3, "maxOutputTokens": 500},
+                        },
+                        timeout=30.0
+                    )
                 if response.status_code != 200:
                     logger.error(f"Gemini API error: {response.status_code} - {response.text}")
                     return {
@@ -538,21 +1405,22 @@ CRITICAL RULES:
                 # OpenRouter API (OpenAI-compatible) - model: google/gemini-2-flash
                 # TODO: If using a different OpenRouter model, set OPENROUTER_MODEL env var
                 model = os.environ.get("OPENROUTER_MODEL", "google/gemini-2-flash:free")
-                response = await http_client.post(
-                    "https://openrouter.ai/api/v1/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {openrouter_api_key}",
-                        "Content-Type": "application/json",
-                        "HTTP-Referer": os.environ.get("OPENROUTER_APP_URL", "https://kuber-inventory.local"),
-                    },
-                    json={
-                        "model": model,
-                        "messages": [{"role": "user", "content": full_prompt}],
-                        "temperature": 0.3,
-                        "max_tokens": 500,
-                    },
-                    timeout=30.0
-                )
+                with timed("ai"):
+                    response = await http_client.post(
+                        "https://openrouter.ai/api/v1/chat/completions",
+                        headers={
+                            "Authorization": f"Bearer {openrouter_api_key}",
+                            "Content-Type": "application/json",
+                            "HTTP-Referer": os.environ.get("OPENROUTER_APP_URL", "https://kuber-inventory.local"),
+                        },
+                        json={
+                            "model": model,
+                            "messages": [{"role": "user", "content": full_prompt}],
+                            "temperature": 0.3,
+                            "max_tokens": 500,
+                        },
+                        timeout=30.0
+                    )
                 if response.status_code != 200:
                     logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
                     return {
@@ -587,9 +1455,72 @@ app.add_middleware(
     allow_origins=_cors_origins,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Profile-Id"],
 )
+app.add_middleware(
+    ProfilingMiddleware,
+    authorize=authorize_profiling,
+    profiles_dir=PROFILES_DIR,
+    sample_rate=PROFILE_SAMPLE_RATE,
+)
+# Compress large JSON payloads (product lists, reports); brotli if installed, else gzip
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+# Outermost: per-route latency histograms and DB round-trips per request (served at /metrics),
+# plus the Server-Timing header (auth / db / serialization / ai) on every response
+app.add_middleware(MetricsMiddleware)
+
+
+# Indexes for the point lookups and sorts the API relies on: (collection, keys, options)
+INDEXES = [
+    ("products", "id", {"unique": True}),
+    ("products", "sku", {}),
+    ("products", [("category_id", 1), ("name", 1)], {}),
+    ("products", [("category", 1), ("name", 1)], {}),
+    ("categories", "id", {"unique": True}),
+    ("categories", "name", {}),
+    ("admins", "email", {}),
+    ("activity_logs", [("timestamp", -1)], {}),
+    ("report_jobs", "id", {}),
+    ("report_jobs", [("key", 1), ("status", 1)], {}),
+    ("valuation_snapshots", [("granularity", 1), ("bucket", 1)], {}),
+    ("valuation_snapshots", "expires_at", {"expireAfterSeconds": 0}),
+]
+
+async def ensure_indexes():
+    """Create INDEXES (idempotent), concurrently; one failing index doesn't stop the others."""
+    results = await asyncio.gather(
+        *(db[collection].create_index(keys, **options) for collection, keys, options in INDEXES),
+        return_exceptions=True,
+    )
+    for (collection, keys, _), result in zip(INDEXES, results):
+        if isinstance(result, Exception):
+            # Don't block startup (e.g. duplicate legacy ids); queries still work without the index
+            logger.error(f"Index creation failed for {collection} {keys}: {result}")
+
+async def prepare_database():
+    """
+    Startup work, run concurrently so a cold start costs about one round-trip instead of
+    one per step: warm the connection pool, create indexes, run migrations and start the
+    cache invalidation bus. Failures are logged; the app still starts. The in-memory
+    engine needs none of that (it is always empty at startup and single-process).
+    """
+    async def ping():
+        await client.admin.command("ping")
 
+    async def migrate():
+        await run_migrations(db, log=logger.info)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    steps = {}
+    if db is not None:
+        steps.update({
+            "MongoDB ping": ping(),
+            "Indexes": ensure_indexes(),
+            "Migrations": migrate(),
+            "Cache invalidation bus": invalidation_bus.start(db),
+        })
+    if VALUATION_SNAPSHOTS != "off":
+        steps["Valuation snapshots"] = valuation_snapshots.start()
+    results = await asyncio.gather(*steps.values(), return_exceptions=True)
+    for step, result in zip(steps, results):
+        if isinstance(result, Exception):
+            logger.error(f"{step} failed: {result}")
\ No newline at end of file
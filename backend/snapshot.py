@@ -0,0 +1,274 @@
+"""
+Columnar in-memory snapshot of the product catalogue for vectorized analytics.
+
+Holds one NumPy array per numeric field (price, quantity, low-stock threshold,
+category code) plus the product ids, so stats, low-stock selection, category
+breakdowns, ABC classification and stock percentiles are array operations
+instead of Python loops over product dicts.
+
+Writes don't touch the arrays directly: inventory_changed() marks the written
+product ids dirty (or the whole snapshot stale), and the next query re-reads
+just those products by id before answering. A full reload happens on first
+use, after invalidations from other worker processes, and every `max_age`
+seconds as a safety net for writes made outside the API (seed scripts).
+Full reloads scan the catalogue through the read (report) storage under a
+time budget; dirty products are always re-read from the primary, including
+right after a full reload, so a lagging secondary can't hide a local write.
+Deleted products are tombstoned and compacted away once they make up
+`compact_ratio` of the rows.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+
+from storage import DEFAULT_LOW_STOCK_THRESHOLD, ProductFilter
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PROJECTION = {"_id": 0, "id": 1, "price": 1, "quantity": 1, "low_stock_threshold": 1, "category": 1}
+
+
+def _field(doc: dict, name: str, default=0):
+    value = doc.get(name)
+    return default if value is None else value
+
+
+class CatalogueSnapshot:
+    def __init__(self, get_storage: Callable[[], Any], get_read_storage: Optional[Callable[[], Any]] = None,
+                 get_max_time_ms: Optional[Callable[[], Optional[int]]] = None,
+                 max_age: float = 300.0, compact_ratio: float = 0.25):
+        self.get_storage = get_storage
+        # Where full reloads run (e.g. a secondary) and their maxTimeMS; dirty ids use get_storage
+        self.get_read_storage = get_read_storage or get_storage
+        self.get_max_time_ms = get_max_time_ms or (lambda: None)
+        self.max_age = max_age
+        self.compact_ratio = compact_ratio
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.price = np.zeros(0, dtype=np.float64)
+        self.quantity = np.zeros(0, dtype=np.int64)
+        self.threshold = np.zeros(0, dtype=np.int64)
+        self.category = np.zeros(0, dtype=np.int32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.category_names: List[str] = []
+        self._category_codes: Dict[str, int] = {}
+        self.loaded_at: Optional[float] = None
+        self.full_loads = 0
+        self.incremental_refreshes = 0
+        self._stale = True
+        self._dirty: Set[str] = set()
+        self._lock: Optional[asyncio.Lock] = None
+
+    # -- keeping it fresh ---------------------------------------------------
+
+    def mark_stale(self):
+        """Reload everything before the next query."""
+        self._stale = True
+
+    def mark_dirty(self, product_ids: Iterable[str]):
+        """Re-read these products before the next query."""
+        self._dirty.update(product_ids)
+
+    def _expired(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.max_age
+
+    async def ensure_fresh(self):
+        if not (self._stale or self._dirty or self._expired()):
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._stale or self._expired():
+                # Dirty ids are kept: they are re-read from the primary below, after the load
+                self._stale = False
+                try:
+                    started = time.perf_counter()
+                    docs = await self.get_read_storage().products.find(
+                        ProductFilter(), SNAPSHOT_PROJECTION, max_time_ms=self.get_max_time_ms()
+                    )
+                    self.load(docs)
+                except Exception:
+                    self._stale = True
+                    raise
+                logger.info(f"Catalogue snapshot loaded {len(docs)} products in {(time.perf_counter() - started) * 1000:.0f} ms")
+            if self._dirty:
+                ids = list(self._dirty)
+                self._dirty.clear()
+                try:
+                    docs = await self.get_storage().products.find_by_ids(ids, SNAPSHOT_PROJECTION)
+                except Exception:
+                    self._dirty.update(ids)
+                    raise
+                self.apply(ids, docs)
+
+    def _category_code(self, name: Optional[str]) -> int:
+        name = name or ""
+        code = self._category_codes.get(name)
+        if code is None:
+            code = self._category_codes[name] = len(self.category_names)
+            self.category_names.append(name)
+        return code
+
+    def load(self, docs: Sequence[dict]):
+        """Replace the snapshot with these product documents."""
+        self.category_names = []
+        self._category_codes = {}
+        n = len(docs)
+        self.ids = [d["id"] for d in docs]
+        self.rows = {pid: row for row, pid in enumerate(self.ids)}
+        self.price = np.fromiter((_field(d, "price") for d in docs), dtype=np.float64, count=n)
+        self.quantity = np.fromiter((_field(d, "quantity") for d in docs), dtype=np.int64, count=n)
+        self.threshold = np.fromiter(
+            (_field(d, "low_stock_threshold", DEFAULT_LOW_STOCK_THRESHOLD) for d in docs), dtype=np.int64, count=n
+        )
+        self.category = np.fromiter((self._category_code(d.get("category")) for d in docs), dtype=np.int32, count=n)
+        self.alive = np.ones(n, dtype=bool)
+        self.loaded_at = time.monotonic()
+        self.full_loads += 1
+
+    def apply(self, product_ids: Sequence[str], docs: Sequence[dict]):
+        """Apply re-read documents for `product_ids`; ids without a document were deleted."""
+        found = {d["id"]: d for d in docs}
+        added = []
+        for pid in product_ids:
+            doc = found.get(pid)
+            row = self.rows.get(pid)
+            if doc is None:
+                if row is not None:
+                    self.alive[row] = False
+                    del self.rows[pid]
+            elif row is None:
+                added.append(doc)
+            else:
+                self.price[row] = _field(doc, "price")
+                self.quantity[row] = _field(doc, "quantity")
+                self.threshold[row] = _field(doc, "low_stock_threshold", DEFAULT_LOW_STOCK_THRESHOLD)
+                self.category[row] = self._category_code(doc.get("category"))
+        if added:
+            start = len(self.ids)
+            self.ids.extend(d["id"] for d in added)
+            self.rows.update((d["id"], start + i) for i, d in enumerate(added))
+            self.price = np.concatenate([self.price, [_field(d, "price") for d in added]])
+            self.quantity = np.concatenate([self.quantity, [_field(d, "quantity") for d in added]]).astype(np.int64)
+            self.threshold = np.concatenate(
+                [self.threshold, [_field(d, "low_stock_threshold", DEFAULT_LOW_STOCK_THRESHOLD) for d in added]]
+            ).astype(np.int64)
+            self.category = np.concatenate(
+                [self.category, [self._category_code(d.get("category")) for d in added]]
+            ).astype(np.int32)
+            self.alive = np.concatenate([self.alive, np.ones(len(added), dtype=bool)])
+        if len(self.ids) and (len(self.ids) - len(self.rows)) / len(self.ids) > self.compact_ratio:
+            self._compact()
+        self.incremental_refreshes += 1
+
+    def _compact(self):
+        keep = np.flatnonzero(self.alive)
+        self.ids = [self.ids[row] for row in keep]
+        self.rows = {pid: row for row, pid in enumerate(self.ids)}
+        self.price = self.price[keep]
+        self.quantity = self.quantity[keep]
+        self.threshold = self.threshold[keep]
+        self.category = self.category[keep]
+        self.alive = np.ones(len(keep), dtype=bool)
+
+    # -- vectorized queries (call ensure_fresh() first) -----------------------
+
+    def _select(self, mask: np.ndarray, limit: Optional[int] = None) -> List[str]:
+        rows = np.flatnonzero(mask & self.alive)
+        if limit is not None:
+            rows = rows[:limit]
+        return [self.ids[row] for row in rows]
+
+    def columns(self) -> Dict[str, Any]:
+        """Live rows only: ids plus the numeric columns, index-aligned."""
+        rows = np.flatnonzero(self.alive)
+        return {
+            "ids": [self.ids[row] for row in rows],
+            "price": self.price[rows],
+            "quantity": self.quantity[rows],
+            "threshold": self.threshold[rows],
+            "category": self.category[rows],
+        }
+
+    def product_ids(self, limit: Optional[int] = None) -> List[str]:
+        return self._select(self.alive, limit)
+
+    def low_stock_ids(self, limit: Optional[int] = None) -> List[str]:
+        return self._select(self.quantity <= self.threshold, limit)
+
+    def out_of_stock_ids(self, limit: Optional[int] = None) -> List[str]:
+        return self._select(self.quantity == 0, limit)
+
+    def valuation(self) -> dict:
+        alive = self.alive
+        quantity = self.quantity[alive]
+        return {
+            "total_products": int(alive.sum()),
+            "total_quantity": int(quantity.sum()),
+            "total_stock_value": float(np.dot(self.price[alive], quantity)),
+            "low_stock_items": int(np.count_nonzero(quantity <= self.threshold[alive])),
+            "out_of_stock_items": int(np.count_nonzero(quantity == 0)),
+        }
+
+    def category_breakdown(self) -> Dict[str, dict]:
+        """Product count, units and stock value per category name."""
+        alive = self.alive
+        codes = self.category[alive]
+        quantity = self.quantity[alive]
+        size = len(self.category_names)
+        counts = np.bincount(codes, minlength=size)
+        units = np.bincount(codes, weights=quantity, minlength=size)
+        values = np.bincount(codes, weights=self.price[alive] * quantity, minlength=size)
+        return {
+            name: {"count": int(counts[code]), "quantity": int(units[code]), "total_value": float(values[code])}
+            for code, name in enumerate(self.category_names)
+            if counts[code]
+        }
+
+    def abc_classification(self, a: float = 0.8, b: float = 0.95) -> dict:
+        """
+        Pareto (ABC) classes by stock value: A holds the most valuable products making up
+        the first `a` of total value, B the next `b - a`, C the rest.
+        """
+        rows = np.flatnonzero(self.alive)
+        values = self.price[rows] * self.quantity[rows]
+        total = float(values.sum())
+        # 0 = A, 1 = B, 2 = C
+        labels = np.full(len(rows), 2, dtype=np.int8)
+        if total > 0:
+            order = np.argsort(-values, kind="stable")
+            ordered = values[order]
+            share_before = (np.cumsum(ordered) - ordered) / total
+            labels[order] = np.where(share_before < a, 0, np.where(share_before < b, 1, 2))
+        counts = np.bincount(labels, minlength=3)
+        class_values = np.bincount(labels, weights=values, minlength=3)
+        classes = {
+            label: {
+                "products": int(counts[i]),
+                "stock_value": float(class_values[i]),
+                "value_share": float(class_values[i]) / total if total else 0.0,
+            }
+            for i, label in enumerate("ABC")
+        }
+        return {"thresholds": {"A": a, "B": b}, "total_stock_value": total, "classes": classes}
+
+    def stock_percentiles(self, percentiles: Sequence[float] = (10, 25, 50, 75, 90, 99)) -> Dict[str, float]:
+        """Units in stock at the given percentiles, across all products."""
+        quantity = self.quantity[self.alive]
+        if not len(quantity):
+            return {f"p{p:g}": 0.0 for p in percentiles}
+        return {f"p{p:g}": float(v) for p, v in zip(percentiles, np.percentile(quantity, percentiles))}
+
+    def stats(self) -> dict:
+        return {
+            "products": len(self.rows),
+            "rows": len(self.ids),
+            "categories": len(self.category_names),
+            "age_seconds": None if self.loaded_at is None else time.monotonic() - self.loaded_at,
+            "full_loads": self.full_loads,
+            "incremental_refreshes": self.incremental_refreshes,
+            "pending_refresh": len(self._dirty),
+        }
@@ -1,4 +1,8 @@
 #!/usr/bin/env bash
 # Backend start script for Render (default port 10000) and Railway (uses $PORT)
+# Set WEB_CONCURRENCY > 1 to run several worker processes under gunicorn (see gunicorn.conf.py)
 PORT=${PORT:-10000}
+if [ "${WEB_CONCURRENCY:-1}" -gt 1 ]; then
+    exec gunicorn server:app -c gunicorn.conf.py
+fi
 exec uvicorn server:app --host 0.0.0.0 --port $PORT
@@ -0,0 +1,534 @@
+"""
+Storage layer: repositories for the documents the API owns.
+
+server.py talks to a Storage (admins, categories, products, activity logs,
+report jobs, valuation snapshots and the inventory data version) instead of
+to MongoDB collections directly. Two engines implement it:
+
+- MongoStorage (this module): Motor collections of one database, as before.
+- MemoryStorage (memory_storage.py): in-process indexed dicts, for running the
+  API and the load test without a MongoDB and for comparing storage overhead.
+
+Documents are plain dicts without `_id`. Projections use MongoDB's shape
+(`{"_id": 0, "name": 1}` includes fields, `{"_id": 0, "password_hash": 0}`
+excludes them) so handlers can keep building them the way they always have.
+`max_time_ms` is a query time budget; engines that can't overrun ignore it.
+"""
+import uuid
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Set
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from invalidation import CHANGE_HISTORY, CHANGE_MAX_IDS, VERSION_ID, VERSIONS_COLLECTION
+
+DEFAULT_LOW_STOCK_THRESHOLD = 10
+
+
+class ProductFilter:
+    """Product list / bulk selection criteria; every given condition must match."""
+    def __init__(self, category: Optional[str] = None, search: Optional[str] = None,
+                 low_stock: Optional[bool] = None, category_id: Optional[str] = None):
+        self.category = category
+        self.search = search
+        self.low_stock = low_stock
+        self.category_id = category_id
+
+    def __bool__(self) -> bool:
+        return bool(self.category or self.search or self.low_stock or self.category_id)
+
+
+# -- repository interfaces ----------------------------------------------------
+
+class AdminRepository(ABC):
+    @abstractmethod
+    async def get_by_email(self, email: str, projection: Optional[dict] = None) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def list(self, projection: Optional[dict] = None, limit: int = 1000) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def insert_one(self, doc: dict):
+        ...
+
+
+class CategoryRepository(ABC):
+    @abstractmethod
+    async def get(self, category_id: str, projection: Optional[dict] = None) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def get_by_name(self, name: str, projection: Optional[dict] = None) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def list(self, limit: int = 1000, max_time_ms: Optional[int] = None) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def count(self, max_time_ms: Optional[int] = None) -> int:
+        ...
+
+    @abstractmethod
+    async def insert_one(self, doc: dict):
+        ...
+
+    @abstractmethod
+    async def insert_many(self, docs: List[dict], ordered: bool = True):
+        ...
+
+    @abstractmethod
+    async def update(self, category_id: str, fields: dict):
+        ...
+
+    @abstractmethod
+    async def delete(self, category_id: str):
+        ...
+
+
+class ProductRepository(ABC):
+    @abstractmethod
+    async def get(self, product_id: str, projection: Optional[dict] = None) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def find_by_ids(self, ids: List[str], projection: Optional[dict] = None,
+                          max_time_ms: Optional[int] = None) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def find_by_skus(self, skus: List[str], projection: Optional[dict] = None) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def find(self, filter: ProductFilter, projection: Optional[dict] = None, limit: Optional[int] = None,
+                   max_time_ms: Optional[int] = None) -> List[dict]:
+        """Products matching `filter` (all of them for an empty filter), at most `limit`."""
+
+    @abstractmethod
+    async def count_in_category(self, category_id: str) -> int:
+        ...
+
+    @abstractmethod
+    async def count_by_category_id(self) -> Dict[str, int]:
+        """Product count per category id, for products that have one."""
+
+    @abstractmethod
+    async def valuation_by_category(self, max_time_ms: Optional[int] = None) -> List[dict]:
+        """
+        Per category name ("" for none): products, quantity, stock_value, low_stock_items
+        and out_of_stock_items.
+        """
+
+    @abstractmethod
+    async def insert_one(self, doc: dict):
+        ...
+
+    @abstractmethod
+    async def insert_many(self, docs: List[dict], ordered: bool = True):
+        ...
+
+    @abstractmethod
+    async def update(self, product_id: str, fields: dict):
+        ...
+
+    @abstractmethod
+    async def update_many(self, ids: List[str], set_fields: dict, inc_fields: Optional[dict] = None) -> int:
+        """Set / increment fields on these products; returns how many were modified."""
+
+    @abstractmethod
+    async def update_category(self, category_id: str, fields: dict) -> int:
+        """Set fields on every product of a category; returns how many were modified."""
+
+    @abstractmethod
+    async def link_category(self, name: str, fields: dict) -> int:
+        """Set fields on products named into category `name` without a category id; returns how many were modified."""
+
+    @abstractmethod
+    async def delete(self, product_id: str):
+        ...
+
+    @abstractmethod
+    async def delete_many(self, ids: List[str]) -> int:
+        ...
+
+
+class ActivityRepository(ABC):
+    @abstractmethod
+    async def recent(self, limit: int, action: Optional[str] = None, product_id: Optional[str] = None,
+                     since: Optional[str] = None, until: Optional[str] = None,
+                     max_time_ms: Optional[int] = None) -> List[dict]:
+        """Newest first; `since` / `until` are ISO timestamps (inclusive / exclusive)."""
+
+    @abstractmethod
+    async def movements(self, since: str, actions: List[str], batch_size: int = 10000) -> List[dict]:
+        """product_id, quantity_change and timestamp of logs with these actions from `since` on."""
+
+    @abstractmethod
+    async def insert_one(self, doc: dict):
+        ...
+
+    @abstractmethod
+    async def insert_many(self, docs: List[dict], ordered: bool = True):
+        ...
+
+
+class ReportJobRepository(ABC):
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def find_active(self, key: str, created_after: str) -> Optional[dict]:
+        """A pending or running job for this result key created after `created_after`."""
+
+    @abstractmethod
+    async def insert_one(self, doc: dict):
+        ...
+
+    @abstractmethod
+    async def update(self, job_id: str, fields: dict):
+        ...
+
+
+class ValuationSnapshotRepository(ABC):
+    @abstractmethod
+    async def existing_ids(self, ids: List[str]) -> Set[str]:
+        ...
+
+    @abstractmethod
+    async def insert_if_absent(self, snapshot_id: str, doc: dict) -> bool:
+        """Store `doc` under `snapshot_id` unless one exists; True if this call stored it."""
+
+    @abstractmethod
+    async def find_range(self, granularity: str, since: str, until: str, category: Optional[str] = None,
+                         limit: int = 10000) -> List[dict]:
+        """
+        Snapshots with since <= bucket < until, oldest first: bucket, taken_at and either
+        totals or (with `category`) `categories` holding at most that category's entry.
+        """
+
+
+class Storage(ABC):
+    admins: AdminRepository
+    categories: CategoryRepository
+    products: ProductRepository
+    activity_logs: ActivityRepository
+    report_jobs: ReportJobRepository
+    valuation_snapshots: ValuationSnapshotRepository
+
+    @abstractmethod
+    async def data_version(self) -> int:
+        """Version of the inventory, bumped by every product / category write."""
+
+    @abstractmethod
+    async def dataset_id(self) -> str:
+        """
+        Identity of the dataset the data version counts writes of. It changes whenever the
+        version can't be trusted to (a new or reset database, a new in-memory store), so
+        (dataset_id, data_version) never names two different states of the data.
+        """
+
+    @abstractmethod
+    async def reset_data_version(self):
+        """Start a new dataset identity, e.g. after bulk writes made outside the API."""
+
+    @abstractmethod
+    async def bump_data_version(self, product_ids: Optional[List[str]] = None) -> int:
+        """
+        Increment the inventory version, recording which products the write touched
+        (None: unknown / all of them) for other processes; returns the new value.
+        """
+
+
+# -- MongoDB (Motor) ------------------------------------------------------------
+
+def _budget(cursor, max_time_ms: Optional[int]):
+    return cursor if max_time_ms is None else cursor.max_time_ms(max_time_ms)
+
+
+def _count_options(max_time_ms: Optional[int]) -> dict:
+    return {} if max_time_ms is None else {"maxTimeMS": max_time_ms}
+
+
+def _projection(projection: Optional[dict]) -> dict:
+    return projection or {"_id": 0}
+
+
+def product_query(filter: ProductFilter) -> dict:
+    query = {}
+    if filter.category_id:
+        # Served by the (category_id, name) compound index
+        query["category_id"] = filter.category_id
+    if filter.category:
+        # Served by the (category, name) compound index (the frontend filters by name)
+        query["category"] = filter.category
+    if filter.search:
+        query["$or"] = [
+            {"name": {"$regex": filter.search, "$options": "i"}},
+            {"sku": {"$regex": filter.search, "$options": "i"}}
+        ]
+    if filter.low_stock:
+        # Products at or below their threshold (documents without one default to 10)
+        query["$expr"] = {"$lte": ["$quantity", {"$ifNull": ["$low_stock_threshold", DEFAULT_LOW_STOCK_THRESHOLD]}]}
+    return query
+
+
+_quantity = {"$ifNull": ["$quantity", 0]}
+VALUATION_PIPELINE = [
+    {"$group": {
+        "_id": "$category",
+        "products": {"$sum": 1},
+        "quantity": {"$sum": _quantity},
+        "stock_value": {"$sum": {"$multiply": [{"$ifNull": ["$price", 0]}, _quantity]}},
+        "low_stock_items": {"$sum": {"$cond": [
+            {"$lte": [_quantity, {"$ifNull": ["$low_stock_threshold", DEFAULT_LOW_STOCK_THRESHOLD]}]}, 1, 0
+        ]}},
+        "out_of_stock_items": {"$sum": {"$cond": [{"$eq": [_quantity, 0]}, 1, 0]}},
+    }},
+]
+
+
+class MongoAdminRepository(AdminRepository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def get_by_email(self, email, projection=None):
+        return await self.collection.find_one({"email": email}, _projection(projection))
+
+    async def list(self, projection=None, limit=1000):
+        return await self.collection.find({}, _projection(projection)).to_list(limit)
+
+    async def insert_one(self, doc):
+        await self.collection.insert_one(doc)
+
+
+class MongoCategoryRepository(CategoryRepository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def get(self, category_id, projection=None):
+        return await self.collection.find_one({"id": category_id}, _projection(projection))
+
+    async def get_by_name(self, name, projection=None):
+        return await self.collection.find_one({"name": name}, _projection(projection))
+
+    async def list(self, limit=1000, max_time_ms=None):
+        return await _budget(self.collection.find({}, {"_id": 0}), max_time_ms).to_list(limit)
+
+    async def count(self, max_time_ms=None):
+        return await self.collection.count_documents({}, **_count_options(max_time_ms))
+
+    async def insert_one(self, doc):
+        await self.collection.insert_one(doc)
+
+    async def insert_many(self, docs, ordered=True):
+        await self.collection.insert_many(docs, ordered=ordered)
+
+    async def update(self, category_id, fields):
+        await self.collection.update_one({"id": category_id}, {"$set": fields})
+
+    async def delete(self, category_id):
+        await self.collection.delete_one({"id": category_id})
+
+
+class MongoProductRepository(ProductRepository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def get(self, product_id, projection=None):
+        return await self.collection.find_one({"id": product_id}, _projection(projection))
+
+    async def find_by_ids(self, ids, projection=None, max_time_ms=None):
+        cursor = self.collection.find({"id": {"$in": ids}}, _projection(projection))
+        return await _budget(cursor, max_time_ms).to_list(len(ids))
+
+    async def find_by_skus(self, skus, projection=None):
+        return await self.collection.find({"sku": {"$in": skus}}, _projection(projection)).to_list(len(skus))
+
+    async def find(self, filter, projection=None, limit=None, max_time_ms=None):
+        cursor = _budget(self.collection.find(product_query(filter), _projection(projection)), max_time_ms)
+        return await cursor.to_list(limit)
+
+    async def count_in_category(self, category_id):
+        return await self.collection.count_documents({"category_id": category_id})
+
+    async def count_by_category_id(self):
+        counts = await self.collection.aggregate([
+            {"$match": {"category_id": {"$ne": None}}},
+            {"$group": {"_id": "$category_id", "count": {"$sum": 1}}},
+        ]).to_list(None)
+        return {c["_id"]: c["count"] for c in counts}
+
+    async def valuation_by_category(self, max_time_ms=None):
+        rows = await self.collection.aggregate(VALUATION_PIPELINE, **_count_options(max_time_ms)).to_list(None)
+        for row in rows:
+            row["category"] = row.pop("_id") or ""
+        return rows
+
+    async def insert_one(self, doc):
+        await self.collection.insert_one(doc)
+
+    async def insert_many(self, docs, ordered=True):
+        await self.collection.insert_many(docs, ordered=ordered)
+
+    async def update(self, product_id, fields):
+        await self.collection.update_one({"id": product_id}, {"$set": fields})
+
+    async def update_many(self, ids, set_fields, inc_fields=None):
+        update = {"$set": set_fields}
+        if inc_fields:
+            update["$inc"] = inc_fields
+        result = await self.collection.update_many({"id": {"$in": ids}}, update)
+        return result.modified_count
+
+    async def update_category(self, category_id, fields):
+        result = await self.collection.update_many({"category_id": category_id}, {"$set": fields})
+        return result.modified_count
+
+    async def link_category(self, name, fields):
+        # {"category_id": None} matches both null and a missing field
+        result = await self.collection.update_many({"category": name, "category_id": None}, {"$set": fields})
+        return result.modified_count
+
+    async def delete(self, product_id):
+        await self.collection.delete_one({"id": product_id})
+
+    async def delete_many(self, ids):
+        result = await self.collection.delete_many({"id": {"$in": ids}})
+        return result.deleted_count
+
+
+class MongoActivityRepository(ActivityRepository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def recent(self, limit, action=None, product_id=None, since=None, until=None, max_time_ms=None):
+        query = {}
+        if action:
+            query["action"] = action
+        if product_id:
+            query["product_id"] = product_id
+        if since or until:
+            query["timestamp"] = {}
+            if since:
+                query["timestamp"]["$gte"] = since
+            if until:
+                query["timestamp"]["$lt"] = until
+        cursor = self.collection.find(query, {"_id": 0}).sort("timestamp", -1).limit(limit)
+        return await _budget(cursor, max_time_ms).to_list(limit)
+
+    async def movements(self, since, actions, batch_size=10000):
+        cursor = self.collection.find(
+            {"timestamp": {"$gte": since}, "action": {"$in": actions}},
+            {"_id": 0, "product_id": 1, "quantity_change": 1, "timestamp": 1},
+            batch_size=batch_size,
+        )
+        return await cursor.to_list(None)
+
+    async def insert_one(self, doc):
+        await self.collection.insert_one(doc)
+
+    async def insert_many(self, docs, ordered=True):
+        await self.collection.insert_many(docs, ordered=ordered)
+
+
+class MongoReportJobRepository(ReportJobRepository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def get(self, job_id):
+        return await self.collection.find_one({"id": job_id}, {"_id": 0})
+
+    async def find_active(self, key, created_after):
+        return await self.collection.find_one(
+            {"key": key, "status": {"$in": ["pending", "running"]}, "created_at": {"$gte": created_after}},
+            {"_id": 0},
+        )
+
+    async def insert_one(self, doc):
+        await self.collection.insert_one(doc)
+
+    async def update(self, job_id, fields):
+        await self.collection.update_one({"id": job_id}, {"$set": fields})
+
+
+class MongoValuationSnapshotRepository(ValuationSnapshotRepository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def existing_ids(self, ids):
+        docs = await self.collection.find({"_id": {"$in": ids}}, {"_id": 1}).to_list(len(ids))
+        return {doc["_id"] for doc in docs}
+
+    async def insert_if_absent(self, snapshot_id, doc):
+        try:
+            result = await self.collection.update_one({"_id": snapshot_id}, {"$setOnInsert": doc}, upsert=True)
+        except DuplicateKeyError:
+            # Another worker inserted the same snapshot at the same moment
+            return False
+        return result.upserted_id is not None
+
+    async def find_range(self, granularity, since, until, category=None, limit=10000):
+        projection = {"_id": 0, "bucket": 1, "taken_at": 1}
+        if category is None:
+            projection["totals"] = 1
+        else:
+            # Only the requested category's entry comes back, not every category
+            projection["categories"] = {"$elemMatch": {"category": category}}
+        cursor = self.collection.find(
+            {"granularity": granularity, "bucket": {"$gte": since, "$lt": until}}, projection
+        ).sort("bucket", 1).limit(limit)
+        return await cursor.to_list(limit)
+
+
+class MongoStorage(Storage):
+    def __init__(self, db):
+        self.db = db
+        self.admins = MongoAdminRepository(db.admins)
+        self.categories = MongoCategoryRepository(db.categories)
+        self.products = MongoProductRepository(db.products)
+        self.activity_logs = MongoActivityRepository(db.activity_logs)
+        self.report_jobs = MongoReportJobRepository(db.report_jobs)
+        self.valuation_snapshots = MongoValuationSnapshotRepository(db.valuation_snapshots)
+
+    async def data_version(self):
+        doc = await self.db[VERSIONS_COLLECTION].find_one({"_id": VERSION_ID}, {"version": 1})
+        return doc.get("version", 0) if doc else 0
+
+    async def dataset_id(self):
+        versions = self.db[VERSIONS_COLLECTION]
+        doc = await versions.find_one({"_id": VERSION_ID}, {"epoch": 1})
+        if not doc or "epoch" not in doc:
+            # First use (or a document from before epochs): the first writer's epoch wins
+            try:
+                await versions.update_one(
+                    {"_id": VERSION_ID, "epoch": {"$exists": False}}, {"$set": {"epoch": uuid.uuid4().hex}}, upsert=True
+                )
+            except DuplicateKeyError:
+                pass
+            doc = await versions.find_one({"_id": VERSION_ID}, {"epoch": 1})
+        return f"{self.db.name}:{doc['epoch']}"
+
+    async def reset_data_version(self):
+        # Also a version bump with unknown ids, so running workers drop all their caches
+        await self.db[VERSIONS_COLLECTION].update_one(
+            {"_id": VERSION_ID},
+            {"$set": {"epoch": uuid.uuid4().hex}, "$inc": {"version": 1},
+             "$push": {"changes": {"$each": [None], "$slice": -CHANGE_HISTORY}}},
+            upsert=True,
+        )
+
+    async def bump_data_version(self, product_ids=None):
+        # One atomic update, so the pushed entry is the last one exactly when the version is the new one
+        change = list(product_ids) if product_ids is not None and len(product_ids) <= CHANGE_MAX_IDS else None
+        doc = await self.db[VERSIONS_COLLECTION].find_one_and_update(
+            {"_id": VERSION_ID},
+            {"$inc": {"version": 1}, "$push": {"changes": {"$each": [change], "$slice": -CHANGE_HISTORY}},
+             "$setOnInsert": {"epoch": uuid.uuid4().hex}},
+            projection={"version": 1}, upsert=True, return_document=ReturnDocument.AFTER,
+        )
+        return doc["version"]
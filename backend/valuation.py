@@ -0,0 +1,145 @@
+"""
+Periodic inventory valuation snapshots for historical reporting.
+
+Stock value is otherwise only known for "now". ValuationSnapshots records it
+once per hour and once per day in the `valuation_snapshots` collection: one
+small document per bucket holding the global totals plus one entry per
+category, computed by a single `$group` aggregation on the server (see
+storage.py). Trend queries then read a few hundred of these documents instead
+of replaying the activity log.
+
+Every worker process runs the scheduler. A bucket's document id is derived
+from its start time and only inserted if absent, so the first capture of a
+bucket wins and later or concurrent captures (other workers, restarts) are
+no-ops. Hourly documents carry `expires_at` for a TTL index; daily documents
+are kept indefinitely.
+"""
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+TOTAL_FIELDS = ("products", "quantity", "stock_value", "low_stock_items", "out_of_stock_items")
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    moment = moment.astimezone(timezone.utc)
+    if granularity == "day":
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def snapshot_id(granularity: str, start: datetime) -> str:
+    return f"{granularity}:{start.isoformat()}"
+
+
+class ValuationSnapshots:
+    def __init__(self, get_storage: Callable[[], Any], get_read_storage: Optional[Callable[[], Any]] = None,
+                 hourly_retention_days: float = 90.0, max_time_ms: int = 600000):
+        self.get_storage = get_storage
+        # Where the aggregation runs (e.g. a secondary); snapshots are written through get_storage
+        self.get_read_storage = get_read_storage or get_storage
+        self.hourly_retention_days = hourly_retention_days
+        self.max_time_ms = max_time_ms
+        self.captured = 0
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def aggregate(self) -> dict:
+        """Current valuation: global totals plus one entry per category."""
+        rows = await self.get_read_storage().products.valuation_by_category(max_time_ms=self.max_time_ms)
+        categories = sorted(
+            ({"category": row["category"], **{field: row[field] for field in TOTAL_FIELDS}} for row in rows),
+            key=lambda c: c["category"],
+        )
+        totals = {field: sum(c[field] for c in categories) for field in TOTAL_FIELDS}
+        return {"totals": totals, "categories": categories}
+
+    async def missing_buckets(self, now: datetime) -> List[tuple]:
+        starts = [(granularity, bucket_start(now, granularity)) for granularity in GRANULARITIES]
+        ids = [snapshot_id(granularity, start) for granularity, start in starts]
+        present = await self.get_storage().valuation_snapshots.existing_ids(ids)
+        return [(granularity, start) for (granularity, start), _id in zip(starts, ids) if _id not in present]
+
+    async def capture(self, now: Optional[datetime] = None) -> int:
+        """Record the current hour's and day's snapshots if they don't exist yet. Returns how many were written."""
+        now = now or datetime.now(timezone.utc)
+        missing = await self.missing_buckets(now)
+        if not missing:
+            return 0
+        valuation = await self.aggregate()
+        snapshots = self.get_storage().valuation_snapshots
+        written = 0
+        for granularity, start in missing:
+            doc = {
+                "granularity": granularity,
+                "bucket": start.isoformat(),
+                "taken_at": now.isoformat(),
+                **valuation,
+            }
+            if granularity == "hour":
+                doc["expires_at"] = start + timedelta(days=self.hourly_retention_days)
+            if await snapshots.insert_if_absent(snapshot_id(granularity, start), doc):
+                written += 1
+        self.captured += written
+        return written
+
+    async def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                written = await self.capture()
+                if written:
+                    logger.info(f"Recorded {written} valuation snapshot(s)")
+                self.last_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f"Valuation snapshot failed: {e}; retrying next hour")
+            # Wake shortly after the next hour starts; jitter spreads workers apart
+            now = datetime.now(timezone.utc)
+            next_hour = bucket_start(now, "hour") + GRANULARITIES["hour"]
+            await asyncio.sleep((next_hour - now).total_seconds() + random.uniform(1, 30))
+
+    async def history(self, granularity: str, since: datetime, until: datetime,
+                      category: Optional[str] = None, limit: int = 10000) -> List[Dict[str, Any]]:
+        """Snapshots with since <= bucket < until, oldest first, as flat points."""
+        # Bucket ids are UTC ISO strings and compared as strings, so both bounds must be UTC
+        docs = await self.get_storage().valuation_snapshots.find_range(
+            granularity, bucket_start(since, granularity).isoformat(),
+            until.astimezone(timezone.utc).isoformat(), category, limit,
+        )
+        points = []
+        for doc in docs:
+            if category is None:
+                values = doc["totals"]
+            else:
+                values = next((c for c in doc.get("categories", []) if c["category"] == category), None)
+                if values is None:
+                    values = {field: 0 for field in TOTAL_FIELDS}
+            points.append({"bucket": doc["bucket"], "taken_at": doc["taken_at"],
+                           **{field: values[field] for field in TOTAL_FIELDS}})
+        return points
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "captured": self.captured,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,44 @@
+"""
+API tests run hermetically against the in-memory storage engine (STORAGE_BACKEND=memory):
+every test gets a fresh app lifespan, an empty store and empty process-local caches.
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Must be set before server is imported
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret-key-for-the-api-test-suite")
+os.environ.setdefault("VALUATION_SNAPSHOTS", "off")
+for limit in ("CHAT_RATE_LIMIT", "REPORT_RATE_LIMIT", "STATS_RATE_LIMIT"):
+    os.environ.setdefault(limit, "0")
+
+import server  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+ADMIN = {"email": "admin@example.com", "password": "secret", "name": "Admin"}
+
+
+def login(test_client):
+    """Register the test admin (if needed) and authenticate the client as it."""
+    test_client.post("/api/auth/register", json=ADMIN)
+    response = test_client.post("/api/auth/login", json={"email": ADMIN["email"], "password": ADMIN["password"]})
+    test_client.headers["Authorization"] = f"Bearer {response.json()['token']}"
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    server.product_cache.invalidate()
+    server.invalidate_all()
+    # Created again on first use
+    monkeypatch.setattr(server, "catalogue", None)
+    monkeypatch.setattr(server, "demand_history", None)
+    monkeypatch.setattr(server.report_jobs, "results_dir", tmp_path / "reports")
+    with TestClient(server.app) as test_client:
+        login(test_client)
+        yield test_client
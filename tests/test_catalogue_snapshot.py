@@ -0,0 +1,36 @@
+"""Dashboard endpoints served from the catalogue snapshot must see writes immediately."""
+
+
+def create_product(client, **fields):
+    body = {"name": "Brass Lamp", "sku": "BL-1", "price": 20.0, "quantity": 5, "category": "Decor",
+            "low_stock_threshold": 10, **fields}
+    response = client.post("/api/products", json=body)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_created_product_appears_in_stats_and_low_stock(client):
+    # Load the snapshot before the write so a missed invalidation would serve stale numbers
+    assert client.get("/api/stats").json()["total_products"] == 0
+    assert client.get("/api/reports/low-stock").json() == []
+
+    product = create_product(client)
+
+    stats = client.get("/api/stats").json()
+    assert stats["total_products"] == 1
+    assert stats["low_stock_items"] == 1
+    assert stats["total_stock_value"] == 100.0
+    assert [p["id"] for p in client.get("/api/reports/low-stock").json()] == [product["id"]]
+
+
+def test_updated_and_deleted_products_leave_stats(client):
+    product = create_product(client)
+    assert client.get("/api/stats").json()["low_stock_items"] == 1
+
+    client.put(f"/api/products/{product['id']}", json={"quantity": 50})
+    stats = client.get("/api/stats").json()
+    assert stats["low_stock_items"] == 0
+    assert stats["total_stock_value"] == 1000.0
+
+    client.delete(f"/api/products/{product['id']}")
+    assert client.get("/api/stats").json()["total_products"] == 0
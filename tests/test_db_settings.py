@@ -0,0 +1,63 @@
+"""Validation of the MONGO_* / REPORT_* client settings."""
+import pytest
+
+from db_settings import SettingsError, load_mongo_settings
+
+
+@pytest.mark.parametrize("env, options", [
+    ({}, {"serverSelectionTimeoutMS": 30000}),
+    ({"MONGO_MAX_POOL_SIZE": "50", "MONGO_MIN_POOL_SIZE": "5"}, {"maxPoolSize": 50, "minPoolSize": 5}),
+    ({"MONGO_WRITE_CONCERN": "2", "MONGO_WRITE_TIMEOUT_MS": "500"}, {"w": 2, "wTimeoutMS": 500}),
+    ({"MONGO_WRITE_CONCERN": "majority"}, {"w": "majority"}),
+    ({"MONGO_WRITE_CONCERN": "dc-east"}, {"w": "dc-east"}),
+    ({"MONGO_COMPRESSORS": "zlib"}, {"compressors": "zlib"}),
+])
+def test_valid_settings(env, options):
+    settings = load_mongo_settings(env)
+    assert options.items() <= settings.client_options.items()
+    assert settings.warnings == []
+    assert settings.report_max_time_ms == 30000
+
+
+@pytest.mark.parametrize("env, error", [
+    ({"MONGO_MAX_POOL_SIZE": "lots"}, "MONGO_MAX_POOL_SIZE must be an integer (got 'lots')"),
+    ({"MONGO_MAX_POOL_SIZE": "0"}, "MONGO_MAX_POOL_SIZE must be at least 1 (got 0)"),
+    ({"MONGO_MAX_POOL_SIZE": "5", "MONGO_MIN_POOL_SIZE": "10"}, "MONGO_MIN_POOL_SIZE must not exceed MONGO_MAX_POOL_SIZE"),
+    ({"MONGO_COMPRESSORS": "lz4"}, "MONGO_COMPRESSORS: unknown compressor 'lz4' (use zstd, snappy, zlib)"),
+    ({"MONGO_WRITE_CONCERN": "-1"},
+     "MONGO_WRITE_CONCERN must be a non-negative integer, majority or a tag name (got '-1')"),
+    ({"MONGO_WRITE_CONCERN": "1.5"},
+     "MONGO_WRITE_CONCERN must be a non-negative integer, majority or a tag name (got '1.5')"),
+    ({"MONGO_WRITE_CONCERN": " majority"},
+     "MONGO_WRITE_CONCERN must be a non-negative integer, majority or a tag name (got ' majority')"),
+    ({"MONGO_WRITE_TIMEOUT_MS": "0"}, "MONGO_WRITE_TIMEOUT_MS must be at least 1 (got 0)"),
+    ({"MONGO_READ_PREFERENCE": "closest"},
+     "MONGO_READ_PREFERENCE must be one of primary, primaryPreferred, secondary, secondaryPreferred, nearest (got 'closest')"),
+    ({"REPORT_MAX_STALENESS_S": "30"}, "REPORT_MAX_STALENESS_S must be at least 90 (got 30)"),
+    ({"REPORT_MAX_TIME_MS": "0"}, "REPORT_MAX_TIME_MS must be at least 1 (got 0)"),
+])
+def test_invalid_settings(env, error):
+    with pytest.raises(SettingsError) as raised:
+        load_mongo_settings(env)
+    assert raised.value.errors == [error]
+
+
+def test_all_errors_are_reported_together():
+    with pytest.raises(SettingsError) as raised:
+        load_mongo_settings({"MONGO_MAX_POOL_SIZE": "0", "MONGO_WRITE_CONCERN": "-1", "REPORT_MAX_TIME_MS": "x"})
+    assert len(raised.value.errors) == 3
+
+
+@pytest.mark.parametrize("env, warning", [
+    ({"MONGO_WRITE_CONCERN": "0"}, "MONGO_WRITE_CONCERN=0 makes writes unacknowledged; write errors will go unnoticed"),
+    ({"MONGO_READ_PREFERENCE": "nearest"}, "MONGO_READ_PREFERENCE is not primary: reads right after a write may not see it"),
+])
+def test_warnings(env, warning):
+    assert load_mongo_settings(env).warnings == [warning]
+
+
+def test_missing_compressor_package_is_a_warning(monkeypatch):
+    monkeypatch.setattr("db_settings._installed", lambda modules: False)
+    settings = load_mongo_settings({"MONGO_COMPRESSORS": "snappy"})
+    assert settings.warnings == ["MONGO_COMPRESSORS: snappy needs the snappy package; it will be skipped"]
+    assert settings.client_options["compressors"] == "snappy"
@@ -0,0 +1,67 @@
+"""Demand history rollups and the vectorized reorder plan."""
+import math
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from forecast import DemandHistory, reorder_plan
+
+# Midnight, so the window is exactly `window_days` long
+NOW = datetime(2026, 3, 11, tzinfo=timezone.utc)
+
+
+def log(product_id, day, change):
+    return {"product_id": product_id, "timestamp": f"2026-03-{day:02d}T12:00:00+00:00", "quantity_change": change}
+
+
+def history(logs, window_days=10):
+    demand = DemandHistory(lambda: None, window_days=window_days)
+    demand.ingest(logs, "2026-03-01", NOW)
+    return demand
+
+
+def test_reorder_plan():
+    demand = history([
+        log("busy", 5, -10), log("busy", 6, -20), log("busy", 6, 50),
+        log("restocked", 7, 5),
+        log("steady", 8, -1),
+    ])
+    ids = ["busy", "restocked", "steady", "unseen"]
+    plan = reorder_plan(ids, np.array([40.0, 3.0, 100.0, 0.0]), demand, NOW, lead_time_days=7, coverage_days=30)
+
+    assert plan["consumed"].tolist() == [30, 0, 1, 0]
+    assert plan["received"].tolist() == [50, 5, 0, 0]
+    # 30 units over a 10-day window; per-day consumption 10 and 20, other days 0
+    assert plan["velocity"].tolist() == [3.0, 0.0, 0.1, 0.0]
+    safety = 1.65 * math.sqrt(500 / 10 - 3.0 ** 2) * math.sqrt(7)
+    assert plan["safety_stock"][0] == pytest.approx(safety)
+    assert plan["reorder_point"][0] == pytest.approx(3.0 * 7 + safety)
+    assert plan["days_until_stockout"][0] == pytest.approx(40 / 3)
+
+    # No demand: never runs out, never reordered, however low the stock
+    assert np.isinf(plan["days_until_stockout"][[1, 3]]).all()
+    assert plan["needs_reorder"].tolist() == [True, False, False, False]
+    assert plan["suggested_order"][0] == math.ceil(3.0 * 7 + safety + 3.0 * 30 - 40)
+    assert plan["suggested_order"][1:].tolist() == [0, 0, 0]
+
+
+def test_ingest_replaces_reread_days_and_drops_expired_ones():
+    demand = history([log("a", 1, -1), log("a", 5, -2), log("b", 5, -3), log("a", 9, -4)])
+    assert sorted(demand.days) == ["2026-03-01", "2026-03-05", "2026-03-09"]
+
+    # Re-reading from the 5th replaces those days (the 9th now has no logs) and keeps the 1st
+    demand.ingest([log("a", 5, -7)], "2026-03-05", NOW)
+    assert sorted(demand.days) == ["2026-03-01", "2026-03-05"]
+    codes, consumed, received = demand.days["2026-03-05"]
+    assert [demand.product_ids[c] for c in codes] == ["a"]
+    assert consumed.tolist() == [7] and received.tolist() == [0]
+
+    # Three days later the window starts on the 4th: the 1st is gone
+    later = datetime(2026, 3, 14, tzinfo=timezone.utc)
+    demand.ingest([log("b", 2, -1), log("b", 13, 6)], "2026-03-13", later)
+    assert sorted(demand.days) == ["2026-03-05", "2026-03-13"]
+    consumed, _, received, days = demand.window_totals(later)
+    assert days == 10
+    assert consumed[demand.product_codes["a"]] == 7
+    assert received[demand.product_codes["b"]] == 6
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from invalidation import CHANGE_HISTORY, CHANGE_MAX_IDS, VERSION_ID, VERSIONS_COLLECTION, InvalidationBus
+
+
+def following_bus():
+    bus = InvalidationBus()
+    calls = []
+    bus.subscribe(calls.append)
+    # Stands in for the change stream / poll task
+    bus._task = object()
+    return bus, calls
+
+
+def test_remote_writes_pass_their_product_ids():
+    bus, calls = following_bus()
+    bus._observe(2, [["a"], ["b", "c"]])
+    assert calls == [["a", "b", "c"]]
+    bus._observe(2, [["a"], ["b", "c"]])
+    assert len(calls) == 1
+    assert bus.full_invalidations == 0
+
+
+def test_unknown_ids_invalidate_everything():
+    bus, calls = following_bus()
+    bus._observe(2, [["a"], None])
+    # Version 3 is older than the one-entry history
+    bus._observe(4, [["d"]])
+    assert calls == [None, None]
+    assert bus.full_invalidations == 2
+
+
+def test_own_writes_are_skipped_when_catching_up():
+    bus, calls = following_bus()
+    bus.local_write(1)
+    # Version 2 came from another process, 3 from this one
+    bus.local_write(3)
+    assert calls == []
+    bus._observe(3, [["mine-1"], ["theirs"], ["mine-3"]])
+    assert calls == [["theirs"]]
+    bus.local_write(4)
+    bus._observe(4, [["mine-1"], ["theirs"], ["mine-3"], ["mine-4"]])
+    assert calls == [["theirs"]]
+
+
+def test_gap_without_a_follower_invalidates_everything():
+    bus = InvalidationBus(mode="off")
+    calls = []
+    bus.subscribe(calls.append)
+    bus.local_write(1)
+    bus.local_write(3)
+    assert calls == [None]
+    assert bus.version == 3
+
+
+def test_mongo_versions_record_written_ids():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from storage import MongoStorage
+
+    db = mongomock_motor.AsyncMongoMockClient()["invalidation"]
+    storage = MongoStorage(db)
+
+    async def scenario():
+        assert await storage.bump_data_version(["a"]) == 1
+        assert await storage.bump_data_version() == 2
+        assert await storage.bump_data_version([f"p{i}" for i in range(CHANGE_MAX_IDS + 1)]) == 3
+        for i in range(CHANGE_HISTORY):
+            await storage.bump_data_version([f"x{i}"])
+        return await db[VERSIONS_COLLECTION].find_one({"_id": VERSION_ID}), await storage.data_version()
+
+    doc, version = asyncio.run(scenario())
+    assert version == doc["version"] == 3 + CHANGE_HISTORY
+    assert len(doc["changes"]) == CHANGE_HISTORY
+    assert doc["changes"][-1] == [f"x{CHANGE_HISTORY - 1}"]
+
+    bus, calls = following_bus()
+    bus.version = doc["version"] - 2
+    bus._observe(doc["version"], doc["changes"])
+    assert calls == [[f"x{CHANGE_HISTORY - 2}", f"x{CHANGE_HISTORY - 1}"]]
@@ -0,0 +1,70 @@
+"""Admission control: token-bucket rate limits and concurrency slots, directly and through the API."""
+import asyncio
+
+import pytest
+
+import server
+from limits import AdmissionRejected, ConcurrencyLimiter, RateLimiter
+
+
+def test_rate_limiter_rejects_once_the_bucket_is_empty():
+    limiter = RateLimiter("reports", per_minute=30, burst=2)
+    limiter.acquire("a")
+    limiter.acquire("a")
+    with pytest.raises(AdmissionRejected) as rejected:
+        limiter.acquire("a")
+    assert rejected.value.status_code == 429
+    # 30 per minute refills a token every 2 seconds
+    assert rejected.value.retry_after == 2
+    # Buckets are per key
+    limiter.acquire("b")
+
+
+def test_rate_limiter_is_off_without_a_rate():
+    limiter = RateLimiter("reports", per_minute=0)
+    for _ in range(100):
+        limiter.acquire("a")
+
+
+def test_concurrency_limiter_rejects_after_the_queue_timeout():
+    limiter = ConcurrencyLimiter("reports", limit=1, queue_timeout=0.05)
+
+    async def main():
+        async with limiter.slot():
+            assert limiter.active == 1
+            with pytest.raises(AdmissionRejected) as rejected:
+                async with limiter.slot():
+                    pass
+            assert (rejected.value.status_code, rejected.value.retry_after) == (503, 1)
+            assert limiter.waiting == 0
+        # The slot is free again once its holder is done
+        async with limiter.slot():
+            assert limiter.active == 1
+        assert limiter.active == 0
+
+    asyncio.run(main())
+
+
+def test_api_rate_limit_sets_retry_after(client, monkeypatch):
+    limiter = server.stats_limits[1]
+    monkeypatch.setattr(limiter, "rate", 0.5)
+    monkeypatch.setattr(limiter, "burst", 1)
+    monkeypatch.setattr(limiter, "_buckets", {})
+
+    assert client.get("/api/stats").status_code == 200
+    response = client.get("/api/stats")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
+
+
+def test_api_slot_is_released_when_the_handler_raises(client, monkeypatch):
+    limiter = server.stats_limits[0]
+    monkeypatch.setattr(limiter, "limit", 1)
+    monkeypatch.setattr(limiter, "queue_timeout", 0.2)
+    monkeypatch.setattr(limiter, "_semaphore", None)
+
+    for _ in range(3):
+        response = client.get("/api/reports/analytics", params={"abc_a": 0.9, "abc_b": 0.5})
+        assert response.status_code == 400
+    assert client.get("/api/reports/analytics").status_code == 200
+    assert limiter.active == 0
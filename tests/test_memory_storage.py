@@ -0,0 +1,247 @@
+"""Unit tests for the in-memory storage engine's indexes and MongoDB emulation."""
+import asyncio
+import random
+
+import pytest
+
+from memory_storage import MemoryStorage, SortedIndex, project
+from storage import ProductFilter
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def product(pid, name, **fields):
+    return {"id": pid, "name": name, "sku": pid.upper(), "price": 1.0, "quantity": 50, "category": "",
+            "category_id": None, **fields}
+
+
+# -- SortedIndex --------------------------------------------------------------
+
+@pytest.mark.parametrize("batch", [2, 500])
+def test_sorted_index_add_many_matches_one_by_one(batch):
+    # A batch of 2 into 100 keys inserts one by one; 500 takes the merge path
+    rng = random.Random(batch)
+    base = [(rng.randrange(50), f"a{i}") for i in range(100)]
+    extra = [(rng.randrange(50), f"b{i}") for i in range(batch)]
+
+    merged = SortedIndex()
+    for key, doc_id in base:
+        merged.add(key, doc_id)
+    merged.add_many(extra)
+
+    one_by_one = SortedIndex()
+    for key, doc_id in base + extra:
+        one_by_one.add(key, doc_id)
+
+    assert merged.keys == sorted(merged.keys)
+    assert list(zip(merged.keys, merged.ids)) == list(zip(one_by_one.keys, one_by_one.ids))
+
+
+def test_sorted_index_equal_keys_keep_insertion_order():
+    index = SortedIndex()
+    index.add_many([("b", 1), ("a", 2), ("b", 3)])
+    index.add("b", 4)
+    assert list(index.range()) == [2, 1, 3, 4]
+    assert list(index.range(reverse=True)) == [4, 3, 1, 2]
+
+
+def test_sorted_index_remove_only_the_given_id():
+    index = SortedIndex()
+    index.add_many([("k", 1), ("k", 2), ("k", 3), ("z", 4)])
+    index.remove("k", 2)
+    index.remove("k", 99)
+    index.remove("missing", 1)
+    assert list(index.range()) == [1, 3, 4]
+    assert len(index) == 3
+
+
+def test_sorted_index_range_bounds():
+    index = SortedIndex()
+    index.add_many([(key, key) for key in "abcde"])
+    assert list(index.range("b", "d")) == ["b", "c"]
+    assert list(index.range("b", "d", reverse=True)) == ["c", "b"]
+    assert list(index.range(low="d")) == ["d", "e"]
+    assert list(index.range(high="b")) == ["a"]
+    assert list(index.range("x")) == []
+
+
+# -- projections --------------------------------------------------------------
+
+def test_project_inclusion_exclusion_and_id_only():
+    doc = {"id": "1", "name": "Lamp", "price": 2.0, "password_hash": "x"}
+    assert project(doc, {"_id": 0, "id": 1, "name": 1}) == {"id": "1", "name": "Lamp"}
+    assert project(doc, {"_id": 0, "password_hash": 0}) == {"id": "1", "name": "Lamp", "price": 2.0}
+    assert project(doc, {"_id": 0}) == doc
+    assert project(doc, None) == doc
+    assert project(doc, {"_id": 0}) is not doc
+    # Fields missing from the document are simply absent
+    assert project(doc, {"_id": 0, "sku": 1}) == {}
+
+
+def test_returned_documents_are_copies():
+    storage = MemoryStorage()
+    run(storage.products.insert_one(product("p1", "Lamp")))
+    run(storage.products.get("p1"))["name"] = "Changed"
+    assert run(storage.products.get("p1"))["name"] == "Lamp"
+
+
+# -- products -----------------------------------------------------------------
+
+def test_update_reindexes_category_name_and_sku():
+    storage = MemoryStorage()
+    products = storage.products
+    run(products.insert_many([
+        product("p1", "Bowl", category_id="c1"),
+        product("p2", "Anchor", category_id="c1"),
+        product("p3", "Cup", category_id="c2"),
+    ]))
+
+    def names(category_id):
+        return [p["name"] for p in run(products.find(ProductFilter(category_id=category_id)))]
+
+    assert names("c1") == ["Anchor", "Bowl"]
+
+    # Rename: the (category_id, name) index order follows
+    run(products.update("p2", {"name": "Zebra"}))
+    assert names("c1") == ["Bowl", "Zebra"]
+
+    # Move between categories
+    run(products.update("p1", {"category_id": "c2"}))
+    assert names("c1") == ["Zebra"]
+    assert names("c2") == ["Bowl", "Cup"]
+    assert run(products.count_by_category_id()) == {"c1": 1, "c2": 2}
+
+    # Detach: no longer in any category index
+    run(products.update_category("c1", {"category_id": None}))
+    assert names("c1") == []
+    assert run(products.count_in_category("c1")) == 0
+    assert "c1" not in products.by_category
+
+    # SKU change
+    run(products.update("p3", {"sku": "NEW"}))
+    assert run(products.find_by_skus(["P3"])) == []
+    assert [p["id"] for p in run(products.find_by_skus(["NEW"]))] == ["p3"]
+
+
+def test_category_name_index_follows_renames_and_links():
+    storage = MemoryStorage()
+    products = storage.products
+    run(products.insert_many([
+        product("p1", "Bowl", category="Pottery"),
+        product("p2", "Anchor", category="Pottery", category_id="c1"),
+        product("p3", "Cup", category="Glass"),
+    ]))
+
+    def names(category):
+        return [p["name"] for p in run(products.find(ProductFilter(category=category)))]
+
+    assert names("Pottery") == ["Anchor", "Bowl"]
+
+    # Linking only touches products without a category id, and keeps them in the name index
+    assert run(products.link_category("Pottery", {"category_id": "c2"})) == 1
+    assert run(products.count_by_category_id()) == {"c1": 1, "c2": 1}
+    assert names("Pottery") == ["Anchor", "Bowl"]
+
+    run(products.update_category("c2", {"category": "Ceramics"}))
+    assert names("Pottery") == ["Anchor"]
+    assert names("Ceramics") == ["Bowl"]
+    run(products.delete("p3"))
+    assert names("Glass") == []
+    assert "Glass" not in products.by_category_name
+
+
+def test_update_many_counts_only_modified_and_increments():
+    storage = MemoryStorage()
+    run(storage.products.insert_many([product("p1", "A", quantity=5), product("p2", "B", quantity=7)]))
+    assert run(storage.products.update_many(["p1", "p2", "p1", "nope"], {"quantity": 7})) == 1
+    assert run(storage.products.update_many(["p1", "p2"], {}, {"quantity": 3, "price": 0.5})) == 2
+    assert [(p["quantity"], p["price"]) for p in run(storage.products.find_by_ids(["p1", "p2"]))] == [(10, 1.5), (10, 1.5)]
+
+
+def test_find_filters():
+    storage = MemoryStorage()
+    run(storage.products.insert_many([
+        product("p1", "Brass Lamp", quantity=10),
+        product("p2", "Wood Bowl", sku="BRASS-2", quantity=3, low_stock_threshold=2),
+        product("p3", "Silver Ring", category="Jewellery", quantity=0, low_stock_threshold=None),
+    ]))
+
+    def ids(**criteria):
+        return [p["id"] for p in run(storage.products.find(ProductFilter(**criteria), {"_id": 0, "id": 1}))]
+
+    assert ids(search="brass") == ["p1", "p2"]
+    assert ids(search="^silver") == ["p3"]
+    # Missing or null threshold means the default of 10
+    assert ids(low_stock=True) == ["p1", "p3"]
+    assert ids(category="Jewellery") == ["p3"]
+    assert ids(search="brass", low_stock=True) == ["p1"]
+    assert len(run(storage.products.find(ProductFilter(), limit=2))) == 2
+
+
+def test_duplicate_product_id_is_rejected():
+    storage = MemoryStorage()
+    run(storage.products.insert_one(product("p1", "A")))
+    with pytest.raises(ValueError):
+        run(storage.products.insert_one(product("p1", "B")))
+
+
+def test_valuation_by_category():
+    storage = MemoryStorage()
+    run(storage.products.insert_many([
+        product("p1", "A", category="X", price=2.0, quantity=5),
+        product("p2", "B", category="X", price=1.0, quantity=0, low_stock_threshold=0),
+        product("p3", "C", category=None, price=3.0, quantity=20),
+    ]))
+    rows = {row["category"]: row for row in run(storage.products.valuation_by_category())}
+    assert rows["X"] == {"category": "X", "products": 2, "quantity": 5, "stock_value": 10.0,
+                         "low_stock_items": 2, "out_of_stock_items": 1}
+    assert rows[""]["stock_value"] == 60.0
+    assert rows[""]["low_stock_items"] == 0
+
+
+# -- activity logs ------------------------------------------------------------
+
+def test_activity_recent_and_movements():
+    logs = MemoryStorage().activity_logs
+    run(logs.insert_many([
+        {"product_id": "p1", "action": "created", "quantity_change": 5, "timestamp": "2026-01-01T00:00:00"},
+        {"product_id": "p1", "action": "stock_added", "quantity_change": 3, "timestamp": "2026-01-03T00:00:00"},
+    ]))
+    run(logs.insert_one({"product_id": "p2", "action": "stock_reduced", "quantity_change": -1, "timestamp": "2026-01-02T00:00:00"}))
+
+    assert [l["timestamp"][:10] for l in run(logs.recent(10))] == ["2026-01-03", "2026-01-02", "2026-01-01"]
+    assert [l["action"] for l in run(logs.recent(1))] == ["stock_added"]
+    assert [l["action"] for l in run(logs.recent(10, product_id="p1"))] == ["stock_added", "created"]
+    assert [l["action"] for l in run(logs.recent(10, action="stock_reduced"))] == ["stock_reduced"]
+    window = run(logs.recent(10, since="2026-01-02T00:00:00", until="2026-01-03T00:00:00"))
+    assert [l["product_id"] for l in window] == ["p2"]
+
+    movements = run(logs.movements("2026-01-02", ["stock_added", "stock_reduced"]))
+    assert movements == [
+        {"product_id": "p2", "quantity_change": -1, "timestamp": "2026-01-02T00:00:00"},
+        {"product_id": "p1", "quantity_change": 3, "timestamp": "2026-01-03T00:00:00"},
+    ]
+
+
+# -- valuation snapshots ------------------------------------------------------
+
+def test_valuation_snapshot_range_and_category():
+    snapshots = MemoryStorage().valuation_snapshots
+    for hour in range(4):
+        bucket = f"2026-01-01T0{hour}:00:00+00:00"
+        doc = {"granularity": "hour", "bucket": bucket, "taken_at": bucket, "totals": {"products": hour},
+               "categories": [{"category": "A", "products": hour}, {"category": "B", "products": 10 + hour}]}
+        assert run(snapshots.insert_if_absent(f"hour:{bucket}", doc))
+    assert not run(snapshots.insert_if_absent("hour:2026-01-01T00:00:00+00:00", {}))
+    assert run(snapshots.existing_ids(["hour:2026-01-01T00:00:00+00:00", "hour:x"])) == {"hour:2026-01-01T00:00:00+00:00"}
+
+    points = run(snapshots.find_range("hour", "2026-01-01T01:00:00+00:00", "2026-01-01T03:00:00+00:00"))
+    assert [(p["bucket"][11:13], p["totals"]["products"]) for p in points] == [("01", 1), ("02", 2)]
+    assert "categories" not in points[0]
+
+    points = run(snapshots.find_range("hour", "2026-01-01", "2026-01-02", category="B", limit=2))
+    assert [p["categories"] for p in points] == [[{"category": "B", "products": 10}], [{"category": "B", "products": 11}]]
+    assert run(snapshots.find_range("hour", "2026-01-01", "2026-01-02", category="C"))[0]["categories"] == []
+    assert run(snapshots.find_range("day", "2026-01-01", "2026-01-02")) == []
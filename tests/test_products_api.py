@@ -0,0 +1,235 @@
+"""Product, category, bulk and batch-get endpoints, end to end on the in-memory storage engine."""
+
+
+def create_category(client, name, description=None):
+    response = client.post("/api/categories", json={"name": name, "description": description})
+    assert response.status_code == 200
+    return response.json()
+
+
+def create_product(client, name, sku, **fields):
+    body = {"name": name, "sku": sku, "price": 10.0, "quantity": 20, "category": "Misc", **fields}
+    response = client.post("/api/products", json=body)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def product_names(client, **params):
+    return [p["name"] for p in client.get("/api/products", params=params).json()]
+
+
+def test_product_crud(client):
+    tools = create_category(client, "Tools")
+    product = create_product(client, "Hammer", "H-1", category_id=tools["id"], quantity=5)
+    assert product["category"] == "Tools"
+    assert product["category_id"] == tools["id"]
+
+    fetched = client.get(f"/api/products/{product['id']}").json()
+    assert fetched == product
+    partial = client.get(f"/api/products/{product['id']}", params={"fields": "name,quantity"}).json()
+    assert partial == {"id": product["id"], "name": "Hammer", "quantity": 5}
+    assert client.get("/api/products", params={"fields": "bogus"}).status_code == 400
+
+    updated = client.put(f"/api/products/{product['id']}", json={"quantity": 8, "name": "Mallet"}).json()
+    assert (updated["name"], updated["quantity"]) == ("Mallet", 8)
+    assert client.get(f"/api/products/{product['id']}").json()["name"] == "Mallet"
+    assert product_names(client, category_id=tools["id"]) == ["Mallet"]
+
+    assert client.delete(f"/api/products/{product['id']}").status_code == 200
+    assert client.get(f"/api/products/{product['id']}").status_code == 404
+    assert client.delete(f"/api/products/{product['id']}").status_code == 404
+    assert client.put(f"/api/products/{product['id']}", json={"quantity": 1}).status_code == 404
+
+    actions = [log["action"] for log in client.get("/api/reports/activity-logs").json()]
+    assert actions == ["deleted", "stock_added", "created"]
+
+
+def test_product_filters(client):
+    tools = create_category(client, "Tools")
+    create_product(client, "Wood Saw", "S-1", category_id=tools["id"], quantity=50)
+    create_product(client, "Brass Hinge", "H-2", category_id=tools["id"], quantity=3)
+    create_product(client, "Brass Bell", "B-3", category="Decor", quantity=30)
+
+    # Listing by category id walks the (category_id, name) index
+    assert product_names(client, category_id=tools["id"]) == ["Brass Hinge", "Wood Saw"]
+    assert product_names(client, category="Decor") == ["Brass Bell"]
+    assert sorted(product_names(client, search="BRASS")) == ["Brass Bell", "Brass Hinge"]
+    assert product_names(client, search="s-1") == ["Wood Saw"]
+    assert product_names(client, low_stock=True) == ["Brass Hinge"]
+    assert product_names(client, category_id=tools["id"], search="wood") == ["Wood Saw"]
+
+
+def test_unknown_category_id_is_rejected(client):
+    response = client.post("/api/products", json={"name": "X", "sku": "X", "price": 1, "quantity": 1, "category_id": "nope"})
+    assert response.status_code == 400
+
+
+def test_batch_get(client):
+    a = create_product(client, "A", "SKU-A")
+    b = create_product(client, "B", "SKU-B")
+
+    body = client.post("/api/products/batch-get", json={"ids": [b["id"], "nope", a["id"], b["id"]]}).json()
+    assert [p["name"] for p in body["products"]] == ["B", "A", "B"]
+    assert body["missing"] == ["nope"]
+
+    body = client.post("/api/products/batch-get", json={"skus": ["SKU-A", "zzz"], "fields": "name"}).json()
+    assert body == {"products": [{"id": a["id"], "name": "A"}], "missing": ["zzz"]}
+
+    assert client.post("/api/products/batch-get", json={}).status_code == 400
+    assert client.post("/api/products/batch-get", json={"ids": [a["id"]], "skus": ["SKU-A"]}).status_code == 400
+
+
+def test_bulk_update_by_filter_and_ids(client):
+    tools = create_category(client, "Tools")
+    saw = create_product(client, "Saw", "S-1", category_id=tools["id"], quantity=5)
+    drill = create_product(client, "Drill", "D-1", category_id=tools["id"], quantity=7)
+    lamp = create_product(client, "Lamp", "L-1", category="Decor", quantity=1)
+
+    response = client.post("/api/products/bulk-update", json={"filter": {"category_id": tools["id"]}, "inc": {"quantity": 2}})
+    assert response.json() == {"matched": 2, "modified": 2, "logged": 2}
+    quantities = {p["name"]: p["quantity"] for p in client.get("/api/products").json()}
+    assert quantities == {"Saw": 7, "Drill": 9, "Lamp": 1}
+
+    # Moving products by id re-resolves the category and re-indexes them
+    response = client.post("/api/products/bulk-update", json={"ids": [saw["id"], lamp["id"]], "set": {"category_id": tools["id"]}})
+    assert response.json()["matched"] == 2
+    assert product_names(client, category_id=tools["id"]) == ["Drill", "Lamp", "Saw"]
+
+    response = client.post("/api/products/bulk-update", json={"filter": {"search": "drill"}, "set": {"quantity": 0}})
+    assert response.json() == {"matched": 1, "modified": 1, "logged": 1}
+    assert client.get(f"/api/products/{drill['id']}").json()["quantity"] == 0
+
+    assert client.post("/api/products/bulk-update", json={"filter": {}, "inc": {"quantity": 1}}).status_code == 400
+    assert client.post("/api/products/bulk-update", json={"ids": [saw["id"]]}).status_code == 400
+    for field in ("price", "quantity"):
+        body = {"ids": [saw["id"]], "set": {field: 5}, "inc": {field: 1}}
+        assert client.post("/api/products/bulk-update", json=body).status_code == 400
+    assert client.post("/api/products/bulk-update", json={"ids": ["nope"], "inc": {"quantity": 1}}).json()["matched"] == 0
+
+
+def test_bulk_delete(client):
+    keep = create_product(client, "Keep", "K-1", quantity=50)
+    create_product(client, "Low A", "LA", quantity=1)
+    create_product(client, "Low B", "LB", quantity=2)
+
+    response = client.post("/api/products/bulk-delete", json={"filter": {"low_stock": True}})
+    assert response.json() == {"matched": 2, "deleted": 2}
+    assert product_names(client) == ["Keep"]
+    assert client.post("/api/products/bulk-delete", json={"ids": [keep["id"], keep["id"]]}).json() == {"matched": 1, "deleted": 1}
+    assert client.get("/api/products").json() == []
+
+
+def test_category_rename_and_counts(client):
+    tools = create_category(client, "Tools")
+    create_category(client, "Toys")
+    create_product(client, "Saw", "S-1", category_id=tools["id"])
+    create_product(client, "Drill", "D-1", category="Tools")
+
+    counts = {c["name"]: c["product_count"] for c in client.get("/api/categories").json()}
+    assert counts == {"Tools": 2, "Toys": 0}
+
+    assert client.put(f"/api/categories/{tools['id']}", json={"name": "Toys"}).status_code == 400
+    assert client.put(f"/api/categories/{tools['id']}", json={"name": ""}).status_code == 400
+    assert client.put(f"/api/categories/{tools['id']}", json={"name": "  "}).status_code == 400
+    assert client.post("/api/categories", json={"name": " "}).status_code == 400
+    renamed = client.put(f"/api/categories/{tools['id']}", json={"name": "Hardware"}).json()
+    assert (renamed["name"], renamed["product_count"]) == ("Hardware", 2)
+    assert sorted(product_names(client, category="Hardware")) == ["Drill", "Saw"]
+    assert product_names(client, category="Tools") == []
+
+
+def test_new_category_links_free_text_products(client):
+    pot = create_product(client, "Vase", "V-1", category="Pottery")
+    create_product(client, "Rug", "R-1", category="Textiles")
+
+    pottery = create_category(client, "Pottery")
+    assert pottery["product_count"] == 1
+    linked = client.get(f"/api/products/{pot['id']}").json()
+    assert linked["category_id"] == pottery["id"]
+    assert linked["updated_at"] > pot["updated_at"]
+    assert client.post("/api/categories", json={"name": "Pottery"}).status_code == 400
+
+    client.put(f"/api/categories/{pottery['id']}", json={"name": "Ceramics"})
+    assert product_names(client, category="Ceramics") == ["Vase"]
+    response = client.delete(f"/api/categories/{pottery['id']}", params={"products": "delete"})
+    assert response.json()["products_affected"] == 1
+    assert product_names(client) == ["Rug"]
+
+
+def test_category_merge(client):
+    tools = create_category(client, "Tools")
+    hardware = create_category(client, "Hardware")
+    create_product(client, "Saw", "S-1", category_id=tools["id"])
+    create_product(client, "Nail", "N-1", category_id=hardware["id"])
+
+    response = client.post(f"/api/categories/{tools['id']}/merge", json={"target_id": hardware["id"]})
+    assert response.json()["products_moved"] == 1
+    assert [c["name"] for c in client.get("/api/categories").json()] == ["Hardware"]
+    assert product_names(client, category_id=hardware["id"]) == ["Nail", "Saw"]
+    assert sorted(product_names(client, category="Hardware")) == ["Nail", "Saw"]
+    assert client.post(f"/api/categories/{hardware['id']}/merge", json={"target_id": hardware["id"]}).status_code == 400
+
+
+def test_category_delete_modes(client):
+    detach = create_category(client, "Detach")
+    reassign = create_category(client, "Reassign")
+    doomed = create_category(client, "Doomed")
+    target = create_category(client, "Target")
+    create_product(client, "Kept", "P-1", category_id=detach["id"])
+    create_product(client, "Moved", "P-2", category_id=reassign["id"])
+    create_product(client, "Gone", "P-3", category_id=doomed["id"])
+
+    assert client.delete(f"/api/categories/{detach['id']}").json()["products_affected"] == 1
+    kept = client.get("/api/products", params={"search": "Kept"}).json()[0]
+    assert (kept["category"], kept["category_id"]) == ("Detach", None)
+
+    assert client.delete(f"/api/categories/{reassign['id']}", params={"products": "reassign"}).status_code == 400
+    response = client.delete(f"/api/categories/{reassign['id']}", params={"products": "reassign", "target_id": target["id"]})
+    assert response.json()["products_affected"] == 1
+    assert product_names(client, category_id=target["id"]) == ["Moved"]
+
+    assert client.delete(f"/api/categories/{doomed['id']}", params={"products": "delete"}).json()["products_affected"] == 1
+    assert sorted(product_names(client)) == ["Kept", "Moved"]
+    assert [c["name"] for c in client.get("/api/categories").json()] == ["Target"]
+    assert client.delete(f"/api/categories/{doomed['id']}").status_code == 404
+
+
+def test_stats(client):
+    create_category(client, "Tools")
+    create_product(client, "Saw", "S-1", price=5.0, quantity=4)
+    create_product(client, "Drill", "D-1", price=20.0, quantity=50)
+
+    stats = client.get("/api/stats").json()
+    assert stats["total_products"] == 2
+    assert stats["total_stock_value"] == 1020.0
+    assert stats["low_stock_items"] == 1
+    assert stats["total_categories"] == 1
+    assert [a["product_name"] for a in stats["recent_activities"]] == ["Drill", "Saw"]
+
+
+
+def inventory_job(client):
+    job = client.post("/api/reports/jobs", json={"report": "inventory"}).json()
+    job = client.get(f"/api/reports/jobs/{job['id']}", params={"wait": 10}).json()
+    assert job["status"] == "completed"
+    return job, client.get(f"/api/reports/jobs/{job['id']}/download").json()
+
+
+def test_category_updates_invalidate_cached_reports(client):
+    tools = create_category(client, "Tools", "Old description")
+    product = create_product(client, "Saw", "S-1", category_id=tools["id"])
+    inventory_job(client)
+    assert inventory_job(client)[0]["cached"]
+
+    client.put(f"/api/categories/{tools['id']}", json={"description": "New description"})
+    job, report = inventory_job(client)
+    assert not job["cached"]
+    assert [c["description"] for c in report["categories"]] == ["New description"]
+
+    client.put(f"/api/categories/{tools['id']}", json={"name": "Hardware"})
+    job, report = inventory_job(client)
+    assert not job["cached"]
+    assert [p["category"] for p in report["products"]] == ["Hardware"]
+    renamed = client.get(f"/api/products/{product['id']}").json()
+    assert renamed["category"] == "Hardware"
+    assert renamed["updated_at"] > product["updated_at"]
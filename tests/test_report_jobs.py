@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import jobs
+import server
+from tests.conftest import login
+
+
+def submit(client, report, **params):
+    response = client.post("/api/reports/jobs", json={"report": report, "params": params})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def wait(client, job):
+    return client.get(f"/api/reports/jobs/{job['id']}", params={"wait": 10}).json()
+
+
+def test_reorder_limit_has_its_own_cap(client):
+    assert client.get("/api/reports/reorder", params={"limit": server.REORDER_REPORT_MAX}).status_code == 200
+    assert client.get("/api/reports/reorder", params={"limit": server.REORDER_REPORT_MAX + 1}).status_code == 400
+    response = client.post("/api/reports/jobs", json={"report": "reorder", "params": {"limit": server.REORDER_REPORT_MAX + 1}})
+    assert response.status_code == 400
+    response = client.post("/api/reports/jobs", json={"report": "activity", "params": {"limit": server.ACTIVITY_REPORT_MAX + 1}})
+    assert response.status_code == 400
+
+
+def test_reorder_results_are_cached_per_day(client, monkeypatch):
+    client.post("/api/products", json={"name": "Lamp", "sku": "L-1", "price": 1, "quantity": 3, "category": "Decor"})
+    assert server.report_jobs.variants["reorder"] is server.forecast_date
+    today = ["2026-10-18"]
+    monkeypatch.setitem(server.report_jobs.variants, "reorder", lambda: today[0])
+
+    first = wait(client, submit(client, "reorder", all=True))
+    assert first["status"] == "completed" and not first["cached"]
+    assert submit(client, "reorder", all=True)["cached"]
+
+    # Same data version, next day: the forecast is recomputed
+    today[0] = "2026-10-19"
+    next_day = submit(client, "reorder", all=True)
+    assert not next_day["cached"]
+    assert next_day["key"] != first["key"]
+    assert wait(client, next_day)["status"] == "completed"
+
+
+def test_result_key_variant():
+    assert jobs.result_key("inventory", {}, 1) == jobs.result_key("inventory", {}, 1, None)
+    assert jobs.result_key("reorder", {}, 1, "2026-10-18") != jobs.result_key("reorder", {}, 1, "2026-10-19")
+
+
+def test_results_are_not_shared_between_datasets(client):
+    client.post("/api/products", json={"name": "First", "sku": "F-1", "price": 1, "quantity": 1, "category": "A"})
+    first = wait(client, submit(client, "inventory"))
+    assert not first["cached"]
+
+    # A restarted process starts a new in-memory dataset at the same data version
+    with TestClient(server.app) as restarted:
+        login(restarted)
+        restarted.post("/api/products", json={"name": "Second", "sku": "S-1", "price": 1, "quantity": 1, "category": "A"})
+        job = submit(restarted, "inventory")
+        assert not job["cached"]
+        assert job["data_version"] == first["data_version"]
+        wait(restarted, job)
+        report = restarted.get(f"/api/reports/jobs/{job['id']}/download").json()
+        assert [p["name"] for p in report["products"]] == ["Second"]
+
+
+def test_mongo_dataset_identity():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from invalidation import VERSION_ID, VERSIONS_COLLECTION
+    from storage import MongoStorage
+
+    client = mongomock_motor.AsyncMongoMockClient()
+
+    async def scenario():
+        shop, other = MongoStorage(client["shop"]), MongoStorage(client["other"])
+        # A version document from before epochs gets one on first use
+        await client["shop"][VERSIONS_COLLECTION].insert_one({"_id": VERSION_ID, "version": 5})
+        first = await shop.dataset_id()
+        assert first.startswith("shop:")
+        assert await shop.dataset_id() == first
+        await shop.bump_data_version(["p1"])
+        assert (await shop.dataset_id(), await shop.data_version()) == (first, 6)
+
+        # Same version number, different database
+        await other.bump_data_version()
+        assert await other.dataset_id() != first
+
+        # A reseed starts a new identity and tells running workers to drop everything
+        await shop.reset_data_version()
+        doc = await client["shop"][VERSIONS_COLLECTION].find_one({"_id": VERSION_ID})
+        assert await shop.dataset_id() != first
+        assert (doc["version"], doc["changes"][-1]) == (7, None)
+
+    asyncio.run(scenario())
@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta, timezone
+
+import server
+
+
+def test_history_bounds_with_utc_offset(client):
+    client.post("/api/products", json={"name": "Lamp", "sku": "L-1", "price": 2.5, "quantity": 4, "category": "Decor"})
+    start = datetime(2026, 10, 18, 18, 5, tzinfo=timezone.utc)
+    for hour in range(6):
+        client.portal.call(server.valuation_snapshots.capture, start + timedelta(hours=hour))
+
+    response = client.get("/api/reports/valuation-history", params={
+        "granularity": "hour",
+        "since": "2026-10-18T17:00:00Z",
+        # 20:30 UTC
+        "until": "2026-10-19T02:00:00+05:30",
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert body["until"] == "2026-10-18T20:30:00+00:00"
+    assert [p["bucket"] for p in body["points"]] == [
+        "2026-10-18T18:00:00+00:00", "2026-10-18T19:00:00+00:00", "2026-10-18T20:00:00+00:00",
+    ]
+    assert body["points"][0]["stock_value"] == 10.0
+
+
+def test_history_for_one_category(client):
+    client.post("/api/products", json={"name": "Lamp", "sku": "L-1", "price": 2.5, "quantity": 4, "category": "Decor"})
+    client.post("/api/products", json={"name": "Ring", "sku": "R-1", "price": 100, "quantity": 1, "category": "Jewellery"})
+    client.portal.call(server.valuation_snapshots.capture, datetime(2026, 10, 18, 12, tzinfo=timezone.utc))
+
+    params = {"since": "2026-10-18T00:00:00Z", "until": "2026-10-19T00:00:00Z"}
+    points = client.get("/api/reports/valuation-history", params={**params, "category": "Jewellery"}).json()["points"]
+    assert [(p["bucket"], p["products"], p["stock_value"]) for p in points] == [("2026-10-18T00:00:00+00:00", 1, 100.0)]
+    missing = client.get("/api/reports/valuation-history", params={**params, "category": "Nope"}).json()["points"]
+    assert missing[0]["products"] == 0